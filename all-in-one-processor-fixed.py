@@ -4,55 +4,68 @@ Fixed All-in-One Product Image Processor
 Handles both flat and nested directory structures
 """
 
-import os
-import re
-import shutil
+import sys
 from pathlib import Path
-from PIL import Image, ImageOps
-import numpy as np
 import argparse
 import logging
+from concurrent.futures import ProcessPoolExecutor
+
+# Shared pipeline modules live alongside the Zoho processor
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'image-processing'))
+from image_engine import (ENCODER_SPEEDS, RENDERER, EncoderProfile, VariantSpec, compose_variants, variant_path,
+                          write_variants)
+from journal import CheckpointJournal, output_digests
+from processing_cache import DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE_MB, ProcessingCache
+from processing_core import ProcessingCore, TransformSettings
+from sku_index import SkuMatcher
+
+VARIANT_SPECS = [VariantSpec('main'), VariantSpec.sized(400, 400)]
 
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger(__name__)
 
 class ProductImageProcessor:
-    def __init__(self, padding=50, quality=85):
+    def __init__(self, padding=50, quality=85, workers=1, cache=None, max_size=None, trim=False, encoder=None,
+                 journal=None, sku_matcher=None):
         self.padding = padding
-        self.quality = quality
+        # An explicit encoder profile takes precedence over the plain quality setting
+        self.encoder = encoder or EncoderProfile(quality=quality)
+        self.quality = self.encoder.quality
+        self.trim = trim
+        self.max_size = max_size
+        self.workers = workers
+        self.cache = cache
+        self.journal = journal
+        self.sku_matcher = sku_matcher or SkuMatcher()
+        self.core = ProcessingCore(TransformSettings(padding, max_size, trim), VARIANT_SPECS, self.encoder)
+    
+    def __getstate__(self):
+        # Worker processes get everything but the journal; the parent records what they finish
+        state = self.__dict__.copy()
+        state['journal'] = None
+        return state
+    
+    def cache_params(self):
+        """Every setting that changes the bytes this processor writes."""
+        return {
+            'pipeline': 'all_in_one',
+            'renderer': RENDERER,
+            'padding': self.padding,
+            'encoder': self.encoder.cache_params(),
+            'max_size': list(self.max_size) if self.max_size else None,
+            'trim': self.trim,
+            'variant_sizes': [list(spec.size) for spec in VARIANT_SPECS if spec.size]
+        }
     
     def add_padding(self, image):
         """Add transparent padding around image."""
         if image.mode != 'RGBA':
             image = image.convert('RGBA')
-            
-        width, height = image.size
-        new_size = (width + 2 * self.padding, height + 2 * self.padding)
-        
-        padded = Image.new('RGBA', new_size, (0, 0, 0, 0))
-        padded.paste(image, (self.padding, self.padding), image)
-        
-        return padded
+        return compose_variants(image, self.padding, [VariantSpec('main')])['main']
     
     def extract_sku_from_filename(self, filename):
-        """Extract SKU from various filename formats."""
-        # Remove extension
-        name_without_ext = os.path.splitext(filename)[0].lower()
-        
-        # Try different patterns
-        # Pattern 1: SKU_description.jpg -> SKU
-        # Pattern 2: SKU-description.jpg -> SKU
-        # Pattern 3: SKU.jpg -> SKU
-        
-        # Split by common delimiters
-        for delimiter in ['_', '-', ' ']:
-            parts = name_without_ext.split(delimiter)
-            if parts and parts[0]:
-                # Return the first part as SKU
-                return parts[0]
-        
-        # If no delimiter found, return the whole name
-        return name_without_ext
+        """Extract SKU from various filename formats (see SkuMatcher)."""
+        return self.sku_matcher.extract(filename)
     
     def process_and_organize(self, input_folder, output_folder, brand=None):
         """Process images with flexible input structure."""
@@ -60,37 +73,45 @@ class ProductImageProcessor:
         output_path = Path(output_folder)
         
         # Track statistics
-        stats = {'processed': 0, 'failed': 0, 'skipped': 0}
-        
-        # Check if input has brand subfolders or is flat
-        has_brand_folders = False
-        for item in input_path.iterdir():
-            if item.is_dir() and not item.name.startswith('.'):
-                has_brand_folders = True
-                break
+        stats = {'processed': 0, 'failed': 0, 'skipped': 0, 'resumed': 0, 'cache_hits': 0, 'cache_misses': 0}
         
-        if has_brand_folders:
-            # Original structure: process each brand folder
-            logger.info("📁 Detected brand folder structure")
-            for brand_folder in input_path.iterdir():
-                if not brand_folder.is_dir() or brand_folder.name.startswith('.'):
-                    continue
-                    
-                brand_name = brand_folder.name.lower()
-                self._process_brand_folder(brand_folder, output_path / brand_name, stats)
-        else:
-            # Flat structure: all images in one folder
-            logger.info("📁 Detected flat file structure")
-            if brand:
-                # Use provided brand name
-                brand_name = brand.lower()
-                logger.info(f"📁 Processing as brand: {brand_name}")
-            else:
-                # Try to detect brand from first file or use 'unknown'
-                brand_name = 'unknown'
-                logger.info("⚠️  No brand specified, using 'unknown'")
+        # One pool serves every brand folder; each worker is handed the processor once, at startup
+        executor = None
+        if self.workers > 1:
+            executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(self,))
+        try:
+            # Check if input has brand subfolders or is flat
+            has_brand_folders = False
+            for item in input_path.iterdir():
+                if item.is_dir() and not item.name.startswith('.'):
+                    has_brand_folders = True
+                    break
             
-            self._process_brand_folder(input_path, output_path / brand_name, stats)
+            if has_brand_folders:
+                # Original structure: process each brand folder
+                logger.info("📁 Detected brand folder structure")
+                for brand_folder in input_path.iterdir():
+                    if not brand_folder.is_dir() or brand_folder.name.startswith('.'):
+                        continue
+                        
+                    brand_name = brand_folder.name.lower()
+                    self._process_brand_folder(brand_folder, output_path / brand_name, stats, executor)
+            else:
+                # Flat structure: all images in one folder
+                logger.info("📁 Detected flat file structure")
+                if brand:
+                    # Use provided brand name
+                    brand_name = brand.lower()
+                    logger.info(f"📁 Processing as brand: {brand_name}")
+                else:
+                    # Try to detect brand from first file or use 'unknown'
+                    brand_name = 'unknown'
+                    logger.info("⚠️  No brand specified, using 'unknown'")
+                
+                self._process_brand_folder(input_path, output_path / brand_name, stats, executor)
+        finally:
+            if executor is not None:
+                executor.shutdown()
         
         # Summary
         logger.info("\n" + "="*50)
@@ -98,12 +119,16 @@ class ProductImageProcessor:
         logger.info(f"✅ Processed: {stats['processed']} images")
         logger.info(f"❌ Failed: {stats['failed']} images")
         logger.info(f"⚠️  Skipped: {stats['skipped']} files")
+        if stats['resumed']:
+            logger.info(f"⏩ Resumed from checkpoint: {stats['resumed']} images")
+        if self.cache is not None:
+            logger.info(f"♻️  Cache hits: {stats['cache_hits']}, misses: {stats['cache_misses']}")
         logger.info("="*50)
         
         return stats
     
-    def _process_brand_folder(self, input_folder, output_folder, stats):
-        """Process all images in a folder."""
+    def _process_brand_folder(self, input_folder, output_folder, stats, executor=None):
+        """Process all images in a folder, fanning SKU groups out to ``executor`` if given."""
         output_folder.mkdir(parents=True, exist_ok=True)
         brand_name = output_folder.name
         
@@ -132,54 +157,129 @@ class ProductImageProcessor:
                 sku_groups[sku] = []
             sku_groups[sku].append(img_file)
         
-        # Process each SKU group
-        for sku, files in sorted(sku_groups.items()):
-            logger.info(f"  📦 SKU: {sku} ({len(files)} images)")
-            
-            # Sort files for consistent numbering
-            files.sort(key=lambda x: x.name.lower())
-            
-            for idx, img_file in enumerate(files, 1):
+        # Process each SKU group. A group always runs in a single worker, so the
+        # _1, _2 numbering is the same whether or not workers are used.
+        sku_groups = sorted(sku_groups.items())
+        
+        if executor is not None and len(sku_groups) > 1:
+            # Tasks carry only the group itself; the settings, matcher and cache went to each worker at startup
+            futures = [
+                (sku, files, executor.submit(_process_sku_group_in_worker, sku, files, output_folder,
+                                             self._resumed_indices(sku, files, output_folder)))
+                for sku, files in sku_groups
+            ]
+            for sku, files, future in futures:
                 try:
-                    # Open and process image
-                    logger.info(f"    🖼️  Processing: {img_file.name}")
-                    
-                    image = Image.open(img_file)
-                    
-                    # Convert to RGBA if needed
-                    if image.mode != 'RGBA':
-                        image = image.convert('RGBA')
-                    
-                    # Add padding
-                    image = self.add_padding(image)
-                    
-                    # Save main image
-                    output_filename = f"{sku}_{idx}.webp"
-                    output_file = output_folder / output_filename
-                    
-                    image.save(output_file, 'WEBP', quality=self.quality)
-                    logger.info(f"    ✅ Saved as: {output_filename}")
-                    
-                    # Create 400x400 variant
-                    thumb = image.copy()
-                    thumb.thumbnail((400, 400), Image.Resampling.LANCZOS)
-                    
-                    # Center in 400x400 canvas
-                    canvas = Image.new('RGBA', (400, 400), (0, 0, 0, 0))
-                    x = (400 - thumb.width) // 2
-                    y = (400 - thumb.height) // 2
-                    canvas.paste(thumb, (x, y), thumb)
-                    
-                    thumb_filename = f"{sku}_{idx}_400x400.webp"
-                    thumb_file = output_folder / thumb_filename
-                    canvas.save(thumb_file, 'WEBP', quality=self.quality)
-                    logger.info(f"    ✅ Created variant: {thumb_filename}")
-                    
-                    stats['processed'] += 1
-                    
+                    group_stats, completed, cache_changes = future.result()
                 except Exception as e:
-                    logger.error(f"    ❌ Failed: {str(e)}")
-                    stats['failed'] += 1
+                    logger.error(f"  ❌ Worker failed for SKU {sku}: {str(e)}")
+                    group_stats, completed, cache_changes = {'failed': len(files)}, [], []
+                self._merge_group(stats, sku, group_stats, completed, cache_changes)
+        else:
+            for sku, files in sku_groups:
+                group_stats, completed, cache_changes = self._process_sku_group(
+                    sku, files, output_folder, self._resumed_indices(sku, files, output_folder)
+                )
+                self._merge_group(stats, sku, group_stats, completed, cache_changes)
+    
+    def _resumed_indices(self, sku, files, output_folder):
+        """Image numbers in this SKU group that an interrupted earlier run already finished."""
+        if self.journal is None:
+            return frozenset()
+        return frozenset(
+            idx for idx in range(1, len(files) + 1)
+            if self.journal.lookup(variant_path(output_folder / f"{sku}_{idx}", VARIANT_SPECS[0])) is not None
+        )
+    
+    def _merge_group(self, stats, sku, group_stats, completed, cache_changes):
+        """Fold a SKU group's stats and cache use into the run totals and journal the images it finished."""
+        for key, value in group_stats.items():
+            stats[key] += value
+        if self.cache is not None:
+            self.cache.merge(cache_changes)
+        if self.journal is not None:
+            for idx, paths, digests in completed:
+                self.journal.record(sku, idx, paths, digests)
+    
+    def _process_sku_group(self, sku, files, output_folder, resumed=frozenset()):
+        """
+        Process all images for one SKU.
+        
+        Image numbers in ``resumed`` are already done and are skipped. Returns the
+        group's stats, the (index, output paths, output digests) of every image it
+        finished, and, when run in a worker, its cache hits and stores for the
+        parent's cache index.
+        """
+        stats = {'processed': 0, 'failed': 0, 'resumed': 0, 'cache_hits': 0, 'cache_misses': 0}
+        completed = []
+        logger.info(f"  📦 SKU: {sku} ({len(files)} images)")
+        
+        # Sort files for consistent numbering
+        files = sorted(files, key=lambda x: x.name.lower())
+        
+        for idx, img_file in enumerate(files, 1):
+            if idx in resumed:
+                logger.info(f"    ⏩ Finished before restart: {img_file.name}")
+                stats['resumed'] += 1
+                stats['processed'] += 1
+                continue
+            
+            try:
+                base_path = output_folder / f"{sku}_{idx}"
+                paths = {spec.name: variant_path(base_path, spec) for spec in VARIANT_SPECS}
+                
+                # Reuse earlier outputs if this exact source was processed with the same settings
+                cache_key = None
+                if self.cache is not None:
+                    cache_key = self.cache.key_for(img_file.read_bytes(), self.cache_params())
+                    cached = self.cache.restore(cache_key, paths)
+                    if cached is not None:
+                        logger.info(f"    ♻️  Cache hit: {img_file.name} -> {paths['main'].name}")
+                        stats['cache_hits'] += 1
+                        stats['processed'] += 1
+                        completed.append((idx, paths, cached['sha256']))
+                        continue
+                    stats['cache_misses'] += 1
+                
+                # Open and process image
+                logger.info(f"    🖼️  Processing: {img_file.name}")
+                
+                # Save main image and the 400x400 variant from the one padded frame
+                _, encoded = self.core.process(img_file)
+                write_variants(encoded, VARIANT_SPECS, base_path)
+                digests = output_digests(encoded)
+                logger.info(f"    ✅ Saved as: {paths['main'].name}")
+                logger.info(f"    ✅ Created variant: {paths['400x400'].name}")
+                
+                if cache_key is not None:
+                    self.cache.store(cache_key, paths, {'sha256': digests})
+                
+                stats['processed'] += 1
+                completed.append((idx, paths, digests))
+                
+            except Exception as e:
+                logger.error(f"    ❌ Failed: {str(e)}")
+                stats['failed'] += 1
+        
+        cache_changes = self.cache.take_changes() if self.cache is not None else []
+        return stats, completed, cache_changes
+
+# The processor a worker process was handed when it started (see _init_worker)
+_worker_processor = None
+
+def _init_worker(processor):
+    """Pool initializer: keep the processor's settings, SKU matcher and cache for every task this worker runs."""
+    global _worker_processor
+    # A forked worker inherits the parent's objects as they are, not the pickled state __getstate__ gives:
+    # it must never write the journal, and its cache only records what it does for the parent to merge
+    processor.journal = None
+    if processor.cache is not None:
+        processor.cache = processor.cache.worker_copy()
+    _worker_processor = processor
+
+def _process_sku_group_in_worker(sku, files, output_folder, resumed):
+    """Run one SKU group in a worker process with the processor it was started with."""
+    return _worker_processor._process_sku_group(sku, files, output_folder, resumed)
 
 def main():
     parser = argparse.ArgumentParser(
@@ -191,6 +291,20 @@ def main():
     parser.add_argument('--brand', help='Brand name (for flat folder structure)')
     parser.add_argument('--padding', type=int, default=50, help='Padding in pixels')
     parser.add_argument('--quality', type=int, default=85, help='WebP quality')
+    parser.add_argument('--speed', choices=list(ENCODER_SPEEDS), default='default',
+                        help='WebP encoder speed preset (fastest = quickest encode, small = smallest files)')
+    parser.add_argument('--lossless-flat', action='store_true', help='Encode flat-colour artwork losslessly')
+    parser.add_argument('--target-kb', type=int, help='Lower quality as needed to keep each file under this size')
+    parser.add_argument('--trim', action='store_true', help='Trim transparent/near-white borders before padding')
+    parser.add_argument('--max-size', help='Downscale sources larger than WIDTHxHEIGHT (e.g., 1200x1200)')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes for encoding (default: 1)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip images an interrupted earlier run into the same output already finished')
+    parser.add_argument('--journal', help='Checkpoint journal path (default: <output>/.checkpoint.jsonl)')
+    parser.add_argument('--items', help='Zoho items export (e.g. items_data.json); filenames are matched to its SKUs')
+    parser.add_argument('--no-cache', action='store_true', help='Reprocess every image, ignoring the processing cache')
+    parser.add_argument('--cache-dir', default=str(DEFAULT_CACHE_DIR), help='Processing cache directory')
+    parser.add_argument('--cache-size-mb', type=int, default=DEFAULT_CACHE_SIZE_MB, help='Processing cache size limit')
     
     args = parser.parse_args()
     
@@ -200,18 +314,55 @@ def main():
     logger.info("   2. Flat: input/images (use --brand flag)")
     logger.info("")
     
+    # Parse max size if provided
+    max_size = None
+    if args.max_size:
+        try:
+            width, height = map(int, args.max_size.lower().split('x'))
+            max_size = (width, height)
+        except ValueError:
+            logger.error(f"❌ Invalid max size: {args.max_size}. Use WIDTHxHEIGHT (e.g., 1200x1200)")
+            return 1
+    
     # Check input exists
     if not Path(args.input).exists():
         logger.error(f"❌ Input folder not found: {args.input}")
         return 1
     
     # Process
+    cache = None
+    if not args.no_cache:
+        cache = ProcessingCache(Path(args.cache_dir), max_bytes=args.cache_size_mb * 1024 * 1024)
+    
+    encoder = EncoderProfile(
+        quality=args.quality,
+        speed=args.speed,
+        lossless_flat=args.lossless_flat,
+        target_bytes=args.target_kb * 1024 if args.target_kb else None
+    )
+    
     processor = ProductImageProcessor(
         padding=args.padding,
-        quality=args.quality
+        workers=args.workers,
+        cache=cache,
+        max_size=max_size,
+        trim=args.trim,
+        encoder=encoder,
+        sku_matcher=SkuMatcher.from_items(Path(args.items) if args.items else None)
     )
     
-    stats = processor.process_and_organize(args.input, args.output, args.brand)
+    # Every run keeps a journal so that it can be resumed if it is interrupted
+    processor.journal = CheckpointJournal(
+        Path(args.journal) if args.journal else Path(args.output) / '.checkpoint.jsonl',
+        {**processor.cache_params(), 'output': str(Path(args.output).resolve())},
+        resume=args.resume
+    )
+    try:
+        stats = processor.process_and_organize(args.input, args.output, args.brand)
+    except BaseException:
+        processor.journal.close()
+        raise
+    processor.journal.close(completed=True)
     
     if stats['processed'] > 0:
         logger.info(f"\n✨ Processing complete! Check '{args.output}' folder")
@@ -5,15 +5,19 @@ Processes, renames, and organizes images without background removal
 Perfect for ProductCard image preparation
 """
 
-import os
 import re
-import shutil
+import sys
 from pathlib import Path
-from PIL import Image, ImageOps
-import numpy as np
 import argparse
 import logging
 
+# Shared pipeline modules live alongside the Zoho processor
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'image-processing'))
+from image_engine import EncoderProfile, VariantSpec, compose_variants
+from processing_core import ProcessingCore, TransformSettings
+
+VARIANT_SPECS = [VariantSpec('main'), VariantSpec.sized(400, 400)]
+
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger(__name__)
 
@@ -21,19 +25,13 @@ class ProductImageProcessor:
     def __init__(self, padding=50, quality=85):
         self.padding = padding
         self.quality = quality
+        self.core = ProcessingCore(TransformSettings(padding), VARIANT_SPECS, EncoderProfile(quality=quality))
     
     def add_padding(self, image):
         """Add transparent padding around image."""
         if image.mode != 'RGBA':
             image = image.convert('RGBA')
-            
-        width, height = image.size
-        new_size = (width + 2 * self.padding, height + 2 * self.padding)
-        
-        padded = Image.new('RGBA', new_size, (0, 0, 0, 0))
-        padded.paste(image, (self.padding, self.padding), image)
-        
-        return padded
+        return compose_variants(image, self.padding, [VariantSpec('main')])['main']
     
     def process_and_organize(self, input_folder, output_folder):
         """Process images and organize by brand with correct naming."""
@@ -96,36 +94,10 @@ class ProductImageProcessor:
                         # Open and process image
                         logger.info(f"    🖼️  Processing: {img_file.name}")
                         
-                        image = Image.open(img_file)
-                        
-                        # Convert to RGBA if needed (preserves original image)
-                        if image.mode != 'RGBA':
-                            image = image.convert('RGBA')
-                        
-                        # Add padding
-                        image = self.add_padding(image)
-                        
-                        # Save with correct naming
-                        output_filename = f"{sku}_{idx}.webp"
-                        output_file = brand_output / output_filename
-                        
-                        image.save(output_file, 'WEBP', quality=self.quality)
-                        logger.info(f"    ✅ Saved as: {output_filename}")
-                        
-                        # Create 400x400 variant
-                        thumb = image.copy()
-                        thumb.thumbnail((400, 400), Image.Resampling.LANCZOS)
-                        
-                        # Center in 400x400 canvas
-                        canvas = Image.new('RGBA', (400, 400), (0, 0, 0, 0))
-                        x = (400 - thumb.width) // 2
-                        y = (400 - thumb.height) // 2
-                        canvas.paste(thumb, (x, y), thumb)
-                        
-                        thumb_filename = f"{sku}_{idx}_400x400.webp"
-                        thumb_file = brand_output / thumb_filename
-                        canvas.save(thumb_file, 'WEBP', quality=self.quality)
-                        logger.info(f"    ✅ Created variant: {thumb_filename}")
+                        # Pad, then save the main image and its 400x400 variant with correct naming
+                        self.core.process_file(img_file, brand_output / f"{sku}_{idx}")
+                        logger.info(f"    ✅ Saved as: {sku}_{idx}.webp")
+                        logger.info(f"    ✅ Created variant: {sku}_{idx}_400x400.webp")
                         
                         stats['processed'] += 1
                         
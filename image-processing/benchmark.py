@@ -0,0 +1,1272 @@
+#!/usr/bin/env python3
+"""
+Image Pipeline Benchmarks
+Times the image processing hot paths against synthetic fixtures
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import time
+import statistics
+import subprocess
+import shutil
+import argparse
+import logging
+import random
+import resource
+import string
+import importlib.util
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import requests
+from PIL import Image
+
+from http_validators import ValidatorStore
+from image_engine import (ENCODER_SPEEDS, TRANSPARENT, WHITE, EncoderProfile, VariantSpec, compose_variants,
+                          encode_image, encode_variants, open_image, trim_to_content)
+from processing_core import ProcessingCore, TransformSettings
+from rename_plan import TEMP_SUFFIX, apply_plan, plan_renames
+from sku_index import SkuMatcher
+from zoho_faire_processor import DEFAULT_MEMORY_LIMIT_MB, ZohoFaireImageProcessor
+
+logger = logging.getLogger(__name__)
+
+PROCESSOR_SCRIPT = Path(__file__).resolve().parent / 'zoho_faire_processor.py'
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+ALL_IN_ONE_SCRIPT = SCRIPTS_DIR / 'all-in-one-processor-fixed.py'
+
+# How each fixture mode is stored, matching what suppliers actually send
+FIXTURE_FORMATS = {'RGB': 'jpg', 'L': 'jpg', 'RGBA': 'png', 'P': 'png'}
+
+
+def make_fixture_images(folder: Path, count: int, size: Tuple[int, int] = (800, 600)) -> List[Path]:
+    """Write ``count`` distinct JPEG fixtures into ``folder``."""
+    folder.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(count):
+        shade = (i * 37) % 200
+        image = Image.new('RGB', size, (255, 255, 255))
+        image.paste((shade, 90, 255 - shade), (size[0] // 6, size[1] // 6, size[0] * 5 // 6, size[1] * 5 // 6))
+        path = folder / f"fixture{i:04d}.jpg"
+        image.save(path, 'JPEG', quality=90)
+        paths.append(path)
+    return paths
+
+
+def make_fixture_catalog(folder: Path, count: int, sizes: Sequence[Tuple[int, int]],
+                         modes: Sequence[str]) -> List[Path]:
+    """
+    Write ``count`` fixtures cycling through every size and colour mode.
+
+    Files are named ``<sku>_<n>.<ext>`` with two images per SKU, so the same
+    folder works as input for both processors.
+    """
+    folder.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(count):
+        size = sizes[i % len(sizes)]
+        mode = modes[(i // len(sizes)) % len(modes)]
+        shade = (i * 37) % 200
+        image = Image.new('RGBA', size, (255, 255, 255, 0 if mode == 'RGBA' else 255))
+        image.paste((shade, 90, 255 - shade, 255),
+                    (size[0] // 6, size[1] // 6, size[0] * 5 // 6, size[1] * 5 // 6))
+        if mode == 'P':
+            image = image.convert('RGB').convert('P', palette=Image.Palette.ADAPTIVE)
+        elif mode != 'RGBA':
+            image = image.convert(mode)
+        path = folder / f"sku{i // 2:04d}_{i % 2 + 1}.{FIXTURE_FORMATS[mode]}"
+        if mode in ('RGB', 'L'):
+            image.save(path, quality=90)
+        else:
+            image.save(path)
+        paths.append(path)
+    return paths
+
+
+def make_photo_image(size: Tuple[int, int], seed: int = 0) -> Image.Image:
+    """A photo-like fixture: a lit gradient with sensor noise, which defeats lossless coding."""
+    gradient = Image.linear_gradient('L').resize(size)
+    channels = [
+        Image.blend(gradient.rotate(90 * (i + seed)), Image.effect_noise(size, 40 + 10 * i), 0.12)
+        for i in range(3)
+    ]
+    return Image.merge('RGB', channels)
+
+
+def make_flat_image(size: Tuple[int, int]) -> Image.Image:
+    """A flat-colour fixture, like a logo or a line-art packshot on transparency."""
+    image = Image.new('RGBA', size, (0, 0, 0, 0))
+    for i, colour in enumerate([(200, 30, 40, 255), (20, 90, 200, 255), (250, 200, 0, 255)]):
+        inset = size[0] // 8 * (i + 1)
+        image.paste(colour, (inset, inset, size[0] - inset, size[1] - inset))
+    return image
+
+
+def _parse_sizes(value: str) -> List[Tuple[int, int]]:
+    return [tuple(int(n) for n in size.lower().split('x')) for size in value.split(',') if size.strip()]
+
+
+def _load_all_in_one():
+    """Import all-in-one-processor-fixed.py, whose hyphenated name rules out a plain import."""
+    spec = importlib.util.spec_from_file_location('all_in_one_processor_fixed', ALL_IN_ONE_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class _FixtureHandler(SimpleHTTPRequestHandler):
+    """Static file handler that adds a fixed delay to stand in for WAN latency."""
+    latency = 0.0
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _ValidatingHandler(_FixtureHandler):
+    """
+    Static file handler that answers conditional requests the way a CDN does.
+
+    With ``use_etag`` every file gets an ETag from its mtime and size and a
+    matching If-None-Match gets a 304; If-Modified-Since is handled by the
+    stdlib handler either way. Responses and body bytes go into ``stats``.
+    """
+    use_etag = True
+    stats: Dict[str, int] = {}
+    stats_lock = threading.Lock()
+
+    def _etag(self) -> Optional[str]:
+        try:
+            st = os.stat(self.translate_path(self.path))
+        except OSError:
+            return None
+        return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+    def do_GET(self):
+        self._current_etag = self._etag() if self.use_etag else None
+        if self._current_etag and self.headers.get('If-None-Match') == self._current_etag:
+            if self.latency:
+                time.sleep(self.latency)
+            self.send_response(304)
+            self.end_headers()
+            return
+        super().do_GET()
+
+    def send_response(self, code, message=None):
+        with self.stats_lock:
+            self.stats[str(code)] = self.stats.get(str(code), 0) + 1
+        super().send_response(code, message)
+
+    def end_headers(self):
+        if getattr(self, '_current_etag', None):
+            self.send_header('ETag', self._current_etag)
+        super().end_headers()
+
+    def copyfile(self, source, outputfile):
+        with self.stats_lock:
+            self.stats['bytes'] = self.stats.get('bytes', 0) + os.fstat(source.fileno()).st_size
+        super().copyfile(source, outputfile)
+
+
+@contextmanager
+def serve_directory(folder: Path, latency: float = 0.0, handler_class: type = _FixtureHandler,
+                    **attributes) -> Iterator[str]:
+    """Serve ``folder`` over HTTP on localhost, yielding the base URL; ``attributes`` are set on the handler."""
+    handler = type('FixtureHandler', (handler_class,), {'latency': latency, **attributes})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(handler, directory=str(folder)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def serial_download_baseline(processor: ZohoFaireImageProcessor, products: List[Dict], output_dir: Path) -> int:
+    """The original loop: a fresh request per image, a temp file, then process."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    processed = 0
+    for product in products:
+        sku = product['sku'].lower()
+        for idx, url in enumerate(product['images'], 1):
+            response = requests.get(url, stream=True, timeout=30)
+            response.raise_for_status()
+            temp_path = output_dir / f"temp_{sku}_{idx}.jpg"
+            with open(temp_path, 'wb') as f:
+                shutil.copyfileobj(response.raw, f)
+            if processor.process_image(temp_path, sku, idx, output_dir)['success']:
+                processed += 1
+            temp_path.unlink()
+    return processed
+
+
+def bench_downloads(args) -> Dict:
+    """Compare the serial download loop with the concurrent fetch stage."""
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        fixtures = make_fixture_images(tmp / 'fixtures', args.images)
+
+        with serve_directory(tmp / 'fixtures', latency=args.latency_ms / 1000) as base_url:
+            products = [
+                {'sku': f"bench{i:04d}", 'name': f"Bench {i}", 'images': [f"{base_url}/{path.name}"]}
+                for i, path in enumerate(fixtures)
+            ]
+
+            processor = ZohoFaireImageProcessor(padding=args.padding, quality=args.quality)
+            start = time.perf_counter()
+            serial_count = serial_download_baseline(processor, products, tmp / 'serial')
+            serial_seconds = time.perf_counter() - start
+
+            processor = ZohoFaireImageProcessor(
+                padding=args.padding,
+                quality=args.quality,
+                download_workers=args.workers,
+                per_host_limit=args.per_host
+            )
+            start = time.perf_counter()
+            results = processor.process_zoho_products(products, tmp / 'concurrent')
+            concurrent_seconds = time.perf_counter() - start
+
+    return {
+        'benchmark': 'downloads',
+        'images': args.images,
+        'latency_ms': args.latency_ms,
+        'workers': args.workers,
+        'per_host': args.per_host,
+        'serial': {'seconds': round(serial_seconds, 3), 'processed': serial_count},
+        'concurrent': {'seconds': round(concurrent_seconds, 3), 'processed': results['processed_images']},
+        'speedup': round(serial_seconds / concurrent_seconds, 2) if concurrent_seconds else None
+    }
+
+
+def bench_revalidation(args) -> Dict:
+    """
+    Re-run a catalog against a server that answers conditional requests.
+
+    Runs a cold sync, a second sync downloading everything again, a second sync
+    revalidating with the stored validators, then one more after ``--changed``
+    fixtures were rewritten on the server. Only the changed images should be
+    downloaded and processed again, and the unchanged outputs must not move.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        fixtures = make_fixture_images(tmp / 'fixtures', args.images, (args.width, args.height))
+        output_dir = tmp / 'out'
+        store_path = tmp / 'validators.json'
+        stats: Dict[str, int] = {}
+
+        with serve_directory(tmp / 'fixtures', latency=args.latency_ms / 1000, handler_class=_ValidatingHandler,
+                             use_etag=args.validator == 'etag', stats=stats) as base_url:
+            products = [
+                {'sku': f"bench{i:04d}", 'name': f"Bench {i}", 'images': [f"{base_url}/{path.name}"]}
+                for i, path in enumerate(fixtures)
+            ]
+
+            def run(validators: Optional[ValidatorStore]) -> Dict:
+                processor = ZohoFaireImageProcessor(
+                    padding=args.padding,
+                    quality=args.quality,
+                    download_workers=args.workers,
+                    per_host_limit=args.workers,
+                    validators=validators
+                )
+                stats.clear()
+                start = time.perf_counter()
+                results = processor.process_zoho_products(products, output_dir)
+                seconds = time.perf_counter() - start
+                if validators is not None:
+                    validators.save()
+                return {
+                    'seconds': round(seconds, 3),
+                    'images': results['metrics']['images'],
+                    'responses': {code: count for code, count in stats.items() if code != 'bytes'},
+                    'bytes_downloaded': stats.get('bytes', 0),
+                    'bytes_saved': results.get('http_validators', {}).get('bytes_saved', 0)
+                }
+
+            def outputs() -> Dict[str, bytes]:
+                return {path.name: path.read_bytes() for path in output_dir.glob('*.webp')}
+
+            cold = run(ValidatorStore(store_path))
+            first_outputs = outputs()
+            full_refetch = run(None)
+            conditional = run(ValidatorStore(store_path))
+            unchanged = outputs() == first_outputs
+
+            # Rewrite some fixtures in place, as a supplier re-uploading a photo would
+            changed = fixtures[:args.changed]
+            for i, path in enumerate(changed):
+                Image.new('RGB', (args.width, args.height), (40, 40 + i % 200, 90)).save(path, 'JPEG', quality=90)
+                later = path.stat().st_mtime + 10
+                os.utime(path, (later, later))
+            after_change = run(ValidatorStore(store_path))
+            rewritten = {name for name, data in outputs().items() if first_outputs.get(name) != data}
+            changed_skus = {f"bench{i:04d}" for i in range(len(changed))}
+            expected = {name for name in first_outputs if name.split('_')[0] in changed_skus}
+
+    passed = (unchanged and conditional['images'].get('not_modified') == args.images
+              and after_change['images'].get('processed', 0) == len(changed)
+              and rewritten == expected)
+    return {
+        'benchmark': 'revalidation',
+        'images': args.images,
+        'validator': args.validator,
+        'latency_ms': args.latency_ms,
+        'cold': cold,
+        'full_refetch': full_refetch,
+        'conditional': conditional,
+        'after_change': {**after_change, 'changed': len(changed)},
+        'speedup': round(full_refetch['seconds'] / conditional['seconds'], 2) if conditional['seconds'] else None,
+        'passed': passed
+    }
+
+
+def _latency_summary(samples: List[float]) -> Dict:
+    samples = sorted(samples)
+    return {
+        'mean_ms': round(statistics.mean(samples) * 1000, 1),
+        'p50_ms': round(samples[len(samples) // 2] * 1000, 1),
+        'max_ms': round(samples[-1] * 1000, 1)
+    }
+
+
+def bench_worker(args) -> Dict:
+    """Per-image latency of spawning the processor per call vs one warm --worker process."""
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        fixtures = make_fixture_images(tmp / 'fixtures', args.images)
+        common = ['--no-cache', '--padding', str(args.padding), '--quality', str(args.quality)]
+
+        spawn_samples = []
+        for i, path in enumerate(fixtures):
+            product_file = tmp / f"product{i}.json"
+            product_file.write_text(json.dumps([{'sku': f"spawn{i}", 'image_url': str(path)}]))
+            start = time.perf_counter()
+            subprocess.run(
+                [sys.executable, str(PROCESSOR_SCRIPT), '--input', str(product_file), '--output', str(tmp / 'spawn')] + common,
+                check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            spawn_samples.append(time.perf_counter() - start)
+
+        worker = subprocess.Popen(
+            [sys.executable, str(PROCESSOR_SCRIPT), '--worker'] + common,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        )
+        worker.stdout.readline()  # ready event; startup is paid once and not counted per image
+        worker_samples = []
+        for i, path in enumerate(fixtures):
+            request = {'id': i, 'input': str(path), 'output_dir': str(tmp / 'worker'), 'sku': f"worker{i}"}
+            start = time.perf_counter()
+            worker.stdin.write(json.dumps(request) + '\n')
+            worker.stdin.flush()
+            response = json.loads(worker.stdout.readline())
+            worker_samples.append(time.perf_counter() - start)
+            if not response['success']:
+                raise RuntimeError(response['error'])
+        worker.stdin.close()
+        worker.wait()
+
+    spawn_stats = _latency_summary(spawn_samples)
+    worker_stats = _latency_summary(worker_samples)
+    return {
+        'benchmark': 'worker',
+        'images': args.images,
+        'spawn_per_call': spawn_stats,
+        'persistent_worker': worker_stats,
+        'speedup': round(spawn_stats['mean_ms'] / worker_stats['mean_ms'], 2)
+    }
+
+
+def _run_measured(fn: Callable[[], None], iterations: int, conn):
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    conn.send((elapsed / iterations, peak, max(0, peak - baseline)))
+    conn.close()
+
+
+def measure(fn: Callable[[], None], iterations: int = 5, images: int = 1) -> Dict:
+    """
+    Time ``fn`` per image and its peak RSS, in a fresh forked process.
+
+    ``images`` is how many images one call of ``fn`` handles, for whole-run
+    benchmarks; RSS is reported both as the process peak and as growth over the
+    forked baseline, which is what the measured code itself allocated.
+    """
+    context = multiprocessing.get_context('fork')
+    parent_conn, child_conn = context.Pipe()
+    process = context.Process(target=_run_measured, args=(fn, iterations, child_conn))
+    process.start()
+    seconds, peak_kb, growth_kb = parent_conn.recv()
+    process.join()
+    per_image = seconds / images
+    return {
+        'ms_per_image': round(per_image * 1000, 2),
+        'images_per_sec': round(1 / per_image, 1) if per_image else None,
+        'peak_rss_kb': peak_kb,
+        'peak_rss_growth_kb': growth_kb
+    }
+
+
+def legacy_thumbnails(image: Image.Image, sizes: List[Tuple[int, int]]) -> Dict:
+    """The old create_thumbnail: copy the full frame and shrink it once per size."""
+    out = {}
+    for size in sizes:
+        thumb = image.copy()
+        thumb.thumbnail(size, Image.Resampling.LANCZOS)
+        canvas = Image.new('RGBA', size, (0, 0, 0, 0))
+        canvas.paste(thumb, ((size[0] - thumb.width) // 2, (size[1] - thumb.height) // 2), thumb)
+        out[size] = canvas
+    return out
+
+
+def legacy_reopen_variants(path: Path, sizes: List[Tuple[int, int]]) -> Dict:
+    """The old create_size_variants: reopen and decode the saved image once per size."""
+    out = {}
+    for size in sizes:
+        img = Image.open(path)
+        img.thumbnail(size, Image.Resampling.LANCZOS)
+        canvas = Image.new('RGBA', size, (0, 0, 0, 0))
+        canvas.paste(img, ((size[0] - img.width) // 2, (size[1] - img.height) // 2), img)
+        out[size] = canvas
+    return out
+
+
+def bench_variants(args) -> Dict:
+    """Per-size rendering paths vs the single-decode variant pyramid."""
+    sizes = [tuple(int(n) for n in size.split('x')) for size in args.sizes.split(',')]
+    specs = [VariantSpec.sized(*size) for size in sizes]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = ZohoFaireImageProcessor(padding=args.padding).add_padding(
+            Image.open(make_fixture_images(Path(tmp), 1, size=(args.width, args.height))[0]).convert('RGBA')
+        )
+        saved = Path(tmp) / 'main.webp'
+        source.save(saved, 'WEBP', quality=args.quality)
+
+        def engine_from_file():
+            with Image.open(saved) as img:
+                img.load()
+                compose_variants(img, 0, specs)
+
+        return {
+            'benchmark': 'variants',
+            'source_size': list(source.size),
+            'sizes': [list(size) for size in sizes],
+            'in_memory': {
+                'legacy_copy_per_size': measure(lambda: legacy_thumbnails(source, sizes), args.iterations),
+                'engine': measure(lambda: compose_variants(source, 0, specs), args.iterations)
+            },
+            'from_saved_webp': {
+                'legacy_decode_per_size': measure(lambda: legacy_reopen_variants(saved, sizes), args.iterations),
+                'engine_single_decode': measure(engine_from_file, args.iterations)
+            }
+        }
+
+
+@contextmanager
+def count_image_allocations() -> Iterator[Dict]:
+    """Tally every image Pillow allocates inside the block: canvases, copies, conversions and resizes."""
+    tally = {'images': 0, 'bytes': 0}
+    original = Image.Image._new
+
+    def counting_new(self, im):
+        image = original(self, im)
+        tally['images'] += 1
+        tally['bytes'] += image.width * image.height * len(image.getbands())
+        return image
+
+    Image.Image._new = counting_new
+    try:
+        yield tally
+    finally:
+        Image.Image._new = original
+
+
+def bench_compositing(args) -> Dict:
+    """Pad-then-resize rendering against geometry-first compositing, for time and allocated pixel memory."""
+    size = (args.width, args.height)
+    fixtures = {
+        'photo': make_photo_image(size).convert('RGBA'),
+        'flat_artwork': make_flat_image(size)
+    }
+    scenarios = {
+        'main_and_400x400': [VariantSpec('main'), VariantSpec.sized(400, 400)],
+        'main_and_400x400_150x150': [VariantSpec('main'), VariantSpec.sized(400, 400), VariantSpec.sized(150, 150)],
+        'fitted_400x400_only': [VariantSpec('main', (400, 400))]
+    }
+
+    def copy_per_size(image, specs):
+        padded = legacy_prepare(image, args.padding)
+        legacy_thumbnails(padded, [spec.size for spec in specs if spec.size])
+        return padded
+
+    paths = {
+        'legacy_copy_per_size': copy_per_size,
+        'geometry_first': lambda image, specs: compose_variants(image, args.padding, specs)
+    }
+    report = {}
+    for fixture, image in fixtures.items():
+        for scenario, specs in scenarios.items():
+            results = {}
+            for label, render in paths.items():
+                with count_image_allocations() as tally:
+                    render(image, specs)
+                results[label] = {
+                    **measure(partial(render, image, specs), args.iterations),
+                    'allocated_images': tally['images'],
+                    'allocated_mb': round(tally['bytes'] / 1e6, 2)
+                }
+            report[f"{fixture}/{scenario}"] = results
+
+    return {
+        'benchmark': 'compositing',
+        'pillow': Image.__version__,
+        'source_size': list(size),
+        'padding': args.padding,
+        'cases': report
+    }
+
+
+def bench_opaque(args) -> Dict:
+    """Always-RGBA processing against the mode-aware path, over a mostly-JPEG catalog."""
+    sizes, modes = _parse_sizes(args.sizes), args.modes.split(',')
+    max_size = (args.max_size, args.max_size)
+    specs = [VariantSpec('main'), VariantSpec.sized(400, 400)]
+    encoder = EncoderProfile(quality=args.quality)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixtures = make_fixture_catalog(Path(tmp), args.images, sizes, modes)
+        report = {}
+        for label, background in (('transparent', TRANSPARENT), ('white', WHITE)):
+            core = ProcessingCore(TransformSettings(args.padding, max_size, background=background), specs, encoder)
+
+            def always_rgba():
+                """The path before: every source converted to RGBA and pasted through its alpha mask."""
+                out = 0
+                for path in fixtures:
+                    image = core.open(path).convert('RGBA')
+                    if image.width > max_size[0] or image.height > max_size[1]:
+                        image.thumbnail(max_size, Image.Resampling.LANCZOS)
+                    rendered = compose_variants(image, args.padding, specs, background)
+                    out += sum(len(data) for data in encode_variants(rendered, specs, encoder).values())
+                return out
+
+            def mode_aware():
+                return sum(len(data) for path in fixtures for data in core.process(path)[1].values())
+
+            results = {}
+            for name, run in (('always_rgba', always_rgba), ('mode_aware', mode_aware)):
+                with count_image_allocations() as tally:
+                    bytes_out = run()
+                results[name] = {
+                    **measure(run, args.iterations, images=len(fixtures)),
+                    'allocated_mb_per_image': round(tally['bytes'] / 1e6 / len(fixtures), 2),
+                    'bytes_out': bytes_out
+                }
+            report[f"{label}_background"] = results
+
+    return {
+        'benchmark': 'opaque',
+        'pillow': Image.__version__,
+        'images': len(fixtures),
+        'sizes': [list(size) for size in sizes],
+        'modes': modes,
+        'cases': report
+    }
+
+
+def bench_decode(args) -> Dict:
+    """Full-resolution decode vs draft-mode decode of an oversized supplier JPEG."""
+    max_size = (args.max_size, args.max_size)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_fixture_images(Path(tmp), 1, size=(args.width, args.height))[0]
+
+        def full_decode():
+            image = Image.open(path).convert('RGBA')
+            image.thumbnail(max_size, Image.Resampling.LANCZOS)
+
+        def draft_decode():
+            image = open_image(path, max_size).convert('RGBA')
+            image.thumbnail(max_size, Image.Resampling.LANCZOS)
+
+        return {
+            'benchmark': 'decode',
+            'source_size': [args.width, args.height],
+            'max_size': list(max_size),
+            'full_decode': measure(full_decode, args.iterations),
+            'draft_decode': measure(draft_decode, args.iterations)
+        }
+
+
+def bench_stages(args) -> Dict:
+    """Time each pipeline stage on its own for every fixture size and mode."""
+    max_size = (args.max_size, args.max_size)
+    processor = ZohoFaireImageProcessor(padding=args.padding, quality=args.quality, max_size=max_size)
+    specs = [spec for spec in processor.variant_specs() if spec.size]
+    sizes, modes = _parse_sizes(args.sizes), args.modes.split(',')
+    cases = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixtures = make_fixture_catalog(Path(tmp), len(sizes) * len(modes), sizes, modes)
+        for path in fixtures:
+            # Each stage gets the previous stage's output prepared up front, so only it is timed
+            decoded = open_image(path, max_size)
+            decoded.load()
+            rgba = decoded.convert('RGBA')
+            fitted = rgba.copy()
+            fitted.thumbnail(max_size, Image.Resampling.LANCZOS)
+            padded = processor.add_padding(fitted)
+
+            def decode():
+                open_image(path, max_size).load()
+
+            def resize():
+                rgba.copy().thumbnail(max_size, Image.Resampling.LANCZOS)
+
+            def webp_encode():
+                padded.save(io.BytesIO(), 'WEBP', quality=args.quality)
+
+            with Image.open(path) as source:
+                source_info = {'mode': source.mode, 'size': list(source.size), 'format': source.format}
+            cases.append({
+                'source': source_info,
+                'stages': {
+                    'decode': measure(decode, args.iterations),
+                    'rgba_convert': measure(lambda: decoded.convert('RGBA'), args.iterations),
+                    'resize': measure(resize, args.iterations),
+                    'add_padding': measure(lambda: processor.add_padding(fitted), args.iterations),
+                    'variants': measure(lambda: compose_variants(padded, 0, specs), args.iterations),
+                    'webp_encode': measure(webp_encode, args.iterations)
+                }
+            })
+
+    return {
+        'benchmark': 'stages',
+        'pillow': Image.__version__,
+        'max_size': list(max_size),
+        'quality': args.quality,
+        'cases': cases
+    }
+
+
+def bench_pipeline(args) -> Dict:
+    """Whole runs of process_zoho_products and all-in-one process_and_organize over one catalog."""
+    sizes, modes = _parse_sizes(args.sizes), args.modes.split(',')
+    all_in_one = _load_all_in_one()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        fixtures = make_fixture_catalog(tmp / 'catalog', args.images, sizes, modes)
+        products = {}
+        for path in fixtures:
+            sku = path.stem.split('_')[0]
+            products.setdefault(sku, {'sku': sku, 'name': sku, 'images': []})['images'].append(str(path))
+
+        def zoho_run():
+            processor = ZohoFaireImageProcessor(padding=args.padding, quality=args.quality,
+                                                memory_limit_mb=args.memory_mb)
+            processor.process_zoho_products(list(products.values()), tmp / 'zoho', download_images=False)
+
+        def all_in_one_run():
+            processor = all_in_one.ProductImageProcessor(
+                padding=args.padding, quality=args.quality, workers=args.workers,
+                max_size=(args.max_size, args.max_size)
+            )
+            processor.process_and_organize(tmp / 'catalog', tmp / 'all-in-one', brand='bench')
+
+        return {
+            'benchmark': 'pipeline',
+            'pillow': Image.__version__,
+            'images': len(fixtures),
+            'sizes': [list(size) for size in sizes],
+            'modes': modes,
+            'memory_limit_mb': args.memory_mb,
+            'process_zoho_products': measure(zoho_run, args.iterations, images=len(fixtures)),
+            'process_and_organize': measure(all_in_one_run, args.iterations, images=len(fixtures))
+        }
+
+
+def bench_encoders(args) -> Dict:
+    """Encode time against output size for each encoder profile, on photos and on flat artwork."""
+    size = (args.width, args.height)
+    processor = ZohoFaireImageProcessor(padding=args.padding)
+    fixtures = {
+        'photo': processor.add_padding(make_photo_image(size).convert('RGBA')),
+        'flat_artwork': processor.add_padding(make_flat_image(size))
+    }
+    profiles = {speed: EncoderProfile(quality=args.quality, speed=speed) for speed in ENCODER_SPEEDS}
+    profiles['lossless_flat'] = EncoderProfile(quality=args.quality, lossless_flat=True)
+    if args.target_kb:
+        profiles[f"target_{args.target_kb}kb"] = EncoderProfile(quality=args.quality, target_bytes=args.target_kb * 1024)
+
+    report = {}
+    for kind, image in fixtures.items():
+        report[kind] = {}
+        for name, profile in profiles.items():
+            timing = measure(partial(encode_image, image, 'WEBP', profile), args.iterations)
+            report[kind][name] = {
+                'encode_ms': timing['ms_per_image'],
+                'bytes': len(encode_image(image, 'WEBP', profile)),
+                'peak_rss_growth_kb': timing['peak_rss_growth_kb']
+            }
+
+    return {
+        'benchmark': 'encoders',
+        'pillow': Image.__version__,
+        'image_size': list(fixtures['photo'].size),
+        'quality': args.quality,
+        'profiles': {name: profile.cache_params() for name, profile in profiles.items()},
+        'results': report
+    }
+
+
+def legacy_prepare(image: Image.Image, padding: int, max_size: Optional[Tuple[int, int]] = None, trim: bool = False,
+                   background: Tuple[int, int, int, int] = TRANSPARENT) -> Image.Image:
+    """The convert/trim/fit/pad sequence each processor script carried inline before the shared core."""
+    if image.mode != 'RGBA':
+        image = image.convert('RGBA')
+    if trim:
+        image = trim_to_content(image)
+    if max_size and (image.width > max_size[0] or image.height > max_size[1]):
+        image.thumbnail(max_size, Image.Resampling.LANCZOS)
+    padded = Image.new('RGBA', (image.width + 2 * padding, image.height + 2 * padding), background)
+    padded.paste(image, (padding, padding), image)
+    return padded
+
+
+def _legacy_webp(image: Image.Image, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, 'WEBP', quality=quality)
+    return buffer.getvalue()
+
+
+def _baseline_processor(path: Path, padding: int, quality: int, max_size: Tuple[int, int], trim: bool,
+                        background: Tuple[int, int, int, int], sizes: List[Tuple[int, int]]) -> Dict[str, bytes]:
+    """
+    The Zoho and fixed all-in-one processors as the baseline (3cdfba0) wrote
+    them: full decode, prepare, save, then one thumbnail per size from a copy of
+    the padded frame. Nothing here comes from the shared engine.
+    """
+    frame = legacy_prepare(Image.open(path), padding, max_size, trim, background)
+    thumbs = legacy_thumbnails(frame, sizes)
+    return {'': _legacy_webp(frame, quality),
+            **{f"_{width}x{height}": _legacy_webp(thumbs[(width, height)], quality) for width, height in sizes}}
+
+
+def _decoded_at_reduced_scale(path: Path, max_size: Tuple[int, int]) -> bool:
+    """Whether the processors decode ``path`` at reduced JPEG scale for ``max_size`` rather than at full size."""
+    return open_image(path, max_size).size != Image.open(path).size
+
+
+def parity_cases(args, catalog: Path, brand: str) -> List[Dict]:
+    """
+    Every processor script as a command line plus the outputs its old inline code
+    produced, as ``{output name suffix: bytes}`` built from each fixture.
+    ``exact`` lists the suffixes of full-size outputs (by default the main image).
+    ``reduced_decode`` is the max size a script decodes oversized JPEGs for.
+    """
+    padding, quality, max_size = args.padding, args.quality, (args.max_size, args.max_size)
+    zoho_sizes = [(400, 400), (150, 150)]
+
+    def all_in_one(path):
+        frame = legacy_prepare(Image.open(path), padding)
+        return {'': _legacy_webp(frame, quality),
+                '_400x400': _legacy_webp(legacy_thumbnails(frame, [(400, 400)])[(400, 400)], quality)}
+
+    def image_processor(path, size=None, trim=False):
+        frame = legacy_prepare(Image.open(path), padding, trim=trim)
+        return {'': _legacy_webp(legacy_thumbnails(frame, [size])[size] if size else frame, quality)}
+
+    return [
+        {'cli': 'all-in-one-processor.py', 'outdir': f"out/{brand}",
+         'command': ['all-in-one-processor.py', '{input}', '{output}', '--padding', str(padding),
+                     '--quality', str(quality)],
+         'reference': all_in_one},
+        {'cli': 'all-in-one-processor-fixed.py --trim --max-size', 'outdir': f"out/{brand}",
+         'command': ['all-in-one-processor-fixed.py', '--input', '{input}', '--output', '{output}', '--no-cache',
+                     '--trim', '--max-size', f"{max_size[0]}x{max_size[1]}", '--padding', str(padding),
+                     '--quality', str(quality)],
+         'reference': lambda path: _baseline_processor(path, padding, quality, max_size, True, TRANSPARENT,
+                                                       [(400, 400)])},
+        {'cli': 'image-processor-script.py --size 400x400', 'outdir': f"out/{brand}",
+         'command': ['image-processor-script.py', '{input}', '{output}', '--size', '400x400',
+                     '--padding', str(padding), '--quality', str(quality)],
+         'exact': (),
+         'reference': lambda path: image_processor(path, size=(400, 400))},
+        {'cli': 'image-processor-script.py --trim --flatten-structure', 'outdir': 'out',
+         'command': ['image-processor-script.py', '{input}', '{output}', '--trim', '--flatten-structure',
+                     '--padding', str(padding), '--quality', str(quality)],
+         'reference': lambda path: image_processor(path, trim=True)},
+        {'cli': 'simple-image-processor.py', 'outdir': f"brand-images/{brand}",
+         'command': ['simple-image-processor.py'],
+         'reference': lambda path: {'': _legacy_webp(legacy_prepare(Image.open(path), 50), 85)}},
+        {'cli': 'zoho_faire_processor.py --sizes 400x400,150x150', 'outdir': 'out',
+         'command': ['image-processing/zoho_faire_processor.py', '--input', '{catalog}', '--output', '{output}',
+                     '--no-download', '--no-cache', '--sizes', '400x400,150x150', '--padding', str(padding),
+                     '--quality', str(quality)],
+         'reduced_decode': (1200, 1200),
+         'reference': lambda path: _baseline_processor(path, padding, quality, (1200, 1200), False, TRANSPARENT,
+                                                       zoho_sizes)},
+        {'cli': 'zoho_faire_processor.py --trim --white-background', 'outdir': 'out',
+         'command': ['image-processing/zoho_faire_processor.py', '--input', '{catalog}', '--output', '{output}',
+                     '--no-download', '--no-cache', '--trim', '--white-background', '--padding', str(padding),
+                     '--quality', str(quality)],
+         'reference': lambda path: _baseline_processor(path, padding, quality, (1200, 1200), True, WHITE,
+                                                       [(400, 400)])}
+    ]
+
+
+def mean_pixel_difference(a: bytes, b: bytes) -> Optional[float]:
+    """Mean absolute difference per channel of two encoded images flattened onto white, or None if their sizes differ."""
+    def flatten(data):
+        image = Image.open(io.BytesIO(data)).convert('RGBA')
+        return np.asarray(Image.alpha_composite(Image.new('RGBA', image.size, WHITE), image).convert('RGB'),
+                          dtype=np.int16)
+    a, b = flatten(a), flatten(b)
+    if a.shape != b.shape:
+        return None
+    return float(np.abs(a - b).mean())
+
+
+def same_pixels(a: bytes, b: bytes) -> bool:
+    """Whether two encoded images decode to exactly the same RGBA pixels."""
+    a, b = Image.open(io.BytesIO(a)).convert('RGBA'), Image.open(io.BytesIO(b)).convert('RGBA')
+    return a.size == b.size and a.tobytes() == b.tobytes()
+
+
+def bench_parity(args) -> Dict:
+    """
+    Run every processor script on one fixture catalog and compare its files with the old code's.
+
+    The reference is the baseline scripts' own inline code, not the shared engine.
+    Full-size outputs (the ``exact`` suffixes of each case) must be identical:
+    byte for byte, or failing that pixel for pixel. Only resampled outputs get a
+    tolerance. Downscaled variants may differ slightly, as the geometry-first
+    compositor places the source on whole pixels where resizing the padded frame
+    left a sub-pixel rim; so may the full-size outputs of JPEGs decoded at
+    reduced scale, which the old full decode can't match. Those pass when their
+    mean pixel difference is within ``--max-mean-diff``.
+    """
+    sizes, modes, brand = _parse_sizes(args.sizes), args.modes.split(','), 'acme'
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        # The simple processor reads input_images/ from its working directory
+        fixtures = make_fixture_catalog(tmp / 'input_images' / brand, args.images, sizes, modes)
+        products = {}
+        for path in fixtures:
+            sku = path.stem.split('_')[0]
+            products.setdefault(sku, {'sku': sku, 'name': sku, 'images': []})['images'].append(str(path))
+        catalog = tmp / 'catalog.json'
+        catalog.write_text(json.dumps(list(products.values())))
+
+        report, passed = {}, True
+        for n, case in enumerate(parity_cases(args, catalog, brand)):
+            run_dir = tmp / f"run{n}"
+            run_dir.mkdir()
+            (run_dir / 'input_images').symlink_to(tmp / 'input_images', target_is_directory=True)
+            output = run_dir / 'out'
+            values = {'input': str(tmp / 'input_images'), 'output': str(output), 'catalog': str(catalog)}
+            command = [sys.executable, str(SCRIPTS_DIR / case['command'][0])]
+            command += [part.format(**values) for part in case['command'][1:]]
+
+            start = time.perf_counter()
+            completed = subprocess.run(command, cwd=run_dir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                       text=True)
+            seconds = time.perf_counter() - start
+            outdir = run_dir / case['outdir']
+
+            # Fixtures are named <sku>_<n>, which is also the output name every script gives them
+            expected, exact = {}, set()
+            for path in fixtures:
+                reduced = 'reduced_decode' in case and _decoded_at_reduced_scale(path, case['reduced_decode'])
+                for suffix, data in case['reference'](path).items():
+                    expected[f"{path.stem}{suffix}.webp"] = data
+                    if suffix in case.get('exact', ('',)) and not reduced:
+                        exact.add(f"{path.stem}{suffix}.webp")
+            written = {path.name for path in outdir.glob('*.webp')} if outdir.is_dir() else set()
+            same, same_pixel, diffs, mismatched = 0, 0, [], []
+            for name in sorted(expected.keys() & written):
+                data = (outdir / name).read_bytes()
+                if data == expected[name]:
+                    same += 1
+                    continue
+                if same_pixels(data, expected[name]):
+                    same_pixel += 1
+                    continue
+                diff = None if name in exact else mean_pixel_difference(data, expected[name])
+                if diff is None or diff > args.max_mean_diff:
+                    mismatched.append(name)
+                else:
+                    diffs.append(diff)
+            missing = sorted(expected.keys() - written)
+            unexpected = sorted(written - expected.keys())
+            ok = completed.returncode == 0 and not (mismatched or missing or unexpected)
+            passed &= ok
+            report[case['cli']] = {
+                'passed': ok,
+                'files': len(expected),
+                'identical': same,
+                'pixel_identical': same_pixel,
+                'equivalent': len(diffs),
+                'max_mean_diff': round(max(diffs), 3) if diffs else 0.0,
+                'mismatched': mismatched,
+                'missing': missing,
+                'unexpected': unexpected,
+                'exit_code': completed.returncode,
+                'seconds': round(seconds, 3)
+            }
+            if completed.returncode:
+                report[case['cli']]['stderr'] = completed.stderr[-2000:]
+
+        return {
+            'benchmark': 'parity',
+            'images': len(fixtures),
+            'max_mean_diff': args.max_mean_diff,
+            'passed': passed,
+            'clis': report
+        }
+
+
+def make_synthetic_skus(count: int, seed: int = 7) -> List[str]:
+    """SKUs in the shapes found in items_data.json: numeric, hyphenated codes, words, and spaced legacy SKUs."""
+    rng = random.Random(seed)
+    alphabet = string.ascii_uppercase + string.digits
+    skus = set()
+    while len(skus) < count:
+        kind = len(skus) % 4
+        if kind == 0:
+            skus.add(str(rng.randint(10000, 9999999)))
+        elif kind == 1:
+            skus.add('-'.join(''.join(rng.choices(alphabet, k=4)) for _ in range(3)))
+        elif kind == 2:
+            skus.add('BLOMUS' + ''.join(rng.choices(string.ascii_uppercase, k=rng.randint(6, 14))))
+        else:
+            skus.add(f"XXX {rng.randint(10000, 99999)} OLD SKU")
+    return sorted(skus)
+
+
+def make_synthetic_filenames(skus: Sequence[str], count: int, seed: int = 11) -> List[Tuple[str, str]]:
+    """``(filename, true sku)`` pairs in the naming styles suppliers and earlier runs produce."""
+    rng = random.Random(seed)
+    styles = ('{sku}_{n}.jpg', '{sku}_{n}_400x400.webp', '{sku}-front.jpg', '{sku} detail {n}.png',
+              '{sku}.jpg', '{sku}_{n}.webp', '{sku}-{n}.jpeg')
+    names = []
+    for i in range(count):
+        sku = rng.choice(skus)
+        style = styles[i % len(styles)]
+        name = style.format(sku=sku.lower() if rng.random() < 0.5 else sku, n=rng.randint(1, 6))
+        names.append((name, sku.lower()))
+    return names
+
+
+def legacy_processor_sku(filename: str) -> str:
+    """The old all-in-one extract_sku_from_filename."""
+    name_without_ext = os.path.splitext(filename)[0].lower()
+    for delimiter in ['_', '-', ' ']:
+        parts = name_without_ext.split(delimiter)
+        if parts and parts[0]:
+            return parts[0]
+    return name_without_ext
+
+
+def legacy_renamer_sku(filename: str) -> str:
+    """The old rename_images_for_brand regex, recompiled from the cache per file as it was."""
+    stem = Path(filename).stem.lower()
+    match = re.match(r'^([a-zA-Z0-9\-]+?)(?:_|$)', stem)
+    return match.group(1).lower() if match else stem.split('_')[0].lower()
+
+
+def bench_skus(args) -> Dict:
+    """SKU extraction over synthetic filenames: the two old heuristics against SkuMatcher."""
+    skus = make_synthetic_skus(args.skus)
+    names = make_synthetic_filenames(skus, args.filenames)
+    filenames = [name for name, _ in names]
+
+    build_start = time.perf_counter()
+    matcher = SkuMatcher(skus)
+    build_ms = (time.perf_counter() - build_start) * 1000
+
+    extractors = {
+        'legacy_processor': legacy_processor_sku,
+        'legacy_renamer': legacy_renamer_sku,
+        'matcher_unvalidated': SkuMatcher().extract,
+        'matcher_known_skus': matcher.extract
+    }
+    report = {}
+    for label, extract in extractors.items():
+        timing = measure(lambda: [extract(name) for name in filenames], args.iterations, images=len(filenames))
+        correct = sum(extract(name) == sku for name, sku in names)
+        report[label] = {
+            'us_per_file': round(1e6 / timing['images_per_sec'], 3),
+            'files_per_sec': timing['images_per_sec'],
+            'correct': round(correct / len(names), 4)
+        }
+
+    disagreements = sum(legacy_processor_sku(name) != legacy_renamer_sku(name) for name in filenames)
+    return {
+        'benchmark': 'skus',
+        'filenames': len(filenames),
+        'known_skus': len(skus),
+        'index_build_ms': round(build_ms, 2),
+        'legacy_disagreements': disagreements,
+        'extractors': report
+    }
+
+
+def make_rename_fixtures(root: Path, brands: int, skus_per_brand: int, seed: int = 5) -> List[Path]:
+    """
+    Brand folders of small files named the ways suppliers name them.
+
+    Every SKU has three images: some lettered (``sku_a.jpg``), some numbered
+    from zero so each rename lands on its neighbour's name, some already
+    numbered. Each file holds its own original name, so lost files show up.
+    """
+    rng = random.Random(seed)
+    folders = []
+    for b in range(brands):
+        folder = root / f"brand{b:03d}"
+        folder.mkdir(parents=True)
+        for j in range(skus_per_brand):
+            sku = f"sku{b:03d}{j:04d}"
+            style = rng.choice(['lettered', 'from_zero', 'numbered'])
+            if style == 'lettered':
+                names = [f"{sku}_{letter}.jpg" for letter in 'abc']
+            elif style == 'from_zero':
+                names = [f"{sku}_{n}.jpg" for n in range(3)]
+            else:
+                names = [f"{sku}_{n}.jpg" for n in range(1, 4)]
+            for name in names:
+                (folder / name).write_text(name)
+        folders.append(folder)
+    return folders
+
+
+def legacy_rename_brand(brand_path: Path, matcher: SkuMatcher) -> int:
+    """The old rename loop: one shutil.move per file, a taken name parked under a _temp name."""
+    renamed = 0
+    images = [f for f in brand_path.glob("*") if f.suffix.lower() in ['.webp', '.jpg', '.jpeg', '.png']]
+    for sku, files in matcher.group(images):
+        for i, img_file in enumerate(files, 1):
+            new_name = f"{sku}_{i}{img_file.suffix.lower()}"
+            new_path = brand_path / new_name
+            if img_file.name.lower() == new_name:
+                continue
+            if new_path.exists():
+                shutil.move(str(img_file), str(brand_path / f"{sku}_{i}_temp{img_file.suffix.lower()}"))
+            else:
+                shutil.move(str(img_file), str(new_path))
+            renamed += 1
+    return renamed
+
+
+@contextmanager
+def slow_renames(latency: float) -> Iterator[None]:
+    """Add a fixed delay to every rename, standing in for a network filesystem round trip."""
+    originals = os.rename, os.replace
+
+    def delayed(call):
+        def rename(*args, **kwargs):
+            time.sleep(latency)
+            return call(*args, **kwargs)
+        return rename
+
+    os.rename, os.replace = delayed(os.rename), delayed(os.replace)
+    try:
+        yield
+    finally:
+        os.rename, os.replace = originals
+
+
+def _folder_state(folders: List[Path]) -> Dict:
+    """How many files are left, how many sit under temporary names, and whether all originals survived."""
+    files = [path for folder in folders for path in folder.iterdir()]
+    contents = {path.read_text() for path in files}
+    return {
+        'files': len(files),
+        'debris': sum('_temp' in path.name or path.name.endswith(TEMP_SUFFIX) for path in files),
+        'contents_kept': len(contents)
+    }
+
+
+def bench_renames(args) -> Dict:
+    """
+    The old serial rename loop against planned renames with brands in parallel.
+
+    Each path renames the same fixture tree twice; the second run shows
+    whether the first left the folders in their final state.
+    """
+    matcher = SkuMatcher()
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label in ('legacy', 'planned'):
+            folders = make_rename_fixtures(Path(tmp) / label, args.brands, args.skus)
+            runs = []
+            for _ in range(2):
+                with slow_renames(args.latency_ms / 1000):
+                    start = time.perf_counter()
+                    if label == 'legacy':
+                        renamed = sum(legacy_rename_brand(folder, matcher) for folder in folders)
+                    else:
+                        def rename_brand(folder):
+                            plan = plan_renames(folder, matcher)
+                            apply_plan(plan)
+                            return len(plan.renames) - len(plan.failures)
+
+                        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+                            renamed = sum(executor.map(rename_brand, folders))
+                    seconds = time.perf_counter() - start
+                runs.append({'seconds': round(seconds, 3), 'renamed': renamed, **_folder_state(folders)})
+            report[label] = runs
+
+    files = args.brands * args.skus * 3
+    planned_done = report['planned'][1]['renamed'] == 0 and report['planned'][1]['debris'] == 0
+    return {
+        'benchmark': 'renames',
+        'brands': args.brands,
+        'files': files,
+        'latency_ms': args.latency_ms,
+        'workers': args.workers,
+        **report,
+        'speedup': round(report['legacy'][0]['seconds'] / report['planned'][0]['seconds'], 2),
+        'passed': planned_done and report['planned'][1]['contents_kept'] == files
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the image processing pipeline')
+    parser.add_argument('--padding', type=int, default=50, help='Padding in pixels')
+    parser.add_argument('--quality', type=int, default=85, help='WebP quality')
+    parser.add_argument('--verbose', action='store_true', help='Show processor log output')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    downloads = subparsers.add_parser('downloads', help='Serial vs concurrent downloads from a local HTTP server')
+    downloads.add_argument('--images', type=int, default=40, help='Number of fixture images')
+    downloads.add_argument('--latency-ms', type=float, default=50, help='Simulated per-request latency')
+    downloads.add_argument('--workers', type=int, default=8, help='Concurrent download workers')
+    downloads.add_argument('--per-host', type=int, default=8, help='Max concurrent downloads per host')
+    downloads.set_defaults(run=bench_downloads)
+
+    revalidation = subparsers.add_parser('revalidation',
+                                         help='Full re-download vs conditional requests against a server sending 304s')
+    revalidation.add_argument('--images', type=int, default=40, help='Number of fixture images')
+    revalidation.add_argument('--width', type=int, default=2400, help='Fixture width')
+    revalidation.add_argument('--height', type=int, default=1800, help='Fixture height')
+    revalidation.add_argument('--changed', type=int, default=5, help='Fixtures rewritten before the last run')
+    revalidation.add_argument('--validator', choices=['etag', 'last-modified'], default='etag',
+                              help='Validator the server sends')
+    revalidation.add_argument('--latency-ms', type=float, default=20, help='Simulated per-request latency')
+    revalidation.add_argument('--workers', type=int, default=8, help='Concurrent download workers')
+    revalidation.set_defaults(run=bench_revalidation)
+
+    worker = subparsers.add_parser('worker', help='Spawn-per-image vs persistent --worker latency')
+    worker.add_argument('--images', type=int, default=20, help='Number of fixture images')
+    worker.set_defaults(run=bench_worker)
+
+    variants = subparsers.add_parser('variants', help='Per-size rendering vs the single-decode variant engine')
+    variants.add_argument('--width', type=int, default=2400, help='Fixture width')
+    variants.add_argument('--height', type=int, default=1800, help='Fixture height')
+    variants.add_argument('--sizes', default='800x800,400x400,150x150', help='Comma-separated variant sizes')
+    variants.add_argument('--iterations', type=int, default=5, help='Repetitions per path')
+    variants.set_defaults(run=bench_variants)
+
+    compositing = subparsers.add_parser('compositing', help='Pad-then-resize vs geometry-first compositing')
+    compositing.add_argument('--width', type=int, default=1200, help='Fitted source width before padding')
+    compositing.add_argument('--height', type=int, default=1200, help='Fitted source height before padding')
+    compositing.add_argument('--iterations', type=int, default=10, help='Repetitions per path')
+    compositing.set_defaults(run=bench_compositing)
+
+    opaque = subparsers.add_parser('opaque', help='Always-RGBA vs mode-aware processing on a JPEG-heavy catalog')
+    opaque.add_argument('--images', type=int, default=40, help='Number of fixture images')
+    opaque.add_argument('--sizes', default='800x600,2400x1800', help='Comma-separated fixture sizes')
+    opaque.add_argument('--modes', default='RGB,RGB,RGB,L,RGBA', help='Comma-separated fixture colour modes')
+    opaque.add_argument('--max-size', type=int, default=1200, help='Downscale bounding box edge')
+    opaque.add_argument('--iterations', type=int, default=2, help='Repetitions per path')
+    opaque.set_defaults(run=bench_opaque)
+
+    decode = subparsers.add_parser('decode', help='Full vs draft-mode decode of a large JPEG')
+    decode.add_argument('--width', type=int, default=6000, help='Fixture width')
+    decode.add_argument('--height', type=int, default=4000, help='Fixture height')
+    decode.add_argument('--max-size', type=int, default=1200, help='Target bounding box edge')
+    decode.add_argument('--iterations', type=int, default=3, help='Repetitions per path')
+    decode.set_defaults(run=bench_decode)
+
+    stages = subparsers.add_parser('stages', help='Per-stage timings for each fixture size and colour mode')
+    stages.add_argument('--sizes', default='800x600,2400x1800,6000x4000', help='Comma-separated fixture sizes')
+    stages.add_argument('--modes', default='RGB,RGBA,L,P', help='Comma-separated fixture colour modes')
+    stages.add_argument('--max-size', type=int, default=1200, help='Target bounding box edge')
+    stages.add_argument('--iterations', type=int, default=3, help='Repetitions per stage')
+    stages.set_defaults(run=bench_stages)
+
+    pipeline = subparsers.add_parser('pipeline', help='Full processor runs over a synthetic catalog')
+    pipeline.add_argument('--images', type=int, default=40, help='Number of fixture images')
+    pipeline.add_argument('--sizes', default='800x600,2400x1800', help='Comma-separated fixture sizes')
+    pipeline.add_argument('--modes', default='RGB,RGBA,L,P', help='Comma-separated fixture colour modes')
+    pipeline.add_argument('--max-size', type=int, default=1200, help='All-in-one downscale bounding box edge')
+    pipeline.add_argument('--workers', type=int, default=1, help='All-in-one worker processes')
+    pipeline.add_argument('--memory-mb', type=int, default=DEFAULT_MEMORY_LIMIT_MB,
+                          help='Zoho pipeline ceiling on decoded image data')
+    pipeline.add_argument('--iterations', type=int, default=1, help='Repetitions per processor')
+    pipeline.set_defaults(run=bench_pipeline)
+
+    encoders = subparsers.add_parser('encoders', help='Encode time vs output size per WebP encoder profile')
+    encoders.add_argument('--width', type=int, default=1100, help='Fixture width before padding')
+    encoders.add_argument('--height', type=int, default=1100, help='Fixture height before padding')
+    encoders.add_argument('--target-kb', type=int, default=60, help='Also benchmark a target-size profile (0 to skip)')
+    encoders.add_argument('--iterations', type=int, default=3, help='Repetitions per profile')
+    encoders.set_defaults(run=bench_encoders)
+
+    skus = subparsers.add_parser('skus', help='SKU extraction from filenames: old heuristics vs SkuMatcher')
+    skus.add_argument('--filenames', type=int, default=100000, help='Number of synthetic filenames')
+    skus.add_argument('--skus', type=int, default=20000, help='Number of known SKUs')
+    skus.add_argument('--iterations', type=int, default=3, help='Repetitions per extractor')
+    skus.set_defaults(run=bench_skus)
+
+    renames = subparsers.add_parser('renames', help='Serial rename loop vs planned renames with brands in parallel')
+    renames.add_argument('--brands', type=int, default=16, help='Number of brand folders')
+    renames.add_argument('--skus', type=int, default=100, help='SKUs per brand, three images each')
+    renames.add_argument('--latency-ms', type=float, default=2, help='Simulated network filesystem delay per rename')
+    renames.add_argument('--workers', type=int, default=8, help='Brand folders renamed at once')
+    renames.set_defaults(run=bench_renames)
+
+    parity = subparsers.add_parser('parity', help='Every processor script vs its old inline code, byte for byte')
+    parity.add_argument('--images', type=int, default=16, help='Number of fixture images')
+    parity.add_argument('--sizes', default='800x600,2400x1800,300x500', help='Comma-separated fixture sizes')
+    parity.add_argument('--modes', default='RGB,RGBA,L,P', help='Comma-separated fixture colour modes')
+    parity.add_argument('--max-size', type=int, default=1200, help='All-in-one downscale bounding box edge')
+    parity.add_argument('--max-mean-diff', type=float, default=2.5,
+                        help='Largest mean pixel difference (0-255) allowed for a resampled output; '
+                             'full-size outputs must be identical')
+    parity.set_defaults(run=bench_parity)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format='%(message)s', force=True)
+
+    report = args.run(args)
+    print(json.dumps(report, indent=2))
+    if report.get('passed') is False:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
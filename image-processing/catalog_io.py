@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Streaming Catalog I/O
+Reads Zoho product exports one product at a time and writes results as they finish
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Iterator, TextIO
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = ' \t\r\n'
+
+
+class CatalogError(ValueError):
+    """The input catalog can't be read as products; raised while iterating, not by processing."""
+
+
+def _read_more(f: TextIO, buffer: str, pos: int) -> str:
+    """Drop the consumed prefix of ``buffer`` and append the next chunk."""
+    chunk = f.read(CHUNK_SIZE)
+    return buffer[pos:] + chunk if chunk else None
+
+
+def _iter_json_array(f: TextIO, buffer: str) -> Iterator[Dict]:
+    """Yield the elements of a top-level JSON array without loading the whole array."""
+    decoder = json.JSONDecoder()
+    pos = buffer.index('[') + 1
+    eof = False
+
+    while True:
+        # Skip separators between elements
+        while pos < len(buffer) and buffer[pos] in WHITESPACE + ',':
+            pos += 1
+        if pos >= len(buffer):
+            more = None if eof else _read_more(f, buffer, pos)
+            if more is None:
+                raise CatalogError('Unexpected end of input: JSON array is not closed')
+            buffer, pos = more, 0
+            continue
+        if buffer[pos] == ']':
+            return
+
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+            # A value that runs to the end of the buffer may be cut short (e.g. a number)
+            complete = end < len(buffer) or eof
+        except json.JSONDecodeError as e:
+            if eof:
+                raise CatalogError(str(e)) from e
+            complete = False
+
+        if not complete:
+            more = _read_more(f, buffer, pos)
+            if more is None:
+                eof = True
+            else:
+                buffer, pos = more, 0
+            continue
+
+        yield item
+        pos = end
+
+
+def _parse_line(line: str) -> Dict:
+    """Parse one NDJSON line, reporting bad JSON as a catalog error."""
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as e:
+        raise CatalogError(str(e)) from e
+
+
+def iter_products(path: Path) -> Iterator[Dict]:
+    """
+    Yield products from a JSON array or NDJSON file, one at a time.
+
+    The format is detected from the first non-whitespace character: ``[`` for
+    a JSON array (the Zoho export format), ``{`` for one product per line.
+    """
+    with open(path, 'r') as f:
+        buffer = ''
+        while not buffer.strip():
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            buffer += chunk
+
+        first = buffer.lstrip()[0]
+        if first == '[':
+            for item in _iter_json_array(f, buffer):
+                if not isinstance(item, dict):
+                    raise CatalogError('Input array must contain product objects')
+                yield item
+        elif first == '{':
+            # NDJSON: finish the partial line in the buffer, then read line by line
+            lines = (buffer + f.readline()).splitlines()
+            for line in lines:
+                if line.strip():
+                    yield _parse_line(line)
+            for line in f:
+                if line.strip():
+                    yield _parse_line(line)
+        else:
+            raise CatalogError('Input must be a JSON array of products or NDJSON')
+
+
+class ResultsWriter:
+    """Append per-product results to an NDJSON file as each product finishes."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'w')
+        self.count = 0
+
+    def write(self, product_result: Dict):
+        self._file.write(json.dumps(product_result) + '\n')
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
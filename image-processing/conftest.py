@@ -0,0 +1,50 @@
+"""Shared fixtures for the image-processing checks."""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, so connection reuse shows up as repeated client ports
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests.append({'path': self.path, 'headers': dict(self.headers),
+                                         'port': self.client_address[1]})
+        self.server.respond(self)
+
+    def reply(self, status, body=b'', headers=None):
+        """Send a complete response with a Content-Length."""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    """
+    An HTTP server on localhost in a background thread.
+
+    Tests set ``respond(handler)`` to answer each GET (see ``handler.reply``) and
+    read what was asked for from ``requests``.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.requests = []
+    server.respond = lambda handler: handler.reply(404)
+    server.url = f"http://127.0.0.1:{server.server_port}"
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
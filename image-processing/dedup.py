@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Perceptual Duplicate Detection
+Spots the same supplier photo attached to several SKUs so it is only processed once
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+# dHash compares neighbouring pixels of a (HASH_SIZE + 1) x HASH_SIZE greyscale thumbnail
+HASH_SIZE = 8
+
+# Hash matches are confirmed against a colour thumbnail before aliasing
+DETAIL_SIZE = 32
+
+DEFAULT_MAX_DISTANCE = 2
+# Re-encodes of one photo differ by a level or two on average; colour variants by far more
+DEFAULT_MEAN_TOLERANCE = 2.0
+DEFAULT_PIXEL_TOLERANCE = 24
+ASPECT_TOLERANCE = 0.02
+
+
+@dataclass
+class ImageSignature:
+    """Perceptual fingerprint of one decoded image."""
+    dhash: int
+    detail: np.ndarray
+    aspect: float
+
+
+def image_signature(image: Image.Image) -> ImageSignature:
+    """
+    Compute the dHash and confirmation thumbnail for an image.
+
+    The frame is box-filtered straight down to DETAIL_SIZE, with transparency
+    flattened onto white, so the cost is one pass over the source pixels.
+    """
+    if image.mode in ('RGB', 'L'):
+        small = image.resize((DETAIL_SIZE, DETAIL_SIZE), Image.Resampling.BOX).convert('RGB')
+    elif 'A' in image.getbands() or image.mode == 'P':
+        small = image.convert('RGBA').resize((DETAIL_SIZE, DETAIL_SIZE), Image.Resampling.BOX)
+        white = Image.new('RGBA', small.size, (255, 255, 255, 255))
+        small = Image.alpha_composite(white, small).convert('RGB')
+    else:
+        small = image.convert('RGB').resize((DETAIL_SIZE, DETAIL_SIZE), Image.Resampling.BOX)
+
+    grey = np.asarray(small.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BOX), dtype=np.int16)
+    bits = (grey[:, 1:] > grey[:, :-1]).ravel()
+    dhash = int.from_bytes(np.packbits(bits).tobytes(), 'big')
+    return ImageSignature(dhash=dhash, detail=np.asarray(small, dtype=np.uint8), aspect=image.width / image.height)
+
+
+def hamming_distances(hashes: np.ndarray, value: int) -> np.ndarray:
+    """Bit differences between every 64-bit hash in ``hashes`` and ``value``."""
+    diff = np.bitwise_xor(hashes, np.uint64(value))
+    return np.unpackbits(diff.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+class DuplicateIndex:
+    """
+    In-memory index of the images processed so far in a run.
+
+    A new image is a duplicate of an indexed one when their dHashes differ by at
+    most ``max_distance`` bits, their aspect ratios match, and their colour
+    thumbnails are near-identical: every channel's mean difference is within
+    ``mean_tolerance`` levels and no pixel differs by more than
+    ``pixel_tolerance``. The hash only finds candidates; the thumbnail check
+    is what keeps colour variants and relabelled packshots of the same product
+    apart, as a flat colour shift of even a dozen levels moves a channel's
+    mean well past the tolerance. Of the confirmed candidates, the one with
+    the closest thumbnail wins, so an exact copy is always matched to its
+    original. Lookups are a vectorized scan over all stored hashes.
+    """
+
+    def __init__(self, max_distance: int = DEFAULT_MAX_DISTANCE, mean_tolerance: float = DEFAULT_MEAN_TOLERANCE,
+                 pixel_tolerance: int = DEFAULT_PIXEL_TOLERANCE):
+        self.max_distance = max_distance
+        self.mean_tolerance = mean_tolerance
+        self.pixel_tolerance = pixel_tolerance
+        self.matches = 0
+        self._keys: List[Any] = []
+        self._hashes = np.zeros(256, dtype=np.uint64)
+        self._aspects = np.zeros(256, dtype=np.float64)
+        self._details = np.zeros((256, DETAIL_SIZE, DETAIL_SIZE, 3), dtype=np.uint8)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def find(self, signature: ImageSignature) -> Optional[Any]:
+        """Key of the closest indexed duplicate of ``signature``, or None."""
+        count = len(self._keys)
+        if not count:
+            return None
+
+        distances = hamming_distances(self._hashes[:count], signature.dhash)
+        candidates = np.flatnonzero(
+            (distances <= self.max_distance)
+            & (np.abs(self._aspects[:count] - signature.aspect) <= ASPECT_TOLERANCE * signature.aspect)
+        )
+        if not candidates.size:
+            return None
+
+        diffs = np.abs(self._details[candidates].astype(np.int16) - signature.detail)
+        channel_means = diffs.mean(axis=(1, 2))
+        mean_diffs = channel_means.max(axis=1)
+        confirmed = (mean_diffs <= self.mean_tolerance) & (diffs.max(axis=(1, 2, 3)) <= self.pixel_tolerance)
+        if not confirmed.any():
+            return None
+
+        self.matches += 1
+        closest = np.flatnonzero(confirmed)[np.argmin(channel_means[confirmed].mean(axis=1))]
+        return self._keys[int(candidates[closest])]
+
+    def add(self, signature: ImageSignature, key: Any):
+        """Index an image that was actually processed, under ``key``."""
+        count = len(self._keys)
+        if count == len(self._hashes):
+            self._hashes = np.resize(self._hashes, count * 2)
+            self._aspects = np.resize(self._aspects, count * 2)
+            self._details = np.resize(self._details, (count * 2,) + self._details.shape[1:])
+        self._hashes[count] = signature.dhash
+        self._aspects[count] = signature.aspect
+        self._details[count] = signature.detail
+        self._keys.append(key)
+
+    def summary(self) -> Dict:
+        return {'indexed': len(self._keys), 'duplicates': self.matches}
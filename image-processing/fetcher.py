@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Concurrent Image Fetcher
+Downloads product images over a pooled HTTP session with bounded concurrency
+"""
+
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Largest response body read before a download is abandoned
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class Download:
+    """
+    A response: the body, or ``not_modified`` when a conditional request found
+    the copy behind the validators sent still current.
+    """
+    content: Optional[bytes] = None
+    not_modified: bool = False
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def validators(self) -> Dict[str, str]:
+        """The response's ETag and Last-Modified, whichever the server sent."""
+        return {name: value for name, value in (('etag', self.etag), ('last_modified', self.last_modified)) if value}
+
+
+class ImageFetcher:
+    def __init__(self, max_workers=8, per_host_limit=4, retries=3, backoff=0.5, timeout=30,
+                 max_bytes: Optional[int] = DEFAULT_MAX_BYTES):
+        self.max_workers = max(1, max_workers)
+        self.per_host_limit = max(1, per_host_limit)
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.timeout = timeout
+        # Bodies are streamed and abandoned past this many bytes (None for no limit)
+        self.max_bytes = max_bytes
+
+        # One session for the whole run so connections are kept alive and reused
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._host_lock = threading.Lock()
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        """Get the semaphore limiting concurrent requests to this URL's host."""
+        host = urlparse(url).netloc
+        with self._host_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_slots[host]
+
+    def fetch(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> Download:
+        """
+        Fetch a URL, retrying transient failures with exponential backoff.
+
+        With ``etag`` or ``last_modified`` from an earlier response the request is
+        conditional, and a 304 comes back as a Download with ``not_modified`` set
+        and no body.
+        """
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                delay = self.backoff * (2 ** (attempt - 1))
+                logger.info(f"🔁 Retry {attempt}/{self.retries} for {url} in {delay:.1f}s")
+                time.sleep(delay)
+            try:
+                with self._host_slot(url):
+                    with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+                        if response.status_code in RETRY_STATUS_CODES:
+                            last_error = requests.HTTPError(f"{response.status_code} for url: {url}",
+                                                            response=response)
+                            continue
+                        if response.status_code == 304 and headers:
+                            return Download(not_modified=True, etag=response.headers.get('ETag') or etag,
+                                            last_modified=response.headers.get('Last-Modified') or last_modified)
+                        response.raise_for_status()
+                        return Download(content=self._read_body(response, url),
+                                        etag=response.headers.get('ETag'),
+                                        last_modified=response.headers.get('Last-Modified'))
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = e
+        raise last_error
+
+    def _read_body(self, response: requests.Response, url: str) -> bytes:
+        """Read a streamed body in chunks, giving up as soon as it passes ``max_bytes``."""
+        limit = self.max_bytes
+        length = response.headers.get('Content-Length', '')
+        if limit is not None and length.isdigit() and int(length) > limit:
+            raise ValueError(f"{url} is {int(length)} bytes, over the {limit} byte download limit")
+        body = bytearray()
+        for chunk in response.iter_content(CHUNK_SIZE):
+            body += chunk
+            if limit is not None and len(body) > limit:
+                raise ValueError(f"{url} is over the {limit} byte download limit")
+        return bytes(body)
+
+    def fetch_bytes(self, url: str) -> bytes:
+        """Fetch a URL body, retrying transient failures with exponential backoff."""
+        return self.fetch(url).content
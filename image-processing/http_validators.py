@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+HTTP Validator Store
+Remembers each source URL's ETag and Last-Modified so unchanged images are revalidated instead of downloaded
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 2
+
+VALIDATORS_FILE_NAME = '.http_validators.json'
+
+
+class ValidatorStore:
+    """
+    Per-URL validators from the last full download, and what was made from it, stored as JSON.
+
+    A URL several products share has one entry per product, keyed by the
+    product's main output, as each product's outputs date from its own download.
+    An entry is only offered for a conditional request while it still describes
+    the outputs about to be written: same processor settings, same output files,
+    all of them still on disk. A 304 for that request therefore means those
+    outputs are current and the image needn't be downloaded, decoded or encoded.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.entries: Dict[str, Dict] = {}
+        self.stats = {'revalidated': 0, 'not_modified': 0, 'bytes_saved': 0}
+        # Looked up from the fetch threads, recorded from the result thread
+        self._lock = threading.Lock()
+
+        if self.path.exists():
+            try:
+                with open(self.path) as f:
+                    data = json.load(f)
+                if data.get('version') == STORE_VERSION:
+                    self.entries = data.get('urls', {})
+                else:
+                    logger.warning(f"⚠️  Ignoring HTTP validators with unknown version: {self.path}")
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️  Could not read HTTP validators, downloading everything: {str(e)}")
+
+    @staticmethod
+    def fingerprint(params: Dict, outputs: Iterable[Path]) -> str:
+        payload = json.dumps({'params': params, 'outputs': [str(path) for path in outputs]},
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def lookup(self, url: str, outputs: List[Path], fingerprint: str) -> Optional[Dict]:
+        """
+        The entry to revalidate ``url`` against for ``outputs`` (main output first),
+        or None if it was never stored, was stored for other settings or outputs,
+        or some of its outputs are gone.
+        """
+        with self._lock:
+            entry = self.entries.get(url, {}).get(str(outputs[0]))
+        if not entry or entry['fingerprint'] != fingerprint:
+            return None
+        if not all(Path(path).exists() for path in outputs):
+            return None
+        with self._lock:
+            self.stats['revalidated'] += 1
+        return entry
+
+    def not_modified(self, entry: Dict):
+        """Count a 304 for an entry returned by ``lookup``: its whole body wasn't downloaded."""
+        with self._lock:
+            self.stats['not_modified'] += 1
+            self.stats['bytes_saved'] += entry['bytes']
+
+    def record(self, url: str, outputs: List[Path], validators: Dict[str, str], fingerprint: str,
+               content_length: int, size: Tuple[int, int], sha256: Dict[str, str]):
+        """Remember a full download's validators once ``outputs`` (main output first) are written."""
+        if not validators:
+            return
+        with self._lock:
+            self.entries.setdefault(url, {})[str(outputs[0])] = {
+                **validators,
+                'fingerprint': fingerprint,
+                'bytes': content_length,
+                'size': list(size),
+                'sha256': sha256
+            }
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {'urls': len(self.entries), **self.stats}
+
+    def save(self):
+        """
+        Write the store atomically so a crash never leaves a truncated file.
+
+        Nothing is written while there is nothing to remember, so runs without
+        remote images don't leave an empty store in the output directory.
+        """
+        with self._lock:
+            if not self.entries and not self.path.exists():
+                return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_name(self.path.name + '.tmp')
+        with self._lock:
+            with open(temp_path, 'w') as f:
+                json.dump({'version': STORE_VERSION, 'urls': self.entries}, f)
+        os.replace(temp_path, self.path)
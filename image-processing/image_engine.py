@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Image Variant Engine
+Decodes a source once and renders every configured output size from it
+"""
+
+import io
+import os
+import math
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+# Matches Image.thumbnail(), so outputs are identical to the old per-size path
+REDUCING_GAP = 2.0
+
+TRANSPARENT = (0, 0, 0, 0)
+WHITE = (255, 255, 255, 255)
+
+# Pixels with every channel at or above this count as background when trimming
+WHITE_THRESHOLD = 245
+
+# Speed presets mapped to the WebP encoder's ``method`` (0 = fastest, 6 = smallest files)
+ENCODER_SPEEDS = {'fastest': 0, 'fast': 2, 'default': 4, 'small': 6}
+
+# Images with at most this many distinct colours are treated as flat artwork
+FLAT_MAX_COLORS = 256
+
+# How padded variants are rendered; part of processing cache keys so outputs of an older renderer aren't reused
+RENDERER = 'geometry-first'
+
+
+@dataclass(frozen=True)
+class VariantSpec:
+    """
+    One output rendered from a source image.
+
+    ``size`` is the bounding box to fit into (None keeps the source size). With
+    ``canvas`` set the fitted image is centred on a background canvas of exactly
+    ``size``; otherwise the fitted image is emitted as-is.
+    """
+    name: str
+    size: Optional[Tuple[int, int]] = None
+    suffix: str = ''
+    format: str = 'WEBP'
+    canvas: bool = True
+
+    @classmethod
+    def sized(cls, width: int, height: int, format: str = 'WEBP') -> 'VariantSpec':
+        """The ``_WxH`` variant naming used throughout brand-images."""
+        return cls(name=f"{width}x{height}", size=(width, height), suffix=f"_{width}x{height}", format=format)
+
+    @property
+    def extension(self) -> str:
+        return '.jpg' if self.format.upper() == 'JPEG' else f".{self.format.lower()}"
+
+
+@dataclass(frozen=True)
+class EncoderProfile:
+    """
+    How rendered variants are encoded.
+
+    ``speed`` picks the WebP ``method`` from ENCODER_SPEEDS. With
+    ``lossless_flat``, flat-colour artwork (logos, line art) is encoded
+    losslessly, which is both sharper and smaller for such images. With
+    ``target_bytes``, any output over the target is re-encoded at the highest
+    quality between ``min_quality`` and ``quality`` that fits.
+    """
+    quality: int = 85
+    speed: str = 'default'
+    lossless_flat: bool = False
+    target_bytes: Optional[int] = None
+    min_quality: int = 40
+
+    def __post_init__(self):
+        if self.speed not in ENCODER_SPEEDS:
+            raise ValueError(f"Unknown encoder speed: {self.speed} (choose from {', '.join(ENCODER_SPEEDS)})")
+
+    @property
+    def method(self) -> int:
+        return ENCODER_SPEEDS[self.speed]
+
+    def cache_params(self) -> Dict:
+        """Every setting that changes the encoded bytes."""
+        return asdict(self)
+
+
+def fit_size(size: Tuple[int, int], box: Tuple[int, int]) -> Tuple[int, int]:
+    """Size ``size`` shrinks to when fitted in ``box``, rounded the way Image.thumbnail does."""
+    width, height = size
+    if width <= box[0] and height <= box[1]:
+        return size
+
+    def round_aspect(number, key):
+        return max(min(math.floor(number), math.ceil(number), key=key), 1)
+
+    x, y = box
+    aspect = width / height
+    if x / y >= aspect:
+        x = round_aspect(y * aspect, key=lambda n: abs(aspect - n / y))
+    else:
+        y = round_aspect(x / aspect, key=lambda n: 0 if n == 0 else abs(aspect - x / n))
+    return x, y
+
+
+def open_image(source: Union[str, Path, BinaryIO], max_size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """
+    Open an image, decoding JPEGs at reduced scale when they will be shrunk to ``max_size``.
+
+    JPEG DCT scaling (Image.draft) decodes at 1/2, 1/4 or 1/8 resolution while
+    keeping the result at least as large as the final fitted size, so a
+    6000x4000 supplier photo headed for 1200x1200 is decoded at 1500x1000.
+    Other formats are opened unchanged.
+    """
+    image = Image.open(source)
+    if max_size and image.format == 'JPEG':
+        target = fit_size(image.size, max_size)
+        if target != image.size:
+            image.draft(None, target)
+    return image
+
+
+def find_content_bbox(image: Image.Image, white_threshold: int = WHITE_THRESHOLD,
+                      alpha_threshold: int = 0) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Bounding box (left, top, right, bottom) of the non-background pixels, or None if there are none.
+
+    Background is anything transparent (alpha <= ``alpha_threshold``) or near-white
+    (every colour channel >= ``white_threshold``). The scan is a handful of
+    vectorized NumPy reductions over the frame, with no per-pixel Python work.
+    """
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    pixels = np.asarray(image)
+
+    content = (pixels[..., :3] < white_threshold).any(axis=2)
+    if image.mode == 'RGBA':
+        content &= pixels[..., 3] > alpha_threshold
+
+    rows = np.flatnonzero(content.any(axis=1))
+    if not rows.size:
+        return None
+    cols = np.flatnonzero(content.any(axis=0))
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def trim_to_content(image: Image.Image, white_threshold: int = WHITE_THRESHOLD) -> Image.Image:
+    """Crop away transparent or near-white borders; blank images are returned unchanged."""
+    bbox = find_content_bbox(image, white_threshold)
+    if bbox is None or bbox == (0, 0) + image.size:
+        return image
+    return image.crop(bbox)
+
+
+def to_working_mode(image: Image.Image) -> Image.Image:
+    """
+    Convert a decoded source to RGBA if it really has transparency, otherwise to RGB.
+
+    An alpha channel (or palette transparency) that leaves every pixel opaque is
+    dropped, so opaque PNGs take the same three-channel path as JPEGs.
+    """
+    if image.mode == 'RGB':
+        return image
+    bands = image.getbands()
+    if 'A' not in bands and 'a' not in bands and 'transparency' not in image.info:
+        return image.convert('RGB')
+    rgba = image if image.mode == 'RGBA' else image.convert('RGBA')
+    if rgba.getchannel('A').getextrema()[0] < 255:
+        return rgba
+    return rgba.convert('RGB')
+
+
+def padded_size(size: Tuple[int, int], padding: int) -> Tuple[int, int]:
+    return size[0] + 2 * padding, size[1] + 2 * padding
+
+
+def compose_variants(image: Image.Image, padding: int, specs: Iterable[VariantSpec],
+                     background: Tuple[int, int, int, int] = TRANSPARENT) -> Dict[str, Image.Image]:
+    """
+    Render every spec from an unpadded image as if from the image centred on a
+    ``background`` frame with ``padding`` pixels on every side. This is the one
+    renderer: padding alone is a single unsized spec, and resizing an image
+    that is already padded is ``padding=0``.
+
+    Geometry first: for each output the fitted size of the padded frame, the
+    canvas and the source's scaled placement on it are worked out up front, so
+    the source is resized once and composited once per output. No padded
+    full-size frame is built unless a spec is the full-size image itself.
+    Specs are handled largest first and each resize starts from the smallest
+    already-resized level that is still big enough, so the full-size source is
+    only walked for the first downscale.
+
+    An opaque (non-RGBA) source is resized on three channels and pasted without
+    a mask; on an opaque background its outputs are RGB, so they are encoded
+    without an alpha plane. RGBA sources keep the masked RGBA path.
+    """
+    specs = list(specs)
+    width, height = image.size
+    if image.mode != 'RGBA' and background[3] == 255:
+        canvas_mode, fill = 'RGB', background[:3]
+    else:
+        canvas_mode, fill = 'RGBA', background
+    frame = padded_size(image.size, padding)
+    levels: List[Image.Image] = [image]
+    rendered = {}
+
+    def area(spec):
+        return spec.size[0] * spec.size[1] if spec.size else math.inf
+
+    for spec in sorted(specs, key=area, reverse=True):
+        fitted = fit_size(frame, spec.size) if spec.size else frame
+        canvas_size = spec.size if spec.size and spec.canvas else fitted
+        scale_x, scale_y = fitted[0] / frame[0], fitted[1] / frame[1]
+        target = (max(1, round(width * scale_x)), max(1, round(height * scale_y)))
+        offset = ((canvas_size[0] - fitted[0]) // 2 + round(padding * scale_x),
+                  (canvas_size[1] - fitted[1]) // 2 + round(padding * scale_y))
+
+        source = min(
+            (level for level in levels if level.width >= target[0] and level.height >= target[1]),
+            key=lambda level: level.width * level.height
+        )
+        if source.size != target:
+            source = source.resize(target, Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+            levels.append(source)
+
+        canvas = Image.new(canvas_mode, canvas_size, fill)
+        canvas.paste(source, offset, source if source.mode == 'RGBA' else None)
+        rendered[spec.name] = canvas
+
+    return rendered
+
+
+def variant_path(base_path: Path, spec: VariantSpec) -> Path:
+    """Output path for ``spec`` given an extensionless base such as ``out/abc123_1``."""
+    return base_path.with_name(f"{base_path.name}{spec.suffix}{spec.extension}")
+
+
+def prepare_for_format(image: Image.Image, format: str) -> Image.Image:
+    """Flatten transparency onto white for formats that can't store alpha."""
+    if format.upper() == 'JPEG' and image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGBA', image.size, (255, 255, 255, 255))
+        return Image.alpha_composite(background, image).convert('RGB')
+    return image
+
+
+def is_flat_artwork(image: Image.Image, max_colors: int = FLAT_MAX_COLORS) -> bool:
+    """True if the image uses at most ``max_colors`` distinct colours."""
+    return image.getcolors(max_colors) is not None
+
+
+def _encode(image: Image.Image, format: str, **params) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format, **params)
+    return buffer.getvalue()
+
+
+def encode_image(image: Image.Image, format: str, encoder: EncoderProfile) -> bytes:
+    """Encode one image to ``format`` bytes following ``encoder``."""
+    format = format.upper()
+    image = prepare_for_format(image, format)
+    if format != 'WEBP':
+        return _encode(image, format, quality=encoder.quality)
+
+    if encoder.lossless_flat and is_flat_artwork(image):
+        return _encode(image, format, lossless=True, quality=encoder.quality, method=encoder.method)
+
+    data = _encode(image, format, quality=encoder.quality, method=encoder.method)
+    if encoder.target_bytes is None or len(data) <= encoder.target_bytes:
+        return data
+
+    # Binary search for the highest quality that fits; fall back to the smallest encode seen
+    smallest, best = data, None
+    low, high = encoder.min_quality, encoder.quality - 1
+    while low <= high:
+        quality = (low + high) // 2
+        data = _encode(image, format, quality=quality, method=encoder.method)
+        if len(data) <= encoder.target_bytes:
+            best = data
+            low = quality + 1
+        else:
+            high = quality - 1
+            if len(data) < len(smallest):
+                smallest = data
+    return best if best is not None else smallest
+
+
+def encode_variants(rendered: Dict[str, Image.Image], specs: Iterable[VariantSpec],
+                    encoder: EncoderProfile) -> Dict[str, bytes]:
+    """Encode each rendered variant in memory and return the file contents by name."""
+    return {spec.name: encode_image(rendered[spec.name], spec.format, encoder) for spec in specs}
+
+
+def write_atomic(path: Path, data: bytes):
+    """Write ``data`` to a temp file beside ``path`` and rename it in, so ``path`` is never partial."""
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        temp_path.write_bytes(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+
+def write_variants(encoded: Dict[str, bytes], specs: Iterable[VariantSpec], base_path: Path) -> Dict[str, Path]:
+    """Write encoded variants next to ``base_path`` and return the paths by name."""
+    paths = {}
+    for spec in specs:
+        path = variant_path(base_path, spec)
+        write_atomic(path, encoded[spec.name])
+        paths[spec.name] = path
+    return paths
+
+
+def save_variants(rendered: Dict[str, Image.Image], specs: Iterable[VariantSpec], base_path: Path,
+                  encoder: EncoderProfile) -> Dict[str, Path]:
+    """Write each rendered variant next to ``base_path`` and return the paths by name."""
+    specs = list(specs)
+    return write_variants(encode_variants(rendered, specs, encoder), specs, base_path)
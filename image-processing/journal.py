@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Checkpoint Journal
+Write-ahead record of finished images so an interrupted batch can resume where it stopped
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_VERSION = 1
+
+DEFAULT_FLUSH_EVERY = 50
+DEFAULT_FLUSH_SECONDS = 5.0
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def output_digests(encoded: Dict[str, bytes]) -> Dict[str, str]:
+    """SHA-256 of each encoded output, hashed in memory so the written files needn't be read back."""
+    return {name: hashlib.sha256(data).hexdigest() for name, data in encoded.items()}
+
+
+class CheckpointJournal:
+    """
+    Append-only JSON-lines journal of completed images.
+
+    The first line records the run's settings; every later line is one finished
+    image: its sku, index, output paths and the SHA-256 of each output. Entries
+    are only appended once the outputs are in place, and the file is flushed and
+    fsynced every ``flush_every`` entries or ``flush_seconds``, whichever comes
+    first, so a crash loses at most that much finished work.
+
+    With ``resume`` an existing journal written with the same settings is loaded;
+    otherwise (or if the settings differ) it is started afresh. A torn last line
+    from a crash mid-write is ignored.
+    """
+
+    def __init__(self, path: Path, params: Dict, resume: bool = False,
+                 flush_every: int = DEFAULT_FLUSH_EVERY, flush_seconds: float = DEFAULT_FLUSH_SECONDS):
+        self.path = Path(path)
+        self.params = json.loads(json.dumps(params, default=str))
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds
+        self.entries: Dict[str, Dict] = {}
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+        if resume and self.path.exists():
+            self._load()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.entries:
+            self._file = open(self.path, 'a')
+        else:
+            self._file = open(self.path, 'w')
+            self._file.write(json.dumps({'journal': JOURNAL_VERSION, 'params': self.params}) + '\n')
+            self.flush()
+
+    def __getstate__(self):
+        # Worker processes never write the journal; the parent records what they finish
+        raise TypeError('CheckpointJournal cannot be shared with worker processes')
+
+    def _load(self):
+        with open(self.path) as f:
+            lines = f.read().splitlines()
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except ValueError:
+            header = {}
+        if header.get('journal') != JOURNAL_VERSION or header.get('params') != self.params:
+            logger.warning(f"⚠️  Checkpoint journal was written with different settings, starting over: {self.path}")
+            return
+
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # torn write from the interrupted run
+            self.entries[entry['outputs']['main']] = entry
+
+    def lookup(self, main_path: Path) -> Optional[Dict]:
+        """
+        The journal entry for the image whose main output is ``main_path``, or
+        None if it isn't recorded or any of its outputs is missing or changed.
+        """
+        entry = self.entries.get(str(main_path))
+        if entry is None:
+            return None
+        for name, path in entry['outputs'].items():
+            try:
+                if file_sha256(Path(path)) != entry['sha256'][name]:
+                    return None
+            except OSError:
+                return None
+        return entry
+
+    def record(self, sku: str, index: int, outputs: Dict[str, Path], sha256: Dict[str, str],
+               data: Optional[Dict] = None):
+        """
+        Append a finished image; ``outputs`` must already be complete on disk.
+
+        ``sha256`` is the digest of each output's bytes as they were written (see
+        ``output_digests``), so nothing is read back here; the files are only
+        hashed again by ``lookup`` when a resumed run checks them.
+        """
+        entry = {
+            'sku': sku,
+            'index': index,
+            'outputs': {name: str(path) for name, path in outputs.items()},
+            'sha256': {name: sha256[name] for name in outputs},
+            'data': data or {}
+        }
+        self.entries[entry['outputs']['main']] = entry
+        self._file.write(json.dumps(entry) + '\n')
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def close(self, completed: bool = False):
+        """Flush and close; a journal for a run that completed is removed, as there is nothing to resume."""
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+        if completed:
+            self.path.unlink(missing_ok=True)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Faire Manifest Store
+SQLite-backed Faire image manifest, updated one product at a time and exported on demand
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+MANIFEST_DB_NAME = 'faire_manifest.db'
+
+# Products written between commits; a crash loses at most this many updates
+COMMIT_EVERY = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    sku TEXT PRIMARY KEY,
+    brand TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+    name TEXT NOT NULL DEFAULT '',
+    images TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS products_brand ON products (brand);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _compact(value) -> str:
+    return json.dumps(value, separators=(',', ':'))
+
+
+class ManifestStore:
+    """
+    Faire manifest entries keyed by SKU, with an index on brand.
+
+    ``upsert`` replaces one product's entry, so a run only touches the products
+    it processed and everything else stays as the last run that saw it left it.
+    Writes are committed every ``commit_every`` products and on ``flush``,
+    export and ``close``. Brand lookups ignore case.
+    """
+
+    def __init__(self, path: Path, commit_every: int = COMMIT_EVERY):
+        self.path = Path(path)
+        self.commit_every = commit_every
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # The processor writes from its scanning and result threads, always under its own lock
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._uncommitted = 0
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM products').fetchone()[0]
+
+    def upsert(self, product: Dict):
+        """Insert or replace a product entry (``sku``, ``name``, ``brand``, ``images``)."""
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO products (sku, brand, name, images, updated_at) VALUES (?, ?, ?, ?, ?)',
+                (product['sku'], product.get('brand') or '', product.get('name') or '',
+                 _compact(product['images']), time.time())
+            )
+            self._uncommitted += 1
+            if self._uncommitted >= self.commit_every:
+                self._commit()
+
+    def remove(self, sku: str) -> bool:
+        with self._lock:
+            removed = self._conn.execute('DELETE FROM products WHERE sku = ?', (sku,)).rowcount > 0
+            self._uncommitted += 1
+            return removed
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM products')
+            self._commit()
+
+    def get(self, sku: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT sku, brand, name, images FROM products WHERE sku = ?', (sku,)
+            ).fetchone()
+        return self._entry(row) if row else None
+
+    def by_brand(self, brand: str) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT sku, brand, name, images FROM products WHERE brand = ? ORDER BY sku', (brand,)
+            ).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def brands(self) -> Dict[str, int]:
+        """Product count per brand."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT brand, COUNT(*) FROM products GROUP BY brand ORDER BY brand'
+            ).fetchall()
+        return dict(rows)
+
+    def iter_products(self, brand: Optional[str] = None) -> Iterator[Dict]:
+        """Every entry in SKU order, fetched in batches rather than all at once."""
+        query = 'SELECT sku, brand, name, images FROM products'
+        params = ()
+        if brand is not None:
+            query += ' WHERE brand = ?'
+            params = (brand,)
+        with self._lock:
+            self._commit()
+            # A separate read-only connection so writes can carry on while an export streams
+            reader = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            cursor = reader.execute(query + ' ORDER BY sku', params)
+            while True:
+                rows = cursor.fetchmany(500)
+                if not rows:
+                    break
+                for row in rows:
+                    yield self._entry(row)
+        finally:
+            reader.close()
+
+    def set_summary(self, summary: Dict):
+        """Remember the processing summary of the latest run, for exports."""
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                               ('processing_summary', _compact(summary)))
+            self._commit()
+
+    def summary(self) -> Dict:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'processing_summary'").fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def export_json(self, path: Path, brand: Optional[str] = None) -> Path:
+        """Write ``{"processing_summary": ..., "products": [...]}`` as compact JSON, atomically."""
+        path = Path(path)
+        temp_path = path.with_name(path.name + '.tmp')
+        with open(temp_path, 'w') as f:
+            f.write(f'{{"processing_summary":{_compact(self.summary())},"products":[')
+            separator = ''
+            for product in self.iter_products(brand):
+                f.write(separator + _compact(product))
+                separator = ',\n'
+            f.write(']}\n')
+        os.replace(temp_path, path)
+        return path
+
+    def export_ndjson(self, path: Path, brand: Optional[str] = None) -> Path:
+        """Write one compact product entry per line, atomically."""
+        path = Path(path)
+        temp_path = path.with_name(path.name + '.tmp')
+        with open(temp_path, 'w') as f:
+            for product in self.iter_products(brand):
+                f.write(_compact(product) + '\n')
+        os.replace(temp_path, path)
+        return path
+
+    def flush(self):
+        with self._lock:
+            self._commit()
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self._conn.close()
+
+    def _commit(self):
+        self._conn.commit()
+        self._uncommitted = 0
+
+    @staticmethod
+    def _entry(row) -> Dict:
+        sku, brand, name, images = row
+        return {'sku': sku, 'name': name, 'brand': brand, 'images': json.loads(images)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query or export the Faire manifest store')
+    parser.add_argument('db', help=f"Manifest database (e.g. processed-images/{MANIFEST_DB_NAME})")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    sku = subparsers.add_parser('sku', help='Print the entry for one SKU')
+    sku.add_argument('sku')
+
+    brand = subparsers.add_parser('brand', help="Print every entry for a brand")
+    brand.add_argument('brand')
+
+    subparsers.add_parser('brands', help='Print the product count per brand')
+
+    export = subparsers.add_parser('export', help='Export the manifest')
+    export.add_argument('output', help='Output file')
+    export.add_argument('--format', choices=['json', 'ndjson'], default='json', help='Export format')
+    export.add_argument('--brand', help='Only export this brand')
+
+    args = parser.parse_args()
+    if not Path(args.db).exists():
+        parser.error(f"Manifest database not found: {args.db}")
+
+    store = ManifestStore(Path(args.db))
+    try:
+        if args.command == 'sku':
+            entry = store.get(args.sku.lower())
+            if entry is None:
+                print(f"SKU not found: {args.sku}", file=sys.stderr)
+                sys.exit(1)
+            print(json.dumps(entry))
+        elif args.command == 'brand':
+            print(json.dumps(store.by_brand(args.brand)))
+        elif args.command == 'brands':
+            print(json.dumps(store.brands()))
+        elif args.format == 'ndjson':
+            store.export_ndjson(Path(args.output), args.brand)
+        else:
+            store.export_json(Path(args.output), args.brand)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
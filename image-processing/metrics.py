@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Pipeline Metrics
+Per-image stage timings and byte counts, aggregated into histograms
+"""
+
+import os
+import json
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Sequence
+
+# Histogram bucket upper bounds, Prometheus style (each bucket counts everything <= its bound)
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024, 16 * 1024 * 1024)
+
+PROMETHEUS_PREFIX = 'zofaire_image'
+
+
+class Histogram:
+    """Fixed-bucket histogram; memory stays constant however many values are observed."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def cumulative(self) -> Dict[str, int]:
+        """Cumulative counts keyed by upper bound, ending with ``+Inf``."""
+        buckets, running = {}, 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            running += count
+            buckets['+Inf' if bound == float('inf') else f"{bound:g}"] = running
+        return buckets
+
+    def summary(self) -> Dict:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else None,
+            'max': round(self.max, 6),
+            'buckets': self.cumulative()
+        }
+
+
+class ImageMetrics:
+    """Stage timings and byte counts for one image, filled in as it moves through the pipeline."""
+
+    def __init__(self, sku: str, index: int):
+        self.sku = sku
+        self.index = index
+        self.stages: Dict[str, float] = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as (part of) stage ``name``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+
+class PipelineMetrics:
+    """
+    Aggregates per-image metrics for a run.
+
+    Each finished image is folded into per-stage duration histograms and byte
+    histograms, and, if ``events_path`` is given, appended to that file as one
+    JSON line. ``write_prometheus`` dumps the aggregates in the Prometheus
+    text format for node_exporter's textfile collector.
+    """
+
+    def __init__(self, events_path: Optional[Path] = None):
+        self.stages: Dict[str, Histogram] = {}
+        self.bytes_in = Histogram(BYTES_BUCKETS)
+        self.bytes_out = Histogram(BYTES_BUCKETS)
+        self.outcomes = Counter()
+        self._lock = threading.Lock()
+        self._events = None
+        if events_path is not None:
+            Path(events_path).parent.mkdir(parents=True, exist_ok=True)
+            self._events = open(events_path, 'a')
+
+    def image(self, sku: str, index: int) -> ImageMetrics:
+        return ImageMetrics(sku, index)
+
+    def record(self, image: ImageMetrics, outcome: str):
+        """Fold a finished image in; ``outcome`` is e.g. processed, cache_hit, duplicate or failed."""
+        with self._lock:
+            self.outcomes[outcome] += 1
+            for stage, seconds in image.stages.items():
+                if stage not in self.stages:
+                    self.stages[stage] = Histogram(SECONDS_BUCKETS)
+                self.stages[stage].observe(seconds)
+            if image.bytes_in:
+                self.bytes_in.observe(image.bytes_in)
+            if image.bytes_out:
+                self.bytes_out.observe(image.bytes_out)
+
+            if self._events is not None:
+                self._events.write(json.dumps({
+                    'ts': round(time.time(), 3),
+                    'sku': image.sku,
+                    'index': image.index,
+                    'outcome': outcome,
+                    'stages_ms': {stage: round(seconds * 1000, 3) for stage, seconds in image.stages.items()},
+                    'bytes_in': image.bytes_in,
+                    'bytes_out': image.bytes_out
+                }) + '\n')
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {
+                'images': dict(self.outcomes),
+                'stage_seconds': {stage: hist.summary() for stage, hist in sorted(self.stages.items())},
+                'bytes_in': self.bytes_in.summary(),
+                'bytes_out': self.bytes_out.summary()
+            }
+
+    def write_prometheus(self, path: Path):
+        """Write the aggregates as a Prometheus textfile, atomically so a scrape never sees half a file."""
+        lines = [
+            f"# HELP {PROMETHEUS_PREFIX}_stage_seconds Time spent on one image in each pipeline stage",
+            f"# TYPE {PROMETHEUS_PREFIX}_stage_seconds histogram"
+        ]
+        with self._lock:
+            for stage, hist in sorted(self.stages.items()):
+                lines.extend(_histogram_lines(f"{PROMETHEUS_PREFIX}_stage_seconds", hist, f'stage="{stage}",'))
+            lines.append(f"# HELP {PROMETHEUS_PREFIX}_bytes Source bytes read and output bytes written per image")
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_bytes histogram")
+            for direction, hist in (('in', self.bytes_in), ('out', self.bytes_out)):
+                lines.extend(_histogram_lines(f"{PROMETHEUS_PREFIX}_bytes", hist, f'direction="{direction}",'))
+            lines.append(f"# HELP {PROMETHEUS_PREFIX}s_total Images handled, by outcome")
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}s_total counter")
+            for outcome, count in sorted(self.outcomes.items()):
+                lines.append(f'{PROMETHEUS_PREFIX}s_total{{outcome="{outcome}"}} {count}')
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(path.name + '.tmp')
+        temp_path.write_text('\n'.join(lines) + '\n')
+        os.replace(temp_path, path)
+
+    def close(self):
+        if self._events is not None:
+            self._events.close()
+            self._events = None
+
+
+def _histogram_lines(name: str, hist: Histogram, labels: str) -> Iterator[str]:
+    for bound, count in hist.cumulative().items():
+        yield f'{name}_bucket{{{labels}le="{bound}"}} {count}'
+    yield f'{name}_sum{{{labels.rstrip(",")}}} {hist.sum:.6f}'
+    yield f'{name}_count{{{labels.rstrip(",")}}} {hist.count}'
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Staged Work Pipeline
+Runs items through worker stages joined by bounded queues, under a memory budget
+"""
+
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+_STOP = object()
+
+
+@dataclass
+class Stage:
+    """One pipeline step: ``fn`` takes an item and returns it, run by ``workers`` threads."""
+    name: str
+    fn: Callable[[Any], Any]
+    workers: int = 1
+
+
+class MemoryBudget:
+    """
+    Caps the bytes of decoded image data held across the pipeline.
+
+    ``acquire`` blocks while the reservation would take the total over
+    ``limit_bytes``. A single item larger than the whole budget is still let
+    through once nothing else is held, so an oversized image can't deadlock a run.
+    """
+
+    def __init__(self, limit_bytes: int):
+        self.limit_bytes = limit_bytes
+        self.in_use = 0
+        self.peak = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, amount: int):
+        with self._condition:
+            while self.in_use and self.in_use + amount > self.limit_bytes:
+                self._condition.wait()
+            self.in_use += amount
+            self.peak = max(self.peak, self.in_use)
+
+    def release(self, amount: int):
+        with self._condition:
+            self.in_use -= amount
+            self._condition.notify_all()
+
+
+class Pipeline:
+    """
+    Threads per stage, connected by queues of at most ``queue_size`` items.
+
+    A full queue blocks the stage feeding it, so a fast stage (downloads) can
+    never run more than ``queue_size`` items ahead of a slow one (encoding).
+    Items come out of ``run`` in completion order. If a stage raises, ``on_error``
+    is called with the item, the stage name and the exception and must return
+    the item to pass on; later stages are expected to let finished items through.
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = 8,
+                 on_error: Optional[Callable[[Any, str, Exception], Any]] = None):
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.on_error = on_error
+
+    def run(self, items: Iterable) -> Iterator:
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        feed_error: List[BaseException] = []
+        threads = []
+
+        def feed():
+            try:
+                for item in items:
+                    queues[0].put(item)
+            except BaseException as e:
+                feed_error.append(e)
+            finally:
+                queues[0].put(_STOP)
+
+        def work(stage: Stage, inbox: queue.Queue, outbox: queue.Queue, remaining: Dict[str, int],
+                 lock: threading.Lock):
+            while True:
+                item = inbox.get()
+                if item is _STOP:
+                    # Let sibling workers see the stop too; the last one out passes it downstream
+                    inbox.put(_STOP)
+                    with lock:
+                        remaining['workers'] -= 1
+                        last = remaining['workers'] == 0
+                    if last:
+                        outbox.put(_STOP)
+                    return
+                try:
+                    item = stage.fn(item)
+                except Exception as e:
+                    if self.on_error is None:
+                        raise
+                    item = self.on_error(item, stage.name, e)
+                outbox.put(item)
+
+        threads.append(threading.Thread(target=feed, name='pipeline-feed', daemon=True))
+        for i, stage in enumerate(self.stages):
+            remaining = {'workers': max(1, stage.workers)}
+            lock = threading.Lock()
+            for n in range(remaining['workers']):
+                threads.append(threading.Thread(
+                    target=work, args=(stage, queues[i], queues[i + 1], remaining, lock),
+                    name=f"pipeline-{stage.name}-{n}", daemon=True
+                ))
+        for thread in threads:
+            thread.start()
+
+        while True:
+            item = queues[-1].get()
+            if item is _STOP:
+                break
+            yield item
+
+        for thread in threads:
+            thread.join()
+        if feed_error:
+            raise feed_error[0]
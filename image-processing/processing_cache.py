@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed Processing Cache
+Skips re-processing images whose source bytes and settings haven't changed
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bump when the image transform or the metadata stored with it changes so stale entries are never reused
+CACHE_VERSION = 3
+
+DEFAULT_CACHE_DIR = Path(os.environ.get('ZOFAIRE_IMAGE_CACHE', Path.home() / '.cache' / 'zofaire' / 'images'))
+DEFAULT_CACHE_SIZE_MB = 2048
+
+META_FILENAME = 'meta.json'
+
+
+class ProcessingCache:
+    """
+    On-disk cache of processed outputs keyed by source content plus settings.
+
+    Each entry is a directory ``<root>/<key[:2]>/<key>/`` holding one file per
+    output (e.g. ``main.webp``, ``thumbnail.webp``) and a ``meta.json``. Recency
+    is the mtime of ``meta.json``, refreshed on every hit, and entries are evicted
+    least-recently-used first once the cache grows past ``max_bytes``.
+
+    A copy sent to a worker process doesn't keep an index or evict. It records
+    its hits and stores, which the parent folds into the one index with
+    ``merge(worker.take_changes())``, so the size bound and the LRU order hold
+    across all workers.
+    """
+
+    def __init__(self, cache_dir: Path = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_CACHE_SIZE_MB * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, int]' = OrderedDict()
+        self._total_bytes = 0
+        # Hits (key, None) and stores (key, size) awaiting merge(); only a worker's copy records them
+        self._changes: Optional[List[Tuple[str, Optional[int]]]] = None
+        self._load_index()
+
+    def __getstate__(self):
+        # The index stays with the parent; locks can't be pickled
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['_entries'] = OrderedDict()
+        state['_total_bytes'] = 0
+        state['_changes'] = []
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def worker_copy(self) -> 'ProcessingCache':
+        """The copy a worker process works with, also when it was forked rather than handed a pickled one."""
+        copy = ProcessingCache.__new__(ProcessingCache)
+        copy.__setstate__(self.__getstate__())
+        return copy
+
+    def _load_index(self):
+        """Rebuild the in-memory LRU index from what is on disk."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        found = []
+        for shard in self.cache_dir.iterdir():
+            if not shard.is_dir() or len(shard.name) != 2:
+                continue
+            for entry in shard.iterdir():
+                if entry.name.startswith('.'):
+                    continue  # staging directory left behind by an interrupted store
+                meta = entry / META_FILENAME
+                try:
+                    used = meta.stat().st_mtime
+                    size = sum(f.stat().st_size for f in entry.iterdir())
+                except OSError:
+                    continue
+                found.append((used, entry.name, size))
+
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._evict()
+
+    @staticmethod
+    def key_for(source: bytes, params: Dict) -> str:
+        """Hash the source bytes together with every setting that affects the output."""
+        digest = hashlib.sha256()
+        digest.update(json.dumps({'version': CACHE_VERSION, **params}, sort_keys=True, default=str).encode())
+        digest.update(source)
+        return digest.hexdigest()
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def restore(self, key: str, targets: Dict[str, Path]) -> Optional[Dict]:
+        """
+        Copy the cached outputs for ``key`` to ``targets`` (output name -> path).
+
+        Returns the metadata stored with the entry on a hit, or None on a miss.
+        """
+        entry = self._entry_dir(key)
+        try:
+            with open(entry / META_FILENAME) as f:
+                meta = json.load(f)
+            for name, target in targets.items():
+                # Copy beside the target and rename in, so a crash never leaves a partial output
+                temp_target = Path(target).with_name(f".{Path(target).name}.{os.getpid()}.tmp")
+                try:
+                    shutil.copyfile(entry / meta['files'][name], temp_target)
+                    os.replace(temp_target, target)
+                finally:
+                    temp_target.unlink(missing_ok=True)
+            os.utime(entry / META_FILENAME)
+        except (OSError, KeyError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            if self._changes is not None:
+                self._changes.append((key, None))
+            elif key in self._entries:
+                self._entries.move_to_end(key)
+        return meta.get('data', {})
+
+    def store(self, key: str, outputs: Dict[str, Path], data: Optional[Dict] = None):
+        """Add freshly produced outputs (output name -> path) to the cache."""
+        entry = self._entry_dir(key)
+        staging = None
+        try:
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            # Build the entry in a scratch directory so readers never see half of it
+            staging = Path(tempfile.mkdtemp(prefix=f".{key[:8]}-", dir=entry.parent))
+            files = {}
+            for name, source in outputs.items():
+                filename = f"{name}{Path(source).suffix}"
+                shutil.copyfile(source, staging / filename)
+                files[name] = filename
+            with open(staging / META_FILENAME, 'w') as f:
+                json.dump({'files': files, 'data': data or {}}, f)
+            size = sum(f.stat().st_size for f in staging.iterdir())
+
+            if entry.exists():
+                shutil.rmtree(entry, ignore_errors=True)
+            os.replace(staging, entry)
+        except OSError as e:
+            logger.warning(f"⚠️  Could not write cache entry {key[:12]}: {str(e)}")
+            if staging:
+                shutil.rmtree(staging, ignore_errors=True)
+            return
+
+        with self._lock:
+            if self._changes is not None:
+                self._changes.append((key, size))
+                return
+            self._index(key, size)
+            self._evict()
+
+    def take_changes(self) -> List[Tuple[str, Optional[int]]]:
+        """The hits and stores a worker's copy has made since the last call, for the parent to merge()."""
+        with self._lock:
+            if self._changes is None:
+                return []
+            changes, self._changes = self._changes, []
+        return changes
+
+    def merge(self, changes: List[Tuple[str, Optional[int]]]):
+        """Fold a worker's hits and stores into the index, in the order they happened, then evict."""
+        with self._lock:
+            for key, size in changes:
+                if size is None:
+                    if key in self._entries:
+                        self._entries.move_to_end(key)
+                    continue
+                self._index(key, size)
+            self._evict()
+
+    def _index(self, key: str, size: int):
+        """Record an entry as the most recently used."""
+        self._total_bytes += size - self._entries.pop(key, 0)
+        self._entries[key] = size
+
+    def _evict(self):
+        """Drop least-recently-used entries until the cache fits in max_bytes."""
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+    def summary(self) -> Dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'size_bytes': self._total_bytes
+        }
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Image Processing Core
+The one transform pipeline every processor script runs: decode, convert, trim, fit, then pad and render each output in one pass
+"""
+
+import logging
+from contextlib import nullcontext
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple, Union
+
+from PIL import Image
+
+from image_engine import (TRANSPARENT, EncoderProfile, VariantSpec, compose_variants, encode_variants, open_image,
+                          padded_size, to_working_mode, trim_to_content, variant_path, write_variants)
+from metrics import ImageMetrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class TransformSettings:
+    """
+    How a decoded source is fitted and padded for every output.
+
+    ``max_size`` is the bounding box oversized sources are shrunk into before
+    padding (None leaves them at full size); ``background`` fills the padding.
+    """
+    padding: int = 50
+    max_size: Optional[Tuple[int, int]] = None
+    trim: bool = False
+    background: Tuple[int, int, int, int] = TRANSPARENT
+
+
+class ProcessingCore:
+    """
+    Turns a source image into encoded outputs, the same way for every front-end.
+
+    The processor scripts differ only in their TransformSettings, the variants
+    they write and the encoder profile. JPEG sources headed for ``max_size``
+    are decoded at reduced scale, and padding is applied while compositing
+    each output (see compose_variants) rather than as a separate full-size
+    frame. Stage timings go into ``metrics`` when one is given.
+    """
+
+    def __init__(self, settings: Optional[TransformSettings] = None, specs: Optional[Iterable[VariantSpec]] = None,
+                 encoder: Optional[EncoderProfile] = None):
+        self.settings = settings or TransformSettings()
+        self.specs: List[VariantSpec] = list(specs) if specs else [VariantSpec('main')]
+        self.encoder = encoder or EncoderProfile()
+
+    def open(self, source: Union[str, Path, BinaryIO]) -> Image.Image:
+        """
+        Open a source, decoding JPEGs at reduced scale when they will be shrunk to max_size.
+
+        Trimming happens before the fit and can remove most of the frame, so a
+        trimmed source's final size isn't known until it is decoded; those are
+        decoded at full size rather than shrunk below the bound.
+        """
+        return open_image(source, None if self.settings.trim else self.settings.max_size)
+
+    def prepare(self, image: Image.Image, metrics: Optional[ImageMetrics] = None) -> Image.Image:
+        """Convert a decoded source to RGB, or RGBA if it has transparency, then trim it and fit it to max_size."""
+        settings = self.settings
+        if image.mode != 'RGB':
+            with _timed(metrics, 'convert'):
+                image = to_working_mode(image)
+
+        # Drop existing transparent or white borders so padding isn't doubled up
+        if settings.trim:
+            with _timed(metrics, 'trim'):
+                image = trim_to_content(image)
+
+        max_size = settings.max_size
+        if max_size and (image.width > max_size[0] or image.height > max_size[1]):
+            with _timed(metrics, 'resize'):
+                image.thumbnail(max_size, Image.Resampling.LANCZOS)
+            logger.info(f"📏 Resized to: {image.size}")
+        return image
+
+    def padded_size(self, size: Tuple[int, int]) -> Tuple[int, int]:
+        """Size of the full-size output for a prepared image of ``size``."""
+        return padded_size(size, self.settings.padding)
+
+    def render(self, image: Image.Image, metrics: Optional[ImageMetrics] = None) -> Dict[str, Image.Image]:
+        """Pad and render every variant from a prepared image."""
+        with _timed(metrics, 'composite'):
+            return compose_variants(image, self.settings.padding, self.specs, self.settings.background)
+
+    def encode(self, rendered: Dict[str, Image.Image], metrics: Optional[ImageMetrics] = None) -> Dict[str, bytes]:
+        """Encode every rendered variant in memory."""
+        with _timed(metrics, 'encode'):
+            encoded = encode_variants(rendered, self.specs, self.encoder)
+        if metrics is not None:
+            metrics.bytes_out = sum(len(data) for data in encoded.values())
+        return encoded
+
+    def transform(self, image: Image.Image,
+                  metrics: Optional[ImageMetrics] = None) -> Tuple[Tuple[int, int], Dict[str, bytes]]:
+        """Prepare, render and encode a decoded image; returns the full-size output's size and the outputs."""
+        image = self.prepare(image, metrics)
+        return self.padded_size(image.size), self.encode(self.render(image, metrics), metrics)
+
+    def process(self, source: Union[str, Path, BinaryIO],
+                metrics: Optional[ImageMetrics] = None) -> Tuple[Tuple[int, int], Dict[str, bytes]]:
+        """Decode a source and transform it."""
+        with _timed(metrics, 'decode'):
+            image = self.open(source)
+            image.load()
+        return self.transform(image, metrics)
+
+    def paths(self, base_path: Path) -> Dict[str, Path]:
+        """Output path of every variant for an extensionless base such as ``out/abc123_1``."""
+        return {spec.name: variant_path(base_path, spec) for spec in self.specs}
+
+    def process_file(self, source: Union[str, Path, BinaryIO], base_path: Path,
+                     metrics: Optional[ImageMetrics] = None) -> Dict[str, Path]:
+        """Decode a source, transform it and write every variant next to ``base_path``."""
+        _, encoded = self.process(source, metrics)
+        with _timed(metrics, 'write'):
+            return write_variants(encoded, self.specs, Path(base_path))
+
+
+def _timed(metrics: Optional[ImageMetrics], stage: str):
+    return metrics.stage(stage) if metrics is not None else nullcontext()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Rename Planning
+Plans every rename in a brand folder up front, then applies the plan in two phases so no file is ever overwritten
+"""
+
+import os
+import re
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from sku_index import SkuMatcher
+
+IMAGE_EXTENSIONS = ('.webp', '.jpg', '.jpeg', '.png')
+
+# Temporary names carry the name they're headed for, so a run that was cut short can be finished by the next
+TEMP_SUFFIX = '.renaming'
+TEMP_NAME = re.compile(r'^\.(.+)\.[0-9a-f]{12}' + re.escape(TEMP_SUFFIX) + '$')
+
+
+@dataclass(frozen=True)
+class Rename:
+    """One file's move; ``staged`` when its target is held by another file that is moving too."""
+    source: Path
+    target: Path
+    staged: bool = False
+
+
+@dataclass
+class RenamePlan:
+    """
+    Every rename for one folder, worked out before anything is moved.
+
+    ``groups`` lists each SKU with its image count. ``cycles`` are chains of
+    renames that lead back to their start (``a_1 -> a_2 -> a_1``). Those, and
+    any rename onto a name another file is moving away from, are staged
+    through a temporary name. ``conflicts`` are renames left out because their
+    target is a file the plan doesn't move.
+    """
+    folder: Path
+    groups: List[Tuple[str, int]] = field(default_factory=list)
+    renames: List[Rename] = field(default_factory=list)
+    unchanged: int = 0
+    cycles: List[List[str]] = field(default_factory=list)
+    conflicts: List[str] = field(default_factory=list)
+    # Renames that failed when the plan was applied
+    failures: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        return {
+            'folder': str(self.folder),
+            'skus': len(self.groups),
+            'unchanged': self.unchanged,
+            'renames': [
+                {'from': r.source.name, 'to': r.target.name, 'staged': r.staged} for r in self.renames
+            ],
+            'cycles': self.cycles,
+            'conflicts': self.conflicts,
+            'failures': self.failures
+        }
+
+
+def _image_names(folder: Path, conflicts: List[str]) -> Tuple[List[str], Dict[Path, Path]]:
+    """
+    Every entry name in ``folder``, and its images keyed by the name each one
+    stands for: its own, or for a leftover temporary file, the name it was headed for.
+    """
+    with os.scandir(folder) as scan:
+        entries = [(entry.name, entry.is_file()) for entry in scan]
+    images = {}
+    leftovers = []
+    for name, is_file in entries:
+        leftover = TEMP_NAME.match(name)
+        if leftover:
+            leftovers.append((leftover.group(1), name))
+        elif is_file and Path(name).suffix.lower() in IMAGE_EXTENSIONS:
+            images[folder / name] = folder / name
+    for intended, name in leftovers:
+        if folder / intended in images:
+            conflicts.append(f"{name}: left by an interrupted run, but {intended} exists")
+        elif Path(intended).suffix.lower() in IMAGE_EXTENSIONS:
+            images[folder / intended] = folder / name
+    return [name for name, _ in entries], images
+
+
+def _find_cycles(renames: List[Rename], occupant: Dict[str, Rename]) -> List[List[str]]:
+    """Rename chains that lead back to where they started; each file is renamed at most once, so chains never branch."""
+    cycles = []
+    state: Dict[Rename, int] = {}
+    for start in renames:
+        path = []
+        rename = start
+        while rename is not None and rename not in state:
+            state[rename] = len(path)
+            path.append(rename)
+            rename = occupant.get(rename.target.name.casefold())
+        if rename is not None and state[rename] >= 0:
+            cycles.append([r.source.name for r in path[state[rename]:]])
+        for r in path:
+            state[r] = -1
+    return cycles
+
+
+def plan_renames(folder: Path, matcher: Optional[SkuMatcher] = None) -> RenamePlan:
+    """
+    Plan the renames that number a folder's images per SKU as ``sku_1.ext``,
+    ``sku_2.ext``... in sorted filename order.
+
+    The folder is listed once and nothing is touched. Names are compared
+    without regard to case, as on the case-insensitive filesystems brand
+    folders are often synced from, so a rename is never planned onto a name
+    that differs from a standing file only in case.
+    """
+    folder = Path(folder)
+    matcher = matcher or SkuMatcher()
+    plan = RenamePlan(folder)
+    names, images = _image_names(folder, plan.conflicts)
+
+    renames = []
+    for sku, files in matcher.group(images):
+        plan.groups.append((sku, len(files)))
+        for i, name in enumerate(files, 1):
+            source = images[name]
+            target = folder / f"{sku}_{i}{name.suffix.lower()}"
+            # Already correctly named
+            if source == name and name.name.lower() == target.name:
+                plan.unchanged += 1
+                continue
+            renames.append(Rename(source, target))
+
+    # A target held by a file that isn't moving can't be used; leaving that rename out keeps its
+    # source where it is, which can block another target in turn
+    while True:
+        moving = {r.source.name.casefold() for r in renames}
+        standing = {name.casefold() for name in names} - moving
+        blocked = [r for r in renames if r.target.name.casefold() in standing]
+        if not blocked:
+            break
+        for r in blocked:
+            plan.conflicts.append(f"{r.source.name} -> {r.target.name}: target exists and is not being renamed")
+        renames = [r for r in renames if r not in blocked]
+
+    occupant = {r.source.name.casefold(): r for r in renames}
+    plan.cycles = _find_cycles(renames, occupant)
+    plan.renames = [
+        Rename(r.source, r.target, staged=occupant.get(r.target.name.casefold(), r) is not r) for r in renames
+    ]
+    return plan
+
+
+def _move(source: Path, target: Path):
+    """``os.replace`` that refuses to replace anything but ``source`` itself (a change of case only)."""
+    if os.path.lexists(target) and not os.path.samefile(source, target):
+        raise FileExistsError(f"{target.name} appeared after the rename plan was made")
+    os.replace(source, target)
+
+
+def apply_plan(plan: RenamePlan) -> List[str]:
+    """
+    Carry out a plan and return the renames that failed.
+
+    Phase one moves every staged file to a unique temporary name and every
+    other file straight to its target, which nothing holds. Phase two moves
+    the staged files from their temporary names to their targets, all of
+    which phase one freed. A file whose rename fails stays where it was, or
+    under its temporary name for the next run to finish.
+    """
+    token = uuid.uuid4().hex[:12]
+    staged = []
+    for rename in plan.renames:
+        try:
+            if rename.staged:
+                temp_path = plan.folder / f".{rename.target.name}.{token}{TEMP_SUFFIX}"
+                os.replace(rename.source, temp_path)
+                staged.append((temp_path, rename))
+            else:
+                _move(rename.source, rename.target)
+        except OSError as e:
+            plan.failures.append(f"{rename.source.name} -> {rename.target.name}: {e}")
+    for temp_path, rename in staged:
+        try:
+            _move(temp_path, rename.target)
+        except OSError as e:
+            plan.failures.append(f"{rename.source.name} -> {rename.target.name}: {e}")
+    return plan.failures
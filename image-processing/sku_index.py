@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+SKU Matching
+One compiled engine for pulling SKUs out of image filenames, shared by the processor, renamer and verifier
+"""
+
+import os
+import re
+from pathlib import Path
+from typing import Iterable, List, Optional, Set, Tuple
+
+from catalog_io import iter_products
+
+# Where a SKU can end inside a filename stem
+BOUNDARY = re.compile(r'[_\-\s.]')
+
+# Processed output names: sku_1, sku_1_400x400
+OUTPUT_NAME = re.compile(r'^(.+)_(\d+)(?:_\d+x\d+)?$')
+
+# Without a known SKU list, an output name's SKU must look like one
+SKU_CHARS = re.compile(r'^[a-z0-9\-]+$')
+
+
+def normalize_sku(sku: str) -> str:
+    return str(sku).strip().lower()
+
+
+def load_known_skus(items_path: Path) -> Set[str]:
+    """Every SKU in a Zoho items export (JSON array or NDJSON), normalized; read one item at a time."""
+    return {normalize_sku(item['sku']) for item in iter_products(Path(items_path)) if item.get('sku')}
+
+
+class SkuMatcher:
+    """
+    Extracts the SKU from an image filename.
+
+    With ``known_skus`` the SKU is the longest prefix of the lowercased stem that
+    ends at a delimiter (``_``, ``-``, space or ``.``) and is a known SKU. SKUs
+    that contain delimiters themselves (``1b23-rs66-n8s6``, ``xxx 17192 old sku``)
+    are matched whole. A filename has only a few delimiters and each candidate is
+    one set lookup, so matching costs the same however many SKUs are known.
+
+    Anything that doesn't match a known SKU, or every file when no SKUs are
+    known, falls back to the text before the first underscore.
+    """
+
+    def __init__(self, known_skus: Optional[Iterable[str]] = None):
+        self.known = {normalize_sku(sku) for sku in known_skus} if known_skus else set()
+        self.max_length = max((len(sku) for sku in self.known), default=0)
+
+    @classmethod
+    def from_items(cls, items_path: Optional[Path]) -> 'SkuMatcher':
+        return cls(load_known_skus(items_path) if items_path else None)
+
+    def __len__(self):
+        return len(self.known)
+
+    def is_known(self, sku: str) -> bool:
+        return sku in self.known
+
+    def lookup(self, filename: str) -> Optional[str]:
+        """The known SKU ``filename`` belongs to, or None."""
+        if not self.known:
+            return None
+        stem = os.path.splitext(filename)[0].lower()
+        candidates = [m.start() for m in BOUNDARY.finditer(stem, 0, self.max_length + 1)]
+        candidates.append(len(stem))
+        for end in reversed(candidates):
+            if end <= self.max_length and stem[:end] in self.known:
+                return stem[:end]
+        return None
+
+    def extract(self, filename: str) -> str:
+        """The SKU for ``filename``: a known SKU if one matches, else the text before the first underscore."""
+        sku = self.lookup(filename)
+        if sku is not None:
+            return sku
+        stem = os.path.splitext(filename)[0].lower()
+        return stem.lstrip('_- ').split('_')[0].strip()
+
+    def group(self, filenames: Iterable) -> List[Tuple[str, List]]:
+        """Group paths (or names) by SKU, sorted by SKU with each group's files sorted."""
+        groups = {}
+        for filename in filenames:
+            sku = self.extract(Path(filename).name)
+            if sku:
+                groups.setdefault(sku, []).append(filename)
+        return [(sku, sorted(files)) for sku, files in sorted(groups.items())]
+
+    def parse_output_name(self, stem: str) -> Optional[Tuple[str, int]]:
+        """
+        ``(sku, number)`` for a processed output name such as ``sku_1`` or
+        ``sku_1_400x400``, or None if the name doesn't follow that convention or
+        its SKU isn't known (or, with no known SKUs, doesn't look like one).
+        """
+        match = OUTPUT_NAME.match(stem.lower())
+        if not match:
+            return None
+        sku = match.group(1)
+        valid = self.is_known(sku) if self.known else bool(SKU_CHARS.match(sku))
+        return (sku, int(match.group(2))) if valid else None
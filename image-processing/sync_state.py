@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Incremental Sync State
+Remembers what each SKU looked like last run so unchanged products can be skipped
+"""
+
+import os
+import json
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STATE_VERSION = 1
+
+# Zoho fields that change whenever a product's image does
+IDENTITY_FIELDS = ('image_document_id', 'image_name', '_lastSynced', 'image_url', 'images')
+
+
+class SyncState:
+    """
+    Per-SKU fingerprints and results from the previous run, stored as JSON.
+
+    A fingerprint covers the product's image identity fields plus the processor
+    settings, so changing padding or quality also counts as a change.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.products: Dict[str, Dict] = {}
+        self.seen = set()
+
+        if self.path.exists():
+            try:
+                with open(self.path) as f:
+                    data = json.load(f)
+                if data.get('version') == STATE_VERSION:
+                    self.products = data.get('products', {})
+                else:
+                    logger.warning(f"⚠️  Ignoring sync state with unknown version: {self.path}")
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️  Could not read sync state, doing a full run: {str(e)}")
+
+    @staticmethod
+    def fingerprint(product: Dict, params: Dict) -> str:
+        identity = {field: product.get(field) for field in IDENTITY_FIELDS}
+        payload = json.dumps({'identity': identity, 'params': params}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def unchanged(self, sku: str, fingerprint: str) -> Optional[Dict]:
+        """
+        Return the previous product result if ``sku`` is unchanged and its outputs
+        are all still on disk, otherwise None.
+        """
+        self.seen.add(sku)
+        entry = self.products.get(sku)
+        if not entry or entry['fingerprint'] != fingerprint:
+            return None
+        if not all(Path(path).exists() for path in self._outputs(entry['result'])):
+            return None
+        return entry['result']
+
+    def record(self, sku: str, fingerprint: str, product_result: Dict):
+        self.seen.add(sku)
+        self.products[sku] = {'fingerprint': fingerprint, 'result': product_result}
+
+    @staticmethod
+    def _outputs(product_result: Dict) -> List[str]:
+        paths = []
+        for image in product_result.get('images', []):
+            paths.append(image['main_image'])
+            paths.extend(image.get('variants', {}).values())
+        return paths
+
+    def prune(self) -> List[str]:
+        """Delete outputs of SKUs that were not in this run's input and forget them."""
+        removed = []
+        for sku in [sku for sku in self.products if sku not in self.seen]:
+            for path in self._outputs(self.products.pop(sku)['result']):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            removed.append(sku)
+        return removed
+
+    def save(self):
+        """Write the state atomically so a crash never leaves a truncated file."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump({'version': STATE_VERSION, 'products': self.products}, f)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,44 @@
+"""Regression checks for perceptual duplicate detection (run with: python -m pytest image-processing)."""
+
+import io
+
+from PIL import Image
+
+from benchmark import make_photo_image
+from dedup import DuplicateIndex, image_signature
+
+
+def _packshot(colour):
+    """A flat product colour centred on white, like the fixture catalogs."""
+    image = Image.new('RGB', (800, 600), (255, 255, 255))
+    image.paste(colour, (133, 100, 667, 500))
+    return image
+
+
+def _reencoded(image, quality):
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=quality)
+    return Image.open(io.BytesIO(buffer.getvalue()))
+
+
+def test_colour_variants_are_not_joined():
+    index = DuplicateIndex()
+    index.add(image_signature(_packshot((1, 90, 255))), 'blue')
+    assert index.find(image_signature(_packshot((22, 90, 233)))) is None
+    assert index.find(image_signature(_packshot((1, 90, 235)))) is None
+
+
+def test_identical_copy_is_joined_to_its_original():
+    original = _packshot((1, 90, 255))
+    index = DuplicateIndex()
+    index.add(image_signature(_packshot((22, 90, 233))), 'variant')
+    index.add(image_signature(original), 'original')
+    assert index.find(image_signature(original.copy())) == 'original'
+    assert index.summary()['duplicates'] == 1
+
+
+def test_reencoded_photo_is_joined():
+    photo = make_photo_image((800, 600))
+    index = DuplicateIndex()
+    index.add(image_signature(_reencoded(photo, 90)), 'photo')
+    assert index.find(image_signature(_reencoded(photo, 60))) == 'photo'
@@ -0,0 +1,90 @@
+"""Checks for the pooled image fetcher against a local HTTP server (run with: python -m pytest image-processing)."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from fetcher import ImageFetcher
+
+BODY = b'\xff\xd8 not really a jpeg'
+
+
+def _failing(times, status):
+    """Answer ``status`` to the first ``times`` requests, then BODY."""
+    calls = []
+
+    def respond(handler):
+        calls.append(handler.path)
+        if len(calls) <= times:
+            handler.reply(status, b'busy', {'Retry-After': '0'})
+        else:
+            handler.reply(200, BODY)
+    return respond
+
+
+@pytest.mark.parametrize('status', [500, 503, 429])
+def test_retries_transient_errors(http_server, status):
+    http_server.respond = _failing(2, status)
+    with ImageFetcher(retries=3, backoff=0) as fetcher:
+        assert fetcher.fetch_bytes(f"{http_server.url}/image.jpg") == BODY
+    assert len(http_server.requests) == 3
+
+
+def test_gives_up_after_the_last_retry(http_server):
+    http_server.respond = _failing(10, 503)
+    with ImageFetcher(retries=2, backoff=0) as fetcher:
+        with pytest.raises(requests.HTTPError):
+            fetcher.fetch_bytes(f"{http_server.url}/image.jpg")
+    assert len(http_server.requests) == 3
+
+
+def test_client_errors_are_not_retried(http_server):
+    http_server.respond = lambda handler: handler.reply(404)
+    with ImageFetcher(retries=3, backoff=0) as fetcher:
+        with pytest.raises(requests.HTTPError):
+            fetcher.fetch_bytes(f"{http_server.url}/missing.jpg")
+    assert len(http_server.requests) == 1
+
+
+def test_declared_oversize_body_is_refused(http_server):
+    http_server.respond = lambda handler: handler.reply(200, b'x' * 2048)
+    with ImageFetcher(max_bytes=1024) as fetcher:
+        with pytest.raises(ValueError, match='download limit'):
+            fetcher.fetch_bytes(f"{http_server.url}/big.jpg")
+
+
+def test_streamed_body_is_abandoned_past_the_limit(http_server):
+    def respond(handler):
+        # No Content-Length: the body runs until the connection closes
+        handler.close_connection = True
+        handler.send_response(200)
+        handler.send_header('Connection', 'close')
+        handler.end_headers()
+        try:
+            for _ in range(64):
+                handler.wfile.write(b'x' * 64 * 1024)
+        except OSError:
+            pass  # the client hung up once it passed the limit
+
+    http_server.respond = respond
+    with ImageFetcher(max_bytes=256 * 1024) as fetcher:
+        with pytest.raises(ValueError, match='download limit'):
+            fetcher.fetch_bytes(f"{http_server.url}/endless.jpg")
+
+
+def test_sequential_requests_reuse_one_connection(http_server):
+    http_server.respond = lambda handler: handler.reply(200, BODY)
+    with ImageFetcher() as fetcher:
+        for n in range(5):
+            assert fetcher.fetch_bytes(f"{http_server.url}/{n}.jpg") == BODY
+    assert len({request['port'] for request in http_server.requests}) == 1
+
+
+def test_concurrent_requests_stay_within_the_pool(http_server):
+    http_server.respond = lambda handler: handler.reply(200, BODY)
+    with ImageFetcher(max_workers=4, per_host_limit=4) as fetcher:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            bodies = list(executor.map(fetcher.fetch_bytes, [f"{http_server.url}/{n}.jpg" for n in range(40)]))
+    assert bodies == [BODY] * 40
+    assert len({request['port'] for request in http_server.requests}) <= 4
@@ -0,0 +1,91 @@
+"""Checks for conditional re-downloads in the Zoho processor (run with: python -m pytest image-processing)."""
+
+import io
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from http_validators import VALIDATORS_FILE_NAME
+
+PROCESSOR = Path(__file__).resolve().parent / 'zoho_faire_processor.py'
+
+
+def _png(colour):
+    buffer = io.BytesIO()
+    Image.new('RGB', (120, 90), colour).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class Source:
+    """The image behind one URL: answers 304 when the request's ETag is current."""
+
+    def __init__(self, body, etag):
+        self.body = body
+        self.etag = etag
+
+    def __call__(self, handler):
+        if handler.headers.get('If-None-Match') == self.etag:
+            handler.reply(304, headers={'ETag': self.etag})
+        else:
+            handler.reply(200, self.body, {'ETag': self.etag, 'Content-Type': 'image/png'})
+
+
+@pytest.fixture
+def run(tmp_path, http_server):
+    """Run the processor CLI on one product whose image is served by ``http_server``."""
+    catalog = tmp_path / 'items.json'
+    catalog.write_text(json.dumps([{'sku': 'ABC-1', 'image_url': f"{http_server.url}/abc.png"}]))
+    output = tmp_path / 'out'
+
+    def run(*args):
+        subprocess.run([sys.executable, str(PROCESSOR), '--input', str(catalog), '--output', str(output),
+                        '--no-cache', '--cache-dir', str(tmp_path / 'cache'), *args],
+                       check=True, capture_output=True)
+        return output
+    return run
+
+
+def _main_output(output):
+    (main,) = [path for path in output.rglob('*.webp') if not path.stem.endswith('x400')]
+    return main.read_bytes()
+
+
+def _conditional(request):
+    return 'If-None-Match' in request['headers']
+
+
+def test_not_modified_reuses_the_outputs(run, http_server):
+    source = http_server.respond = Source(_png((200, 30, 30)), '"v1"')
+    first = _main_output(run())
+    # Still "v1", so a body the server might send instead is never fetched
+    source.body = _png((30, 30, 200))
+    assert _main_output(run()) == first
+    assert [_conditional(request) for request in http_server.requests] == [False, True]
+
+
+def test_changed_etag_downloads_again(run, http_server):
+    source = http_server.respond = Source(_png((200, 30, 30)), '"v1"')
+    first = _main_output(run())
+    source.body, source.etag = _png((30, 30, 200)), '"v2"'
+    assert _main_output(run()) != first
+    assert [_conditional(request) for request in http_server.requests] == [False, True]
+
+
+def test_no_conditional_downloads_in_full(run, http_server):
+    http_server.respond = Source(_png((200, 30, 30)), '"v1"')
+    run()
+    run('--no-conditional')
+    assert [_conditional(request) for request in http_server.requests] == [False, False]
+
+
+def test_store_is_only_written_when_there_are_validators(run, http_server):
+    http_server.respond = lambda handler: handler.reply(200, _png((200, 30, 30)))
+    output = run()
+    assert not (output / VALIDATORS_FILE_NAME).exists()
+    http_server.respond = Source(_png((200, 30, 30)), '"v1"')
+    run()
+    assert (output / VALIDATORS_FILE_NAME).exists()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Object Storage Upload Sink
+Uploads processed images to a bucket on a thread pool while the pipeline keeps processing
+"""
+
+import os
+import json
+import hashlib
+import logging
+import mimetypes
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Optional, Union
+from urllib.parse import urlparse
+
+from image_engine import write_atomic
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_UPLOAD_WORKERS = 8
+
+# Object metadata key holding the SHA-256 of the uploaded bytes
+HASH_METADATA_KEY = 'sha256'
+
+
+class UploadBackend(ABC):
+    """
+    Where objects go. Backends must be safe to call from several threads at once.
+
+    ``stored_hash`` returns the content hash recorded with an existing object (or
+    None if there is no such object), ``put`` stores one object with its hash.
+    """
+
+    name = 'backend'
+
+    @abstractmethod
+    def stored_hash(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def put(self, key: str, data: bytes, content_type: str, sha256: str):
+        ...
+
+    def close(self):
+        pass
+
+
+class LocalBackend(UploadBackend):
+    """Objects as files under a directory; a stand-in for a bucket in tests and dry runs."""
+
+    name = 'local'
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key
+
+    def stored_hash(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            return hashlib.sha256(path.read_bytes()).hexdigest()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: bytes, content_type: str, sha256: str):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_atomic(path, data)
+
+
+class S3Backend(UploadBackend):
+    """
+    An S3 bucket, or any S3-compatible store such as MinIO via ``endpoint_url``.
+
+    Credentials come from the usual AWS environment variables or config files.
+    The client's connection pool is sized to the upload workers so every worker
+    reuses a kept-alive connection.
+    """
+
+    name = 's3'
+
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None, region: Optional[str] = None,
+                 max_connections: int = DEFAULT_UPLOAD_WORKERS):
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError:
+            raise RuntimeError('S3 uploads need boto3 (pip install boto3)')
+        self.bucket = bucket
+        self._client = boto3.client(
+            's3', endpoint_url=endpoint_url, region_name=region,
+            config=Config(max_pool_connections=max_connections, retries={'max_attempts': 3, 'mode': 'standard'})
+        )
+        self._missing = self._client.exceptions.ClientError
+
+    def stored_hash(self, key: str) -> Optional[str]:
+        try:
+            head = self._client.head_object(Bucket=self.bucket, Key=key)
+        except self._missing as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return head.get('Metadata', {}).get(HASH_METADATA_KEY)
+
+    def put(self, key: str, data: bytes, content_type: str, sha256: str):
+        self._client.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType=content_type,
+                                Metadata={HASH_METADATA_KEY: sha256})
+
+
+class GCSBackend(UploadBackend):
+    """
+    A Google Cloud Storage bucket; Firebase Storage buckets are GCS buckets.
+
+    ``credentials_info`` is a parsed service account JSON; without it the default
+    application credentials are used. With ``public`` each uploaded object is made
+    publicly readable, as server.js does for Firebase uploads.
+    """
+
+    name = 'gcs'
+
+    def __init__(self, bucket: str, credentials_info: Optional[Dict] = None, public: bool = False,
+                 max_connections: int = DEFAULT_UPLOAD_WORKERS):
+        try:
+            import google.auth
+            from google.auth.transport.requests import AuthorizedSession
+            from google.cloud import storage
+            from google.oauth2 import service_account
+            from requests.adapters import HTTPAdapter
+        except ImportError:
+            raise RuntimeError('Firebase/GCS uploads need google-cloud-storage (pip install google-cloud-storage)')
+        if credentials_info is not None:
+            credentials = service_account.Credentials.from_service_account_info(credentials_info,
+                                                                                scopes=storage.Client.SCOPE)
+            project = credentials_info.get('project_id')
+        else:
+            credentials, project = google.auth.default(scopes=storage.Client.SCOPE)
+        # A session of our own instead of the client's default one, whose pool holds 10 connections
+        session = AuthorizedSession(credentials)
+        session.mount('https://', HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections))
+        client = storage.Client(project=project, credentials=credentials, _http=session)
+        self.public = public
+        self._bucket = client.bucket(bucket)
+
+    def stored_hash(self, key: str) -> Optional[str]:
+        blob = self._bucket.get_blob(key)
+        if blob is None:
+            return None
+        return (blob.metadata or {}).get(HASH_METADATA_KEY)
+
+    def put(self, key: str, data: bytes, content_type: str, sha256: str):
+        blob = self._bucket.blob(key)
+        blob.metadata = {HASH_METADATA_KEY: sha256}
+        blob.upload_from_string(data, content_type=content_type)
+        if self.public:
+            blob.make_public()
+
+
+def firebase_backend(max_connections: int = DEFAULT_UPLOAD_WORKERS) -> GCSBackend:
+    """The Firebase Storage bucket server.js uses, from the same environment variables."""
+    if not os.environ.get('FIREBASE_SERVICE_ACCOUNT_JSON'):
+        raise RuntimeError('FIREBASE_SERVICE_ACCOUNT_JSON environment variable is not set')
+    service_account = json.loads(os.environ['FIREBASE_SERVICE_ACCOUNT_JSON'])
+    bucket = os.environ.get('FIREBASE_STORAGE_BUCKET') or f"{service_account['project_id']}.appspot.com"
+    return GCSBackend(bucket, credentials_info=service_account, public=True, max_connections=max_connections)
+
+
+def open_backend(target: str, endpoint_url: Optional[str] = None,
+                 max_connections: int = DEFAULT_UPLOAD_WORKERS) -> UploadBackend:
+    """
+    Backend for an upload target: ``s3://bucket``, ``gs://bucket``, ``firebase``,
+    or a local directory (plain path or ``file://``).
+    """
+    if target == 'firebase':
+        return firebase_backend(max_connections)
+    parsed = urlparse(target)
+    if parsed.scheme == 's3':
+        return S3Backend(parsed.netloc, endpoint_url=endpoint_url, max_connections=max_connections)
+    if parsed.scheme == 'gs':
+        return GCSBackend(parsed.netloc, max_connections=max_connections)
+    if parsed.scheme == 'file':
+        return LocalBackend(Path(parsed.path))
+    # A one-letter scheme is a Windows drive, not a URL
+    if len(parsed.scheme) > 1:
+        raise ValueError(f"Unknown upload target: {target}")
+    return LocalBackend(Path(target))
+
+
+class UploadSink:
+    """
+    Uploads objects on ``workers`` threads while the caller carries on.
+
+    ``submit`` queues an upload and returns at once, unless ``max_pending``
+    uploads are already waiting, in which case it blocks until one finishes, so a
+    slow bucket holds back the producer instead of buffering every image in memory.
+    Before uploading, the object's stored content hash is compared with the new
+    bytes and unchanged objects are skipped.
+    """
+
+    def __init__(self, backend: UploadBackend, workers: int = DEFAULT_UPLOAD_WORKERS,
+                 max_pending: Optional[int] = None, prefix: str = ''):
+        self.backend = backend
+        self.workers = max(1, workers)
+        self.prefix = prefix.strip('/')
+        self.stats = {'uploaded': 0, 'skipped': 0, 'failed': 0, 'bytes_uploaded': 0}
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending or self.workers * 4)
+        self._pending = set()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='upload')
+
+    def key_for(self, name: str) -> str:
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def submit(self, name: str, source: Union[bytes, Path]) -> Future:
+        """Upload ``source`` (bytes, or a file read when its turn comes) as ``prefix/name``."""
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._upload, self.key_for(name), source)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, future: Future):
+        with self._lock:
+            self._pending.discard(future)
+        self._slots.release()
+
+    def _upload(self, key: str, source: Union[bytes, Path]) -> bool:
+        try:
+            data = source if isinstance(source, bytes) else Path(source).read_bytes()
+            sha256 = hashlib.sha256(data).hexdigest()
+            if self.backend.stored_hash(key) == sha256:
+                self._count('skipped')
+                return False
+            content_type = mimetypes.guess_type(key)[0] or 'application/octet-stream'
+            self.backend.put(key, data, content_type, sha256)
+        except Exception as e:
+            logger.error(f"❌ Upload failed for {key}: {str(e)}")
+            self._count('failed')
+            return False
+        logger.info(f"☁️  Uploaded: {key}")
+        self._count('uploaded', len(data))
+        return True
+
+    def _count(self, outcome: str, size: int = 0):
+        with self._lock:
+            self.stats[outcome] += 1
+            self.stats['bytes_uploaded'] += size
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {'backend': self.backend.name, **self.stats}
+
+    def flush(self):
+        """Wait for every upload submitted so far to finish."""
+        with self._lock:
+            pending = list(self._pending)
+        wait(pending)
+
+    def close(self):
+        """Wait for every queued upload to finish, then stop the workers."""
+        self._executor.shutdown(wait=True)
+        self.backend.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -4,39 +4,130 @@ Zoho-Faire Integrated Image Processor
 Processes product images for seamless integration between Zoho Inventory and Faire
 """
 
+import io
 import os
+import base64
 import sys
 import json
-import shutil
+import threading
 from pathlib import Path
 from PIL import Image, ImageOps
-import requests
 import argparse
 import logging
-from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 import re
-from urllib.parse import urlparse
+
+from catalog_io import CatalogError, ResultsWriter, iter_products
+from dedup import DEFAULT_MAX_DISTANCE, DuplicateIndex, ImageSignature, image_signature
+from fetcher import DEFAULT_MAX_BYTES, ImageFetcher
+from http_validators import VALIDATORS_FILE_NAME, ValidatorStore
+from journal import CheckpointJournal, output_digests
+from manifest_store import MANIFEST_DB_NAME, ManifestStore
+from image_engine import (ENCODER_SPEEDS, RENDERER, TRANSPARENT, WHITE, EncoderProfile, VariantSpec, compose_variants,
+                          variant_path, write_atomic, write_variants)
+from metrics import ImageMetrics, PipelineMetrics
+from pipeline import MemoryBudget, Pipeline, Stage
+from processing_core import ProcessingCore, TransformSettings
+from processing_cache import DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE_MB, ProcessingCache
+from sync_state import SyncState
+from upload_sink import DEFAULT_UPLOAD_WORKERS, UploadSink, open_backend
 
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger(__name__)
 
+DEFAULT_QUEUE_SIZE = 8
+DEFAULT_MEMORY_LIMIT_MB = 512
+
+@dataclass
+class ImageTask:
+    """One image moving through the processing stages, with whatever they have produced for it so far."""
+    sku: str
+    index: int
+    output_dir: Path
+    source: Union[str, Path, Image.Image]
+    metrics: ImageMetrics
+    context: Dict = field(default_factory=dict)
+    content: Optional[bytes] = None
+    image: Optional[Image.Image] = None
+    signature: Optional[ImageSignature] = None
+    rendered: Optional[Dict[str, Image.Image]] = None
+    encoded: Optional[Dict[str, bytes]] = None
+    # SHA-256 of each output, for the checkpoint journal
+    digests: Optional[Dict[str, str]] = None
+    size: Optional[Tuple[int, int]] = None
+    cache_key: Optional[str] = None
+    # ETag / Last-Modified of the downloaded source, remembered once its outputs are written
+    validators: Optional[Dict[str, str]] = None
+    reserved: int = 0
+    # processed, cache_hit, not_modified, duplicate, failed or download_failed once a stage has settled it
+    outcome: Optional[str] = None
+    result: Optional[Dict] = None
+    original: Optional['ImageTask'] = None
+    aliases: List['ImageTask'] = field(default_factory=list)
+    completed: bool = False
+    
+    @property
+    def done(self) -> bool:
+        return self.outcome is not None
+
+
 class ZohoFaireImageProcessor:
-    def __init__(self, padding=50, quality=85, max_size=(1200, 1200)):
+    def __init__(self, padding=50, quality=85, max_size=(1200, 1200),
+                 download_workers=8, per_host_limit=4, retries=3, cache: Optional[ProcessingCache] = None,
+                 variant_sizes: Tuple[Tuple[int, int], ...] = ((400, 400),),
+                 sync_state: Optional[SyncState] = None, trim=False, white_background=False,
+                 dedup: Optional[DuplicateIndex] = None, metrics: Optional[PipelineMetrics] = None,
+                 encoder: Optional[EncoderProfile] = None, journal: Optional[CheckpointJournal] = None,
+                 stage_workers: Optional[Dict[str, int]] = None, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 memory_limit_mb: int = DEFAULT_MEMORY_LIMIT_MB, manifest: Optional[ManifestStore] = None,
+                 uploads: Optional[UploadSink] = None, validators: Optional[ValidatorStore] = None,
+                 max_download_bytes: Optional[int] = DEFAULT_MAX_BYTES):
         self.padding = padding
-        self.quality = quality
+        # An explicit encoder profile takes precedence over the plain quality setting
+        self.encoder = encoder or EncoderProfile(quality=quality)
+        self.quality = self.encoder.quality
+        self.trim = trim
+        self.background = WHITE if white_background else TRANSPARENT
         self.max_size = max_size
-        self.processed_images = []
+        self.variant_sizes = tuple(tuple(size) for size in variant_sizes)
+        self.core = ProcessingCore(TransformSettings(padding, max_size, trim, self.background),
+                                   self.variant_specs(), self.encoder)
+        self.download_workers = download_workers
+        self.per_host_limit = per_host_limit
+        self.retries = retries
+        self.max_download_bytes = max_download_bytes
+        self.cache = cache
+        self.sync_state = sync_state
+        self.dedup = dedup
+        self.journal = journal
+        self.manifest = manifest
+        self.uploads = uploads
+        self.validators = validators
+        self.metrics = metrics or PipelineMetrics()
+        cpus = os.cpu_count() or 1
+        # Worker threads per stage; Pillow releases the GIL while decoding, resizing and encoding
+        self.stage_workers = {
+            'fetch': download_workers,
+            'decode': max(1, cpus // 2),
+            'transform': max(1, cpus // 2),
+            'encode': cpus,
+            'write': 2,
+            **(stage_workers or {})
+        }
+        self.queue_size = queue_size
+        self.memory_budget = MemoryBudget(memory_limit_mb * 1024 * 1024)
+        self._dedup_lock = threading.Lock()
         
     def download_image(self, url: str, filename: str, output_dir: Path) -> Optional[Path]:
         """Download image from URL."""
         try:
             logger.info(f"📥 Downloading: {url}")
-            response = requests.get(url, stream=True, timeout=30)
-            response.raise_for_status()
-            
+            with ImageFetcher(max_workers=1, retries=self.retries, max_bytes=self.max_download_bytes) as fetcher:
+                content = fetcher.fetch_bytes(url)
+                
             file_path = output_dir / filename
-            with open(file_path, 'wb') as f:
-                shutil.copyfileobj(response.raw, f)
+            write_atomic(file_path, content)
             
             logger.info(f"✅ Downloaded: {filename}")
             return file_path
@@ -45,54 +136,334 @@ class ZohoFaireImageProcessor:
             logger.error(f"❌ Download failed for {url}: {str(e)}")
             return None
     
-    def process_image(self, image_path: Path, sku: str, image_index: int, output_dir: Path) -> Dict:
-        """Process a single product image."""
+    def variant_specs(self) -> List[VariantSpec]:
+        """The main image plus one centred canvas per configured size."""
+        return [VariantSpec('main')] + [VariantSpec.sized(w, h) for w, h in self.variant_sizes]
+    
+    def process_image(self, image_path: Union[str, Path, Image.Image], sku: str, image_index: int, output_dir: Path,
+                      source_bytes: Optional[bytes] = None, image_metrics: Optional[ImageMetrics] = None) -> Dict:
+        """
+        Process a single product image from a file, an http(s) URL or an already-decoded image.
+        
+        Runs the same stages as the batch pipeline, one after the other on the
+        calling thread. Stage timings go into ``image_metrics`` and are folded
+        into ``self.metrics``.
+        """
+        task = ImageTask(sku, image_index, output_dir, image_path,
+                         image_metrics or self.metrics.image(sku, image_index), content=source_bytes)
+        if isinstance(image_path, Image.Image):
+            task.image = image_path
+            self._run_stages(task)
+        elif str(image_path).startswith('http') and source_bytes is None:
+            with ImageFetcher(max_workers=1, per_host_limit=1, retries=self.retries,
+                              max_bytes=self.max_download_bytes) as fetcher:
+                self._run_stages(task, fetcher)
+        else:
+            self._run_stages(task)
+        self._complete(task)
+        return task.result
+    
+    def _run_stages(self, task: 'ImageTask', fetcher: Optional[ImageFetcher] = None):
         try:
-            logger.info(f"🖼️  Processing: {image_path.name} for SKU: {sku}")
-            
-            # Open and convert to RGBA
-            image = Image.open(image_path)
-            if image.mode != 'RGBA':
-                image = image.convert('RGBA')
-            
-            # Resize if too large
-            if image.size[0] > self.max_size[0] or image.size[1] > self.max_size[1]:
-                image.thumbnail(self.max_size, Image.Resampling.LANCZOS)
-                logger.info(f"📏 Resized to: {image.size}")
-            
-            # Add padding
-            image = self.add_padding(image)
+            self._stage_fetch(task, fetcher)
+            self._stage_decode(task)
+            self._stage_transform(task)
+            self._stage_encode(task)
+            self._stage_write(task)
+        except Exception as e:
+            self._fail(task, e)
+    
+    def _base_path(self, task: 'ImageTask') -> Path:
+        return task.output_dir / f"{task.sku.lower()}_{task.index}"
+    
+    def _paths(self, task: 'ImageTask') -> Dict[str, Path]:
+        return {spec.name: variant_path(self._base_path(task), spec) for spec in self.variant_specs()}
+    
+    def _stage_fetch(self, task: 'ImageTask', fetcher: Optional[ImageFetcher] = None) -> 'ImageTask':
+        """Fetch stage: download a remote source or read a local one into memory."""
+        if task.done or task.image is not None or task.content is not None:
+            return task
+        source = str(task.source)
+        if source.startswith('http'):
+            entry = self._revalidation_entry(task, source)
+            logger.info(f"📥 Downloading: {source}")
+            try:
+                with task.metrics.stage('download'):
+                    if entry is not None:
+                        download = fetcher.fetch(source, entry.get('etag'), entry.get('last_modified'))
+                    else:
+                        download = fetcher.fetch(source)
+            except Exception as e:
+                logger.error(f"❌ Download failed for {source}: {str(e)}")
+                task.outcome = 'download_failed'
+                task.result = {
+                    'sku': task.sku,
+                    'index': task.index,
+                    'error': f"Download failed: {str(e)}",
+                    'success': False
+                }
+                return task
+            if download.not_modified:
+                self._reuse_unmodified(task, entry)
+                return task
+            task.content = download.content
+            task.validators = download.validators
+            logger.info(f"✅ Downloaded: {source}")
+        else:
+            with task.metrics.stage('read'):
+                task.content = Path(source).read_bytes()
+        task.metrics.bytes_in = len(task.content)
+        return task
+    
+    def _validator_fingerprint(self, task: 'ImageTask') -> str:
+        return ValidatorStore.fingerprint(self.cache_params(), self._paths(task).values())
+    
+    def _revalidation_entry(self, task: 'ImageTask', url: str) -> Optional[Dict]:
+        """The stored validators to make this download conditional on, if its outputs are all still current."""
+        if self.validators is None:
+            return None
+        return self.validators.lookup(url, list(self._paths(task).values()), self._validator_fingerprint(task))
+    
+    def _reuse_unmodified(self, task: 'ImageTask', entry: Dict):
+        """Settle a task whose source the server says hasn't changed: its outputs are already in place."""
+        paths = self._paths(task)
+        logger.info(f"♻️  Not modified: {paths['main'].name} + {len(paths) - 1} variants")
+        self.validators.not_modified(entry)
+        task.metrics.bytes_out = sum(path.stat().st_size for path in paths.values())
+        task.size = tuple(entry['size'])
+        task.digests = entry['sha256']
+        task.outcome = 'not_modified'
+        self._upload_outputs(paths)
+        task.result = self._success_result(task.sku, task.index, paths, task.size)
+    
+    def _stage_decode(self, task: 'ImageTask') -> 'ImageTask':
+        """
+        Decode stage: restore cached outputs or decode the source, within the memory budget.
+        
+        With dedup on, the decoded image is first checked against the images
+        already seen this run; a duplicate goes no further.
+        """
+        if task.done:
+            return task
+        if self.dedup is None and self._restore_cached(task):
+            return task
             
-            # Generate output filenames
-            base_filename = f"{sku.lower()}_{image_index}"
-            webp_filename = f"{base_filename}.webp"
-            thumb_filename = f"{base_filename}_400x400.webp"
+        if task.image is None:
+            logger.info(f"🖼️  Processing: image {task.index} for SKU: {task.sku}")
+            with task.metrics.stage('decode'):
+                image = self.core.open(io.BytesIO(task.content))
+            # Opening only reads the header; wait for room in the budget before the pixels are decoded
+            self._reserve(task, image.size)
+            with task.metrics.stage('decode'):
+                image.load()
+            task.image = image
+        elif not task.reserved:
+            self._reserve(task, task.image.size)
             
-            # Save main image
-            main_path = output_dir / webp_filename
-            image.save(main_path, 'WEBP', quality=self.quality)
+        if self.dedup is not None:
+            with task.metrics.stage('dedup'):
+                task.signature = image_signature(task.image)
+                with self._dedup_lock:
+                    original = self.dedup.find(task.signature)
+                    if original is None:
+                        # Indexed straight away so copies still in flight alias to this one
+                        self.dedup.add(task.signature, task)
+            if original is not None:
+                logger.info(f"🔗 Duplicate of {original.sku} image {original.index}, "
+                            f"reusing its outputs for SKU: {task.sku}")
+                task.original = original
+                task.outcome = 'duplicate'
+                self._release(task)
+                return task
+            self._restore_cached(task)
+        return task
+    
+    def _stage_transform(self, task: 'ImageTask') -> 'ImageTask':
+        """Transform stage: convert, trim and fit, then pad and render every variant in one pass."""
+        if task.done:
+            return task
+        image = self.core.prepare(task.image, task.metrics)
+        task.size = self.core.padded_size(image.size)
+        task.rendered = self.core.render(image, task.metrics)
+        task.image = None
+        return task
+    
+    def _stage_encode(self, task: 'ImageTask') -> 'ImageTask':
+        """Encode stage: compress the rendered frames, then hand their memory back to the budget."""
+        if task.done:
+            return task
+        task.encoded = self.core.encode(task.rendered, task.metrics)
+        task.digests = output_digests(task.encoded)
+        self._release(task)
+        return task
+    
+    def _stage_write(self, task: 'ImageTask') -> 'ImageTask':
+        """Write stage: put the encoded files in place and store them in the cache."""
+        if task.done:
+            return task
+        paths = self._paths(task)
+        specs = self.variant_specs()
+        with task.metrics.stage('write'):
+            write_variants(task.encoded, specs, self._base_path(task))
+        # Uploads go out from memory on the sink's threads while later images are processed
+        self._upload_outputs(paths, task.encoded)
+        task.encoded = None
+        
+        if task.cache_key is not None:
+            with task.metrics.stage('cache'):
+                self.cache.store(task.cache_key, paths, {'size': task.size, 'sha256': task.digests})
+                
+        logger.info(f"✅ Processed: {paths['main'].name} + {len(specs) - 1} variants")
+        task.outcome = 'processed'
+        task.result = self._success_result(task.sku, task.index, paths, task.size)
+        return task
+    
+    def _restore_cached(self, task: 'ImageTask') -> bool:
+        """Reuse earlier outputs if this exact source was processed with the same settings."""
+        if self.cache is None or task.content is None:
+            return False
+        paths = self._paths(task)
+        with task.metrics.stage('cache'):
+            task.cache_key = self.cache.key_for(task.content, self.cache_params())
+            cached = self.cache.restore(task.cache_key, paths)
+        if cached is None:
+            return False
+        logger.info(f"♻️  Cache hit: {paths['main'].name} + {len(paths) - 1} variants")
+        task.metrics.bytes_out = sum(path.stat().st_size for path in paths.values())
+        task.size = tuple(cached['size'])
+        task.digests = cached['sha256']
+        task.outcome = 'cache_hit'
+        self._upload_outputs(paths)
+        task.result = self._success_result(task.sku, task.index, paths, task.size)
+        self._release(task)
+        return True
+    
+    def _upload_outputs(self, paths: Dict[str, Path], encoded: Optional[Dict[str, bytes]] = None):
+        """Queue an image's files for upload, from memory if the encoded bytes are at hand."""
+        if self.uploads is None:
+            return
+        for name, path in paths.items():
+            self.uploads.submit(path.name, encoded[name] if encoded else path)
+    
+    def _image_cost(self, size: Tuple[int, int]) -> int:
+        """Rough bytes held for one image: the decoded source plus its padded frame and rendered copy."""
+        width = min(size[0], self.max_size[0]) + 2 * self.padding
+        height = min(size[1], self.max_size[1]) + 2 * self.padding
+        return size[0] * size[1] * 4 + width * height * 4 * 2
+    
+    def _reserve(self, task: 'ImageTask', size: Tuple[int, int]):
+        task.reserved = self._image_cost(size)
+        self.memory_budget.acquire(task.reserved)
+    
+    def _release(self, task: 'ImageTask'):
+        task.image = None
+        task.rendered = None
+        if task.reserved:
+            self.memory_budget.release(task.reserved)
+            task.reserved = 0
+    
+    def _fail(self, task: 'ImageTask', error: Exception) -> 'ImageTask':
+        logger.error(f"❌ Processing failed: {str(error)}")
+        self._release(task)
+        task.encoded = None
+        task.outcome = 'failed'
+        task.result = {
+            'sku': task.sku,
+            'index': task.index,
+            'error': str(error),
+            'success': False
+        }
+        return task
+    
+    def _complete(self, task: 'ImageTask') -> List['ImageTask']:
+        """
+        Finish a task that came out of the last stage; only ever called from one thread.
+        
+        Returns the tasks whose results are now final: usually just ``task``, or
+        nothing for a duplicate whose original isn't done yet, plus any such
+        duplicates that were waiting on ``task``.
+        """
+        if task.outcome == 'duplicate':
+            original = task.original
+            if not original.completed:
+                original.aliases.append(task)
+                return []
+            if not original.result['success']:
+                # Same pixels as an image that just failed; it would only fail the same way
+                task.outcome = 'failed'
+                task.result = {**original.result, 'sku': task.sku, 'index': task.index}
+            else:
+                task.result = {
+                    **original.result,
+                    'sku': task.sku,
+                    'index': task.index,
+                    'alias_of': {'sku': original.sku, 'index': original.index}
+                }
+                
+        task.completed = True
+        task.content = None
+        self.metrics.record(task.metrics, task.outcome)
+        if task.outcome in ('processed', 'cache_hit', 'not_modified'):
+            self._checkpoint(task.sku, task.index, self._paths(task), task.size, task.digests)
+        if task.validators and self.validators is not None and task.outcome in ('processed', 'cache_hit'):
+            self.validators.record(str(task.source), list(self._paths(task).values()), task.validators,
+                                   self._validator_fingerprint(task), task.metrics.bytes_in, task.size,
+                                   task.digests)
             
-            # Create 400x400 thumbnail
-            thumb = self.create_thumbnail(image, (400, 400))
-            thumb_path = output_dir / thumb_filename
-            thumb.save(thumb_path, 'WEBP', quality=self.quality)
+        finished = [task]
+        aliases, task.aliases = task.aliases, []
+        for alias in aliases:
+            finished.extend(self._complete(alias))
+        return finished
+
+    def _checkpoint(self, sku: str, image_index: int, paths: Dict[str, Path], size: Tuple[int, int],
+                    digests: Dict[str, str]):
+        if self.journal is not None:
+            self.journal.record(sku, image_index, paths, digests, {'size': list(size)})
+    
+    def _resumed_result(self, sku: str, image_index: int, output_dir: Path) -> Optional[Dict]:
+        """The result of an image an interrupted earlier run already finished, if the journal has it."""
+        if self.journal is None:
+            return None
+        base_path = output_dir / f"{sku.lower()}_{image_index}"
+        paths = {spec.name: variant_path(base_path, spec) for spec in self.variant_specs()}
+        entry = self.journal.lookup(paths['main'])
+        if entry is None:
+            return None
+        logger.info(f"⏩ Finished before restart: {paths['main'].name}")
+        self._upload_outputs(paths)
+        return self._success_result(sku, image_index, paths, tuple(entry['data']['size']))
+    
+    def process_bytes(self, data: bytes, sku: str, image_index: int = 1) -> Dict:
+        """
+        Process an encoded source held in memory and return the encoded outputs.
+        
+        Nothing touches the disk: ``data`` is decoded from memory and every
+        variant is encoded into memory. On success the result carries
+        ``outputs`` (variant name -> encoded bytes, ``main`` included) and the
+        ``filenames`` process_image would have written them under.
+        """
+        metrics = self.metrics.image(sku, image_index)
+        metrics.bytes_in = len(data)
+        try:
+            logger.info(f"🖼️  Processing: image {image_index} for SKU: {sku} (in memory)")
+            size, encoded = self.core.process(io.BytesIO(data), metrics)
+            specs = self.variant_specs()
             
-            result = {
+            base_path = Path(f"{sku.lower()}_{image_index}")
+            self.metrics.record(metrics, 'processed')
+            return {
                 'sku': sku,
                 'index': image_index,
-                'main_image': str(main_path),
-                'thumbnail': str(thumb_path),
-                'size': image.size,
+                'size': size,
+                'outputs': encoded,
+                'filenames': {spec.name: variant_path(base_path, spec).name for spec in specs},
                 'success': True
             }
             
-            self.processed_images.append(result)
-            logger.info(f"✅ Processed: {webp_filename} + thumbnail")
-            
-            return result
-            
         except Exception as e:
             logger.error(f"❌ Processing failed: {str(e)}")
+            self.metrics.record(metrics, 'failed')
             return {
                 'sku': sku,
                 'index': image_index,
@@ -100,182 +471,637 @@ class ZohoFaireImageProcessor:
                 'success': False
             }
     
+    def _success_result(self, sku: str, image_index: int, paths: Dict[str, Path], size: Tuple[int, int]) -> Dict:
+        variants = {name: str(path) for name, path in paths.items() if name != 'main'}
+        result = {
+            'sku': sku,
+            'index': image_index,
+            'main_image': str(paths['main']),
+            'thumbnail': next(iter(variants.values()), None),
+            'variants': variants,
+            'size': size,
+            'success': True
+        }
+        return result
+    
+    def cache_params(self) -> Dict:
+        """Every setting that changes the bytes this processor writes."""
+        return {
+            'pipeline': 'zoho_faire',
+            'renderer': RENDERER,
+            'padding': self.padding,
+            'encoder': self.encoder.cache_params(),
+            'max_size': list(self.max_size),
+            'trim': self.trim,
+            'background': list(self.background),
+            'variant_sizes': [list(size) for size in self.variant_sizes]
+        }
+    
     def add_padding(self, image: Image.Image) -> Image.Image:
-        """Add transparent padding around image."""
-        width, height = image.size
-        new_size = (width + 2 * self.padding, height + 2 * self.padding)
-        
-        padded = Image.new('RGBA', new_size, (0, 0, 0, 0))
-        padded.paste(image, (self.padding, self.padding), image)
-        
-        return padded
+        """Add transparent (or white) padding around image."""
+        return compose_variants(image, self.padding, [VariantSpec('main')], self.background)['main']
     
     def create_thumbnail(self, image: Image.Image, size: Tuple[int, int]) -> Image.Image:
         """Create centered thumbnail."""
-        thumb = image.copy()
-        thumb.thumbnail(size, Image.Resampling.LANCZOS)
-        
-        # Center in canvas
-        canvas = Image.new('RGBA', size, (0, 0, 0, 0))
-        x = (size[0] - thumb.width) // 2
-        y = (size[1] - thumb.height) // 2
-        canvas.paste(thumb, (x, y), thumb)
-        
-        return canvas
+        return compose_variants(image, 0, [VariantSpec('thumbnail', size)], self.background)['thumbnail']
     
-    def process_zoho_products(self, zoho_data: List[Dict], output_dir: Path, download_images: bool = True) -> Dict:
-        """Process images for Zoho products."""
-        logger.info(f"🚀 Processing {len(zoho_data)} products...")
+    def process_zoho_products(self, zoho_data: Iterable[Dict], output_dir: Path, download_images: bool = True,
+                              on_product: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Process images for Zoho products.
         
+        Images flow through fetch → decode → transform → encode → write stages,
+        each with its own worker threads, joined by queues of ``queue_size``
+        items; decoded image data is held under ``memory_limit_mb``. Memory use
+        therefore doesn't grow with the catalog.
+        
+        ``zoho_data`` may be any iterable, including a streaming reader. By default
+        every product result is kept in ``results['products']`` in input order;
+        with ``on_product`` each finished product is handed to that callback
+        instead and dropped.
+        """
+        if hasattr(zoho_data, '__len__'):
+            logger.info(f"🚀 Processing {len(zoho_data)} products...")
+        else:
+            logger.info("🚀 Processing products from stream...")
+            
         output_dir.mkdir(parents=True, exist_ok=True)
         results = {
-            'total_products': len(zoho_data),
+            'total_products': 0,
             'processed_products': 0,
             'total_images': 0,
             'processed_images': 0,
             'failed_images': 0,
+            'unchanged_products': 0,
+            'duplicate_images': 0,
+            'resumed_images': 0,
             'products': []
         }
+        sync_params = {**self.cache_params(), 'output_dir': str(output_dir.resolve())}
+        # Products are scanned on the feeder thread while results come back on this one
+        lock = threading.Lock()
         
-        for product in zoho_data:
+        def finish_product(tracker: Dict):
+            product_result = tracker['product']
+            product_result['images'].sort(key=lambda img: img['index'])
+            if product_result['images']:
+                results['processed_products'] += 1
+            # Only a fully successful product is remembered, so anything that failed is retried next sync.
+            # Products reusing another SKU's outputs aren't either: that SKU may change without them.
+            if (self.sync_state is not None and product_result['success']
+                    and len(product_result['images']) == tracker['expected']
+                    and not any('alias_of' in img for img in product_result['images'])):
+                self.sync_state.record(product_result['sku'], tracker['fingerprint'], product_result)
+            self._update_manifest(product_result)
+            if on_product is not None:
+                on_product(product_result)
+                
+        def product_tasks(product: Dict) -> List[ImageTask]:
+            results['total_products'] += 1
             sku = product.get('sku', '').lower()
             if not sku:
                 logger.warning(f"⚠️  No SKU found for product: {product.get('name', 'Unknown')}")
-                continue
-            
+                return []
+                
             logger.info(f"\n📦 Processing product: {product.get('name', 'Unknown')} (SKU: {sku})")
             
             # Get image URLs
             image_urls = []
             if 'image_url' in product and product['image_url']:
                 image_urls.append(product['image_url'])
-            
+                
             if 'images' in product and isinstance(product['images'], list):
                 image_urls.extend(product['images'])
-            
+                
             if not image_urls:
                 logger.warning(f"⚠️  No images found for SKU: {sku}")
-                continue
-            
+                return []
+                
+            fingerprint = None
+            if self.sync_state is not None:
+                fingerprint = self.sync_state.fingerprint(product, sync_params)
+                previous = self.sync_state.unchanged(sku, fingerprint)
+                if previous is not None:
+                    logger.info(f"⏭️  Unchanged since last sync: {sku}")
+                    results['unchanged_products'] += 1
+                    self._update_manifest(previous)
+                    if on_product is None:
+                        results['products'].append(previous)
+                    else:
+                        on_product(previous)
+                    return []
+                    
             results['total_images'] += len(image_urls)
             product_result = {
                 'sku': sku,
                 'name': product.get('name', ''),
+                'brand': product.get('brand') or product.get('manufacturer') or '',
                 'images': [],
                 'success': True
             }
+            if on_product is None:
+                results['products'].append(product_result)
+            tracker = {
+                'product': product_result,
+                'pending': 0,
+                'expected': len(image_urls),
+                'fingerprint': fingerprint
+            }
             
-            # Process each image
+            tasks = []
             for idx, image_url in enumerate(image_urls, 1):
-                if download_images and image_url.startswith('http'):
-                    # Download from URL
-                    parsed_url = urlparse(image_url)
-                    ext = Path(parsed_url.path).suffix or '.jpg'
-                    temp_filename = f"temp_{sku}_{idx}{ext}"
-                    temp_path = download_dir / temp_filename
-                    
-                    downloaded_path = self.download_image(image_url, temp_filename, output_dir)
-                    if downloaded_path:
-                        image_result = self.process_image(downloaded_path, sku, idx, output_dir)
-                        downloaded_path.unlink()  # Clean up temp file
-                    else:
-                        continue
-                else:
-                    # Process local file
-                    image_path = Path(image_url)
-                    if image_path.exists():
-                        image_result = self.process_image(image_path, sku, idx, output_dir)
-                    else:
-                        logger.error(f"❌ Image file not found: {image_url}")
-                        continue
-                
-                if image_result['success']:
-                    results['processed_images'] += 1
-                    product_result['images'].append(image_result)
-                else:
-                    results['failed_images'] += 1
-                    product_result['success'] = False
+                # Images an interrupted earlier run finished are neither downloaded nor processed again
+                resumed = self._resumed_result(sku, idx, output_dir)
+                if resumed is not None:
+                    results['resumed_images'] += 1
+                    self._record_image_result(results, product_result, resumed)
+                    continue
+                if not (download_images and image_url.startswith('http')) and not Path(image_url).exists():
+                    logger.error(f"❌ Image file not found: {image_url}")
+                    continue
+                tasks.append(ImageTask(sku, idx, output_dir, image_url, self.metrics.image(sku, idx),
+                                       context={'tracker': tracker}))
+                                       
+            tracker['pending'] = len(tasks)
+            if not tasks:
+                finish_product(tracker)
+            return tasks
             
-            if product_result['images']:
-                results['processed_products'] += 1
+        # Products are scanned lazily, as the first stage's queue has room for more images
+        def scan_products() -> Iterator[ImageTask]:
+            for product in zoho_data:
+                with lock:
+                    tasks = product_tasks(product)
+                yield from tasks
+                
+        workers = self.stage_workers
+        with ImageFetcher(max_workers=workers['fetch'],
+                          per_host_limit=self.per_host_limit,
+                          retries=self.retries,
+                          max_bytes=self.max_download_bytes) as fetcher:
+            pipeline = Pipeline([
+                Stage('fetch', lambda task: self._stage_fetch(task, fetcher), workers['fetch']),
+                Stage('decode', self._stage_decode, workers['decode']),
+                Stage('transform', self._stage_transform, workers['transform']),
+                Stage('encode', self._stage_encode, workers['encode']),
+                Stage('write', self._stage_write, workers['write'])
+            ], queue_size=self.queue_size, on_error=lambda task, stage, error: self._fail(task, error))
             
-            results['products'].append(product_result)
+            # Images come out in completion order while later ones are still in the earlier stages
+            for task in pipeline.run(scan_products()):
+                for finished in self._complete(task):
+                    tracker = finished.context['tracker']
+                    with lock:
+                        # A failed download leaves the product short of images rather than counting as a failure
+                        if finished.outcome != 'download_failed':
+                            self._record_image_result(results, tracker['product'], finished.result)
+                        tracker['pending'] -= 1
+                        if tracker['pending'] == 0:
+                            finish_product(tracker)
+                            
+        if self.uploads is not None:
+            self.uploads.flush()
+            results['uploads'] = self.uploads.summary()
+        if self.cache is not None:
+            results['cache'] = self.cache.summary()
+        if self.dedup is not None:
+            results['dedup'] = self.dedup.summary()
+        if self.validators is not None:
+            results['http_validators'] = self.validators.summary()
+        results['metrics'] = self.metrics.summary()
+        results['encoder'] = self.encoder.cache_params()
+        results['pipeline'] = {
+            'workers': dict(workers),
+            'queue_size': self.queue_size,
+            'memory_limit_mb': self.memory_budget.limit_bytes // (1024 * 1024),
+            'peak_memory_mb': round(self.memory_budget.peak / (1024 * 1024), 1)
+        }
         
         return results
     
-    def create_faire_image_manifest(self, results: Dict, output_dir: Path) -> Path:
-        """Create manifest file for Faire upload."""
-        manifest = {
-            'processing_summary': {
-                'total_products': results['total_products'],
-                'processed_products': results['processed_products'],
-                'total_images': results['processed_images']
-            },
-            'products': []
+    def _record_image_result(self, results: Dict, product_result: Dict, image_result: Dict):
+        """Fold a single image result into the product and run totals."""
+        if image_result['success']:
+            results['processed_images'] += 1
+            if 'alias_of' in image_result:
+                results['duplicate_images'] += 1
+            product_result['images'].append(image_result)
+        else:
+            results['failed_images'] += 1
+            product_result['success'] = False
+    
+    def _update_manifest(self, product_result: Dict):
+        """Store a product's manifest entry; one that failed keeps the entry of its last good run."""
+        if self.manifest is not None and product_result['success'] and product_result['images']:
+            self.manifest.upsert(self._faire_product(product_result))
+    
+    def create_faire_image_manifest(self, results: Dict, output_dir: Path,
+                                    products: Optional[Iterable[Dict]] = None, format: str = 'json') -> Path:
+        """
+        Create manifest file for Faire upload.
+        
+        With a manifest store the products are already in it, updated as each one
+        finished, and the file is a compact export of the whole store (``format``
+        is ``json`` or ``ndjson``), so products this run didn't touch keep their entries.
+        
+        Without one, pass ``products`` (e.g. read back from a streamed results file)
+        to write the manifest one product at a time instead of from ``results['products']``.
+        """
+        summary = {
+            'total_products': results['total_products'],
+            'processed_products': results['processed_products'],
+            'total_images': results['processed_images'],
+            'duplicate_images': results['duplicate_images']
         }
         
-        for product in results['products']:
-            if product['success'] and product['images']:
-                faire_product = {
-                    'sku': product['sku'],
-                    'name': product['name'],
-                    'images': [
-                        {
-                            'url': f"brand-images/{Path(img['main_image']).name}",
-                            'thumbnail_url': f"brand-images/{Path(img['thumbnail']).name}",
-                            'index': img['index']
-                        }
-                        for img in product['images']
-                    ]
-                }
-                manifest['products'].append(faire_product)
+        if self.manifest is not None:
+            self.manifest.set_summary({**summary, 'manifest_products': len(self.manifest)})
+            if format == 'ndjson':
+                manifest_path = self.manifest.export_ndjson(output_dir / 'faire_image_manifest.ndjson')
+            else:
+                manifest_path = self.manifest.export_json(output_dir / 'faire_image_manifest.json')
+            logger.info(f"📋 Created manifest: {manifest_path} ({len(self.manifest)} products)")
+            return manifest_path
         
         manifest_path = output_dir / 'faire_image_manifest.json'
-        with open(manifest_path, 'w') as f:
-            json.dump(manifest, f, indent=2)
+        if products is None:
+            manifest = {
+                'processing_summary': summary,
+                'products': [
+                    self._faire_product(product) for product in results['products']
+                    if product['success'] and product['images']
+                ]
+            }
+            with open(manifest_path, 'w') as f:
+                json.dump(manifest, f, indent=2)
+        else:
+            with open(manifest_path, 'w') as f:
+                f.write(f'{{"processing_summary": {json.dumps(summary)}, "products": [')
+                separator = '\n'
+                for product in products:
+                    if product['success'] and product['images']:
+                        f.write(separator + json.dumps(self._faire_product(product)))
+                        separator = ',\n'
+                f.write('\n]}\n')
         
         logger.info(f"📋 Created manifest: {manifest_path}")
         return manifest_path
+    
+    def _faire_product(self, product: Dict) -> Dict:
+        return {
+            'sku': product['sku'],
+            'name': product['name'],
+            'brand': product.get('brand', ''),
+            'images': [self._faire_image(img) for img in product['images']]
+        }
+    
+    def _faire_image(self, img: Dict) -> Dict:
+        entry = {
+            'url': f"brand-images/{Path(img['main_image']).name}",
+            'thumbnail_url': f"brand-images/{Path(img['thumbnail']).name}" if img['thumbnail'] else None,
+            'index': img['index']
+        }
+        # Duplicates share the original's files; say whose they are
+        if 'alias_of' in img:
+            entry['alias_of'] = img['alias_of']
+        return entry
+
+
+def serve_worker(cache: Optional[ProcessingCache] = None, padding: int = 50, quality: int = 85,
+                 variant_sizes: Tuple[Tuple[int, int], ...] = ((400, 400),), trim: bool = False,
+                 white_background: bool = False, encoder: Optional[EncoderProfile] = None,
+                 manifest: Optional[ManifestStore] = None):
+    """
+    Keep a warm processor serving JSON-lines requests on stdin until EOF.
+
+    Each request line is an object such as
+    ``{"id": 1, "op": "process", "input": "/tmp/a.jpg", "output_dir": "out", "sku": "abc", "index": 1}``
+    (``padding``, ``quality``, ``trim`` and ``white_background`` may override the
+    worker defaults). Each gets exactly
+    one response line ``{"id": 1, "success": true, "result": {...}}`` or
+    ``{"id": 1, "success": false, "error": "..."}`` on stdout. ``ping`` and
+    ``shutdown`` ops are also understood. Logging stays on stderr.
+
+    The ``process_bytes`` op takes the source as base64 ``data`` instead of
+    ``input``/``output_dir`` and returns the encoded outputs as base64 in
+    ``result.outputs``, so neither side writes or reads a file.
+
+    With a ``manifest`` store, ``manifest_sku`` (``sku``) and ``manifest_brand``
+    (``brand``) look up stored Faire manifest entries.
+    """
+    processors = {}
+    encoder = encoder or EncoderProfile(quality=quality)
+    
+    def respond(message: Dict):
+        sys.stdout.write(json.dumps(message) + '\n')
+        sys.stdout.flush()
+    
+    respond({'event': 'ready', 'pid': os.getpid()})
+    
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            respond({'id': None, 'success': False, 'error': f"Invalid JSON request: {str(e)}"})
+            continue
+        
+        request_id = request.get('id')
+        op = request.get('op', 'process')
+        
+        if op == 'ping':
+            respond({'id': request_id, 'success': True})
+            continue
+        if op == 'shutdown':
+            respond({'id': request_id, 'success': True})
+            break
+        if op in ('manifest_sku', 'manifest_brand'):
+            if manifest is None:
+                respond({'id': request_id, 'success': False,
+                         'error': 'No manifest store configured (start the worker with --manifest-db)'})
+            elif op == 'manifest_sku':
+                entry = manifest.get(str(request.get('sku', '')).lower())
+                if entry is None:
+                    respond({'id': request_id, 'success': False, 'error': f"SKU not found: {request.get('sku')}"})
+                else:
+                    respond({'id': request_id, 'success': True, 'result': entry})
+            else:
+                brand = str(request.get('brand', ''))
+                respond({'id': request_id, 'success': True,
+                         'result': {'brand': brand, 'products': manifest.by_brand(brand)}})
+            continue
+        if op not in ('process', 'process_bytes'):
+            respond({'id': request_id, 'success': False, 'error': f"Unknown op: {op}"})
+            continue
+        
+        try:
+            if op == 'process':
+                # A URL input is downloaded by the worker; Path() would mangle its double slash
+                source = str(request['input'])
+                input_path = source if source.startswith(('http://', 'https://')) else Path(source)
+                output_dir = Path(request['output_dir'])
+                sku = str(request.get('sku') or Path(source).stem)
+            else:
+                data = base64.b64decode(request['data'], validate=True)
+                sku = str(request['sku'])
+            index = int(request.get('index', 1))
+            settings = (
+                int(request.get('padding', padding)),
+                int(request.get('quality', encoder.quality)),
+                bool(request.get('trim', trim)),
+                bool(request.get('white_background', white_background))
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            respond({'id': request_id, 'success': False, 'error': f"Bad {op} request: {str(e)}"})
+            continue
+        
+        if settings not in processors:
+            processors[settings] = ZohoFaireImageProcessor(
+                padding=settings[0], trim=settings[2], white_background=settings[3],
+                cache=cache, variant_sizes=variant_sizes, encoder=replace(encoder, quality=settings[1])
+            )
+        processor = processors[settings]
+        
+        if op == 'process':
+            output_dir.mkdir(parents=True, exist_ok=True)
+            result = processor.process_image(input_path, sku, index, output_dir)
+        else:
+            result = processor.process_bytes(data, sku, index)
+            if result['success']:
+                result['outputs'] = {
+                    name: base64.b64encode(encoded).decode('ascii') for name, encoded in result['outputs'].items()
+                }
+        
+        if result['success']:
+            respond({'id': request_id, 'success': True, 'result': result})
+        else:
+            respond({'id': request_id, 'success': False, 'error': result['error']})
 
 
 def main():
     parser = argparse.ArgumentParser(description='Zoho-Faire Image Processor')
-    parser.add_argument('--input', required=True, help='Input JSON file with Zoho product data')
+    parser.add_argument('--input', help='Input JSON file with Zoho product data')
     parser.add_argument('--output', default='processed-images', help='Output directory')
     parser.add_argument('--padding', type=int, default=50, help='Padding in pixels')
     parser.add_argument('--quality', type=int, default=85, help='WebP quality')
+    parser.add_argument('--speed', choices=list(ENCODER_SPEEDS), default='default',
+                        help='WebP encoder speed preset (fastest = quickest encode, small = smallest files)')
+    parser.add_argument('--lossless-flat', action='store_true', help='Encode flat-colour artwork losslessly')
+    parser.add_argument('--target-kb', type=int, help='Lower quality as needed to keep each file under this size')
+    parser.add_argument('--trim', action='store_true', help='Trim transparent/near-white borders before padding')
+    parser.add_argument('--white_background', '--white-background', dest='white_background', action='store_true',
+                        help='Pad onto white instead of transparency')
+    parser.add_argument('--sizes', default='400x400', help='Comma-separated variant sizes, e.g. 400x400,150x150')
     parser.add_argument('--no-download', action='store_true', help='Skip downloading images from URLs')
+    parser.add_argument('--download-workers', type=int, default=8, help='Concurrent image downloads')
+    parser.add_argument('--per-host', type=int, default=4, help='Max concurrent downloads per host')
+    parser.add_argument('--retries', type=int, default=3, help='Download retries with exponential backoff')
+    parser.add_argument('--max-download-mb', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help='Abandon any image download larger than this')
+    parser.add_argument('--http-validators', metavar='PATH',
+                        help=f"ETag/Last-Modified store for conditional downloads (default: <output>/{VALIDATORS_FILE_NAME})")
+    parser.add_argument('--no-conditional', action='store_true',
+                        help='Download every image in full instead of revalidating unchanged ones')
+    parser.add_argument('--no-cache', action='store_true', help='Reprocess every image, ignoring the processing cache')
+    parser.add_argument('--cache-dir', default=str(DEFAULT_CACHE_DIR), help='Processing cache directory')
+    parser.add_argument('--cache-size-mb', type=int, default=DEFAULT_CACHE_SIZE_MB, help='Processing cache size limit')
+    parser.add_argument('--stream', action='store_true',
+                        help='Read products incrementally (JSON array or NDJSON) and write results as NDJSON')
+    parser.add_argument('--results', help='Results NDJSON path for --stream (default: <output>/results.ndjson)')
+    parser.add_argument('--incremental', metavar='STATE_FILE',
+                        help='Only process products whose image or sync timestamp changed since the last run')
+    parser.add_argument('--no-prune', action='store_true',
+                        help='With --incremental, keep outputs of SKUs missing from this input')
+    parser.add_argument('--dedup', action='store_true',
+                        help='Process visually identical images once and alias the duplicates to the first')
+    parser.add_argument('--dedup-distance', type=int, default=DEFAULT_MAX_DISTANCE,
+                        help='Max differing dHash bits for two images to count as duplicates')
+    parser.add_argument('--metrics-jsonl', metavar='PATH', help='Append one JSON line of stage timings per image')
+    parser.add_argument('--metrics-prom', metavar='PATH',
+                        help='Write aggregate stage histograms as a Prometheus textfile at the end of the run')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip images an interrupted earlier run into the same output already finished')
+    parser.add_argument('--journal', metavar='PATH',
+                        help='Checkpoint journal path (default: <output>/.checkpoint.jsonl)')
+    parser.add_argument('--manifest-db', metavar='PATH',
+                        help=f"Manifest store updated per product (default: <output>/{MANIFEST_DB_NAME})")
+    parser.add_argument('--manifest-format', choices=['json', 'ndjson'], default='json',
+                        help='Format of the manifest file exported from the store')
+    parser.add_argument('--rebuild-manifest', action='store_true',
+                        help='Drop every stored manifest entry first, so the manifest only lists this input')
+    parser.add_argument('--upload-to', metavar='TARGET',
+                        help='Also upload outputs while processing: s3://bucket, gs://bucket, firebase or a directory')
+    parser.add_argument('--upload-prefix', default='brand-images', help='Object key prefix for uploads')
+    parser.add_argument('--upload-workers', type=int, default=DEFAULT_UPLOAD_WORKERS, help='Concurrent uploads')
+    parser.add_argument('--s3-endpoint', metavar='URL', help='S3-compatible endpoint, e.g. a MinIO server')
+    parser.add_argument('--decode-workers', type=int, help='Decode stage threads (default: half the CPUs)')
+    parser.add_argument('--transform-workers', type=int,
+                        help='Resize/pad stage threads (default: half the CPUs)')
+    parser.add_argument('--encode-workers', type=int, help='WebP encode stage threads (default: one per CPU)')
+    parser.add_argument('--write-workers', type=int, help='File write stage threads (default: 2)')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help='Images waiting between two stages before the earlier one blocks')
+    parser.add_argument('--memory-mb', type=int, default=DEFAULT_MEMORY_LIMIT_MB,
+                        help='Ceiling on decoded image data held in the pipeline at once')
+    parser.add_argument('--worker', action='store_true', help='Serve JSON-lines process requests on stdin/stdout')
     
     args = parser.parse_args()
     
+    try:
+        variant_sizes = tuple(
+            tuple(int(n) for n in size.lower().split('x')) for size in args.sizes.split(',') if size.strip()
+        )
+        if any(len(size) != 2 for size in variant_sizes):
+            raise ValueError(args.sizes)
+    except ValueError:
+        parser.error(f"Invalid --sizes: {args.sizes}. Use WIDTHxHEIGHT[,WIDTHxHEIGHT...]")
+    
+    cache = None
+    if not args.no_cache:
+        cache = ProcessingCache(Path(args.cache_dir), max_bytes=args.cache_size_mb * 1024 * 1024)
+    
+    encoder = EncoderProfile(
+        quality=args.quality,
+        speed=args.speed,
+        lossless_flat=args.lossless_flat,
+        target_bytes=args.target_kb * 1024 if args.target_kb else None
+    )
+    
+    if args.worker:
+        manifest = ManifestStore(Path(args.manifest_db)) if args.manifest_db else None
+        serve_worker(cache=cache, padding=args.padding, variant_sizes=variant_sizes,
+                     trim=args.trim, white_background=args.white_background, encoder=encoder,
+                     manifest=manifest)
+        return
+    
+    if not args.input:
+        parser.error('--input is required unless running with --worker')
+    
     # Load Zoho product data
     input_path = Path(args.input)
     if not input_path.exists():
         logger.error(f"❌ Input file not found: {args.input}")
         sys.exit(1)
     
-    with open(input_path, 'r') as f:
-        zoho_data = json.load(f)
-    
-    if not isinstance(zoho_data, list):
-        logger.error("❌ Input file must contain a JSON array of products")
-        sys.exit(1)
+    if args.stream:
+        zoho_data = iter_products(input_path)
+    else:
+        with open(input_path, 'r') as f:
+            zoho_data = json.load(f)
+        
+        if not isinstance(zoho_data, list):
+            logger.error("❌ Input file must contain a JSON array of products")
+            sys.exit(1)
     
     # Process images
+    sync_state = SyncState(Path(args.incremental)) if args.incremental else None
+    metrics = PipelineMetrics(Path(args.metrics_jsonl) if args.metrics_jsonl else None)
+    
+    stage_workers = {
+        stage: count for stage, count in (
+            ('decode', args.decode_workers),
+            ('transform', args.transform_workers),
+            ('encode', args.encode_workers),
+            ('write', args.write_workers)
+        ) if count
+    }
+    
+    output_dir = Path(args.output)
     processor = ZohoFaireImageProcessor(
         padding=args.padding,
-        quality=args.quality
+        encoder=encoder,
+        download_workers=args.download_workers,
+        per_host_limit=args.per_host,
+        retries=args.retries,
+        max_download_bytes=args.max_download_mb * 1024 * 1024,
+        cache=cache,
+        variant_sizes=variant_sizes,
+        sync_state=sync_state,
+        trim=args.trim,
+        white_background=args.white_background,
+        dedup=DuplicateIndex(max_distance=args.dedup_distance) if args.dedup else None,
+        metrics=metrics,
+        stage_workers=stage_workers,
+        queue_size=args.queue_size,
+        memory_limit_mb=args.memory_mb
     )
     
-    output_dir = Path(args.output)
-    results = processor.process_zoho_products(
-        zoho_data, 
-        output_dir, 
-        download_images=not args.no_download
+    # Every run keeps a journal so that it can be resumed if it is interrupted
+    processor.journal = CheckpointJournal(
+        Path(args.journal) if args.journal else output_dir / '.checkpoint.jsonl',
+        {**processor.cache_params(), 'output_dir': str(output_dir.resolve())},
+        resume=args.resume
     )
     
+    if args.upload_to:
+        try:
+            backend = open_backend(args.upload_to, endpoint_url=args.s3_endpoint, max_connections=args.upload_workers)
+        except (RuntimeError, ValueError) as e:
+            parser.error(str(e))
+        processor.uploads = UploadSink(backend, workers=args.upload_workers, prefix=args.upload_prefix)
+    
+    # Revalidated sources whose outputs are still current are neither downloaded nor reprocessed
+    if not args.no_conditional:
+        processor.validators = ValidatorStore(
+            Path(args.http_validators) if args.http_validators else output_dir / VALIDATORS_FILE_NAME
+        )
+    
+    # The manifest store outlives the run: products not in this input keep their entries
+    processor.manifest = ManifestStore(Path(args.manifest_db) if args.manifest_db else output_dir / MANIFEST_DB_NAME)
+    if args.rebuild_manifest:
+        processor.manifest.clear()
+    
+    try:
+        if args.stream:
+            results_path = Path(args.results) if args.results else output_dir / 'results.ndjson'
+            try:
+                with ResultsWriter(results_path) as writer:
+                    results = processor.process_zoho_products(
+                        zoho_data,
+                        output_dir,
+                        download_images=not args.no_download,
+                        on_product=writer.write
+                    )
+            except CatalogError as e:
+                # Only the catalog reader raises this; errors from processing a product propagate unchanged
+                logger.error(f"❌ Could not read input: {str(e)}")
+                sys.exit(1)
+            results['results_file'] = str(results_path)
+        else:
+            results = processor.process_zoho_products(
+                zoho_data, 
+                output_dir, 
+                download_images=not args.no_download
+            )
+    except BaseException:
+        processor.journal.close()
+        processor.manifest.close()
+        raise
+    finally:
+        if processor.uploads is not None:
+            processor.uploads.close()
+    processor.journal.close(completed=True)
+    
+    if sync_state is not None:
+        if not args.no_prune:
+            results['pruned_skus'] = sync_state.prune()
+            for sku in results['pruned_skus']:
+                processor.manifest.remove(sku)
+                logger.info(f"🗑️  Pruned outputs for removed SKU: {sku}")
+        sync_state.save()
+    if processor.validators is not None:
+        processor.validators.save()
+    
     # Create manifest
-    manifest_path = processor.create_faire_image_manifest(results, output_dir)
+    manifest_path = processor.create_faire_image_manifest(results, output_dir, format=args.manifest_format)
+    processor.manifest.close()
+    
+    metrics.close()
+    if args.metrics_prom:
+        metrics.write_prometheus(Path(args.metrics_prom))
     
     # Summary
     logger.info("\n" + "="*60)
@@ -283,6 +1109,32 @@ def main():
     logger.info(f"✅ Products processed: {results['processed_products']}/{results['total_products']}")
     logger.info(f"✅ Images processed: {results['processed_images']}")
     logger.info(f"❌ Images failed: {results['failed_images']}")
+    if sync_state is not None:
+        logger.info(f"⏭️  Unchanged products skipped: {results['unchanged_products']}")
+    if results['resumed_images']:
+        logger.info(f"⏩ Resumed from checkpoint: {results['resumed_images']} images")
+    if 'dedup' in results:
+        logger.info(f"🔗 Duplicate images reused: {results['duplicate_images']}")
+    if 'uploads' in results:
+        uploads = results['uploads']
+        logger.info(f"☁️  Uploaded to {args.upload_to}: {uploads['uploaded']}, unchanged: {uploads['skipped']}, "
+                    f"failed: {uploads['failed']} ({uploads['bytes_uploaded'] / 1024:.0f} KB)")
+    if 'http_validators' in results:
+        revalidation = results['http_validators']
+        logger.info(f"🌐 Not modified: {revalidation['not_modified']}/{revalidation['revalidated']} revalidated, "
+                    f"{revalidation['bytes_saved'] / 1024:.0f} KB not downloaded")
+    if 'cache' in results:
+        logger.info(f"♻️  Cache hits: {results['cache']['hits']}, misses: {results['cache']['misses']}")
+    encode_stats = results['metrics']['stage_seconds'].get('encode')
+    if encode_stats:
+        logger.info(f"🗜️  Encoder ({args.speed}, quality {args.quality}): {encode_stats['sum']:.2f}s encoding, "
+                    f"{results['metrics']['bytes_out']['sum'] / 1024:.0f} KB written")
+    stage_totals = sorted(results['metrics']['stage_seconds'].items(), key=lambda item: -item[1]['sum'])
+    if stage_totals:
+        logger.info("⏱️  Stage time: " + ", ".join(f"{stage} {hist['sum']:.2f}s" for stage, hist in stage_totals))
+    pipeline_stats = results['pipeline']
+    logger.info("🧵 Stage workers: " + ", ".join(f"{stage} {count}" for stage, count in pipeline_stats['workers'].items())
+                + f" (peak {pipeline_stats['peak_memory_mb']} of {pipeline_stats['memory_limit_mb']} MB decoded)")
     logger.info(f"📁 Output directory: {output_dir}")
     logger.info(f"📋 Manifest file: {manifest_path}")
     logger.info("="*60)
@@ -7,15 +7,18 @@ Processes product images by:
 3. Optionally resizing to standard dimensions
 """
 
-import os
 import sys
 from pathlib import Path
-from PIL import Image, ImageOps
-import numpy as np
+from PIL import Image
 from typing import Tuple, Optional
 import argparse
 import logging
 
+# Shared pipeline modules live alongside the Zoho processor
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'image-processing'))
+from image_engine import EncoderProfile, VariantSpec, compose_variants
+from processing_core import ProcessingCore, TransformSettings
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -24,7 +27,8 @@ class ImageProcessor:
     def __init__(self,
                  padding: int = 50,
                  output_size: Optional[Tuple[int, int]] = None,
-                 quality: int = 85):
+                 quality: int = 85,
+                 trim: bool = False):
         """
         Initialize the image processor.
         
@@ -32,10 +36,15 @@ class ImageProcessor:
             padding: Pixels of padding to add around the image
             output_size: Optional (width, height) to resize images to
             quality: WebP quality (1-100)
+            trim: Crop transparent/near-white borders before padding
         """
         self.padding = padding
         self.output_size = output_size
         self.quality = quality
+        self.trim = trim
+        # With an output size the padded image is fitted and centred on a canvas of exactly that size
+        main = VariantSpec('main', output_size) if output_size else VariantSpec('main')
+        self.core = ProcessingCore(TransformSettings(padding, trim=trim), [main], EncoderProfile(quality=quality))
     
     def add_padding(self, image: Image.Image) -> Image.Image:
         """
@@ -51,18 +60,7 @@ class ImageProcessor:
         if image.mode != 'RGBA':
             image = image.convert('RGBA')
         
-        # Calculate new dimensions
-        width, height = image.size
-        new_width = width + (2 * self.padding)
-        new_height = height + (2 * self.padding)
-        
-        # Create new image with transparent background
-        padded_image = Image.new('RGBA', (new_width, new_height), (0, 0, 0, 0))
-        
-        # Paste original image in center
-        padded_image.paste(image, (self.padding, self.padding), image)
-        
-        return padded_image
+        return compose_variants(image, self.padding, [VariantSpec('main')])['main']
     
     def resize_image(self, image: Image.Image, size: Tuple[int, int]) -> Image.Image:
         """
@@ -75,18 +73,8 @@ class ImageProcessor:
         Returns:
             Resized image
         """
-        # Use LANCZOS resampling for best quality
-        image.thumbnail(size, Image.Resampling.LANCZOS)
-        
-        # Create new image with exact dimensions and transparent background
-        new_image = Image.new('RGBA', size, (0, 0, 0, 0))
-        
-        # Center the resized image
-        x = (size[0] - image.width) // 2
-        y = (size[1] - image.height) // 2
-        new_image.paste(image, (x, y), image)
-        
-        return new_image
+        # Fit with LANCZOS and centre on a transparent canvas of exactly ``size``
+        return compose_variants(image, 0, [VariantSpec('resized', size)])['resized']
     
     def process_image(self, input_path: Path, output_path: Path) -> bool:
         """
@@ -102,25 +90,11 @@ class ImageProcessor:
         try:
             logger.info(f"Processing: {input_path.name}")
             
-            # Open image
-            image = Image.open(input_path)
-            
-            # Convert to RGBA if needed
-            if image.mode != 'RGBA':
-                image = image.convert('RGBA')
-            
-            # Add padding
-            image = self.add_padding(image)
-            
-            # Resize if needed
-            if self.output_size:
-                image = self.resize_image(image, self.output_size)
-            
             # Ensure output directory exists
             output_path.parent.mkdir(parents=True, exist_ok=True)
             
-            # Save as WebP
-            image.save(output_path, 'WEBP', quality=self.quality, lossless=False)
+            # Pad (after an optional trim), resize if needed and save as WebP
+            self.core.process_file(input_path, output_path.with_suffix(''))
             
             logger.info(f"Saved: {output_path.name}")
             return True
@@ -193,6 +167,7 @@ def main():
     parser.add_argument('--size', type=str, help='Output size as WIDTHxHEIGHT (e.g., 400x400)')
     parser.add_argument('--pattern', type=str, default='*', help='File pattern (default: *)')
     parser.add_argument('--quality', type=int, default=85, help='WebP quality 1-100 (default: 85)')
+    parser.add_argument('--trim', action='store_true', help='Trim transparent/near-white borders before padding')
     parser.add_argument('--flatten-structure', action='store_true', help='Put all output files in single folder')
     
     args = parser.parse_args()
@@ -211,7 +186,8 @@ def main():
     processor = ImageProcessor(
         padding=args.padding,
         output_size=output_size,
-        quality=args.quality
+        quality=args.quality,
+        trim=args.trim
     )
     
     # Process folder
@@ -5,108 +5,86 @@ Renames images to match the expected format: sku_1.webp, sku_2.webp, etc.
 """
 
 import os
-import shutil
+import sys
+import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import re
 
-def rename_images_for_brand(brand_folder):
+# Shared pipeline modules live alongside the Zoho processor
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'image-processing'))
+from rename_plan import apply_plan, plan_renames
+from sku_index import SkuMatcher
+
+def rename_images_for_brand(brand_folder, matcher=None, dry_run=False):
     """
     Rename images in a brand folder to match ProductCard expectations.
     Groups images by SKU and numbers them.
+    
+    The whole rename plan is worked out first, then applied in two phases
+    through unique temporary names, so no file is overwritten and a cycle
+    such as sku_1 <-> sku_2 is handled. With dry_run the plan is only made.
+    Returns the plan, or None if the folder doesn't exist.
     """
     brand_path = Path(brand_folder)
     if not brand_path.exists():
         print(f"Folder not found: {brand_folder}")
-        return
+        return None
     
-    print(f"\nProcessing brand: {brand_path.name}")
-    
-    # Group files by SKU
-    sku_groups = {}
-    
-    for img_file in brand_path.glob("*"):
-        if img_file.suffix.lower() in ['.webp', '.jpg', '.jpeg', '.png']:
-            # Extract SKU from filename (everything before first underscore or number)
-            filename = img_file.stem.lower()
-            
-            # Try to extract SKU (assumes SKU is at the start)
-            # Matches: ABC123, ABC-123, etc.
-            match = re.match(r'^([a-zA-Z0-9\-]+?)(?:_|$)', filename)
-            if match:
-                sku = match.group(1).lower()
-            else:
-                sku = filename.split('_')[0].lower()
-            
-            if sku not in sku_groups:
-                sku_groups[sku] = []
-            sku_groups[sku].append(img_file)
-    
-    # Rename files
-    for sku, files in sku_groups.items():
-        print(f"  SKU: {sku} - {len(files)} images")
-        
-        # Sort files to ensure consistent ordering
-        files.sort()
-        
-        for i, img_file in enumerate(files, 1):
-            # Create new filename
-            new_name = f"{sku}_{i}{img_file.suffix.lower()}"
-            new_path = brand_path / new_name
-            
-            # Skip if already correctly named
-            if img_file.name.lower() == new_name:
-                continue
-            
-            # Rename (handle conflicts)
-            if new_path.exists():
-                temp_name = f"{sku}_{i}_temp{img_file.suffix.lower()}"
-                temp_path = brand_path / temp_name
-                shutil.move(str(img_file), str(temp_path))
-                print(f"    {img_file.name} -> {temp_name} (temp)")
-            else:
-                shutil.move(str(img_file), str(new_path))
-                print(f"    {img_file.name} -> {new_name}")
+    plan = plan_renames(brand_path, matcher or SkuMatcher())
+    if not dry_run:
+        apply_plan(plan)
+    return plan
+
+def print_plan(plan, dry_run=False):
+    """Print a brand's rename plan, and how applying it went."""
+    print(f"\nProcessing brand: {plan.folder.name}")
+    for sku, count in plan.groups:
+        print(f"  SKU: {sku} - {count} images")
+    
+    for rename in plan.renames:
+        via = " (via temporary name)" if rename.staged else ""
+        print(f"    {rename.source.name} -> {rename.target.name}{via}")
+    for cycle in plan.cycles:
+        print(f"  Cycle: {' -> '.join(cycle + cycle[:1])}")
+    for conflict in plan.conflicts:
+        print(f"  Skipped: {conflict}")
+    for failure in plan.failures:
+        print(f"  Failed: {failure}")
+    
+    action = "to rename" if dry_run else "renamed"
+    print(f"  {len(plan.renames) - len(plan.failures)} {action}, {plan.unchanged} already named")
 
 def create_size_variants(brand_folder):
     """
     Create size variants (e.g., sku_1_400x400.webp) from base images.
+    Each base image is decoded once and every missing size is rendered from it.
     """
     from PIL import Image
+    from image_engine import EncoderProfile, VariantSpec, compose_variants, save_variants
     
     brand_path = Path(brand_folder)
     sizes = [(400, 400), (150, 150)]  # Add more sizes as needed
+    specs = [VariantSpec.sized(width, height) for width, height in sizes]
     
     print(f"\nCreating size variants for: {brand_path.name}")
     
     for img_file in brand_path.glob("*_[0-9].webp"):
-        base_name = img_file.stem
+        base_path = img_file.with_suffix('')
+        missing = [spec for spec in specs if not (brand_path / f"{base_path.name}{spec.suffix}.webp").exists()]
         
-        for width, height in sizes:
-            variant_name = f"{base_name}_{width}x{height}.webp"
-            variant_path = brand_path / variant_name
-            
-            if variant_path.exists():
-                continue
-            
-            try:
-                # Open and resize
-                img = Image.open(img_file)
-                img.thumbnail((width, height), Image.Resampling.LANCZOS)
-                
-                # Create new image with exact dimensions
-                new_img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
-                
-                # Center the resized image
-                x = (width - img.width) // 2
-                y = (height - img.height) // 2
-                new_img.paste(img, (x, y), img if img.mode == 'RGBA' else None)
-                
-                # Save
-                new_img.save(variant_path, 'WEBP', quality=85)
-                print(f"  Created: {variant_name}")
+        if not missing:
+            continue
+        
+        try:
+            with Image.open(img_file) as img:
+                img.load()
+                rendered = compose_variants(img, 0, missing)
+                save_variants(rendered, missing, base_path, EncoderProfile(quality=85))
+            for spec in missing:
+                print(f"  Created: {base_path.name}{spec.suffix}.webp")
                 
-            except Exception as e:
-                print(f"  Error creating variant {variant_name}: {e}")
+        except Exception as e:
+            print(f"  Error creating variants for {img_file.name}: {e}")
 
 def main():
     import argparse
@@ -114,6 +92,10 @@ def main():
     parser = argparse.ArgumentParser(description='Rename images for ProductCard format')
     parser.add_argument('folder', help='Brand folder or parent folder containing brand folders')
     parser.add_argument('--create-sizes', action='store_true', help='Also create size variants')
+    parser.add_argument('--items', help='Zoho items export (e.g. items_data.json); filenames are matched to its SKUs')
+    parser.add_argument('--dry-run', action='store_true', help='Print the rename plan without renaming anything')
+    parser.add_argument('--plan-json', metavar='PATH', help='Also write every brand\'s rename plan as JSON')
+    parser.add_argument('--workers', type=int, default=8, help='Brand folders renamed at once')
     
     args = parser.parse_args()
     
@@ -123,19 +105,37 @@ def main():
         print(f"Error: Folder not found: {folder_path}")
         return
     
+    matcher = SkuMatcher.from_items(Path(args.items) if args.items else None)
+    
     # Check if this is a brand folder or parent folder
     if any(folder_path.glob("*.webp")) or any(folder_path.glob("*.jpg")):
         # This is a brand folder
-        rename_images_for_brand(folder_path)
-        if args.create_sizes:
-            create_size_variants(folder_path)
+        brand_folders = [folder_path]
     else:
         # This is a parent folder containing brand folders
-        for brand_folder in folder_path.iterdir():
-            if brand_folder.is_dir():
-                rename_images_for_brand(brand_folder)
-                if args.create_sizes:
-                    create_size_variants(brand_folder)
+        brand_folders = sorted(folder for folder in folder_path.iterdir() if folder.is_dir())
+    
+    # Brands are separate folders, so their plans never touch each other; renames
+    # are mostly waiting on the filesystem, which matters most on network storage
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        plans = list(executor.map(lambda folder: rename_images_for_brand(folder, matcher, args.dry_run),
+                                  brand_folders))
+    for plan in plans:
+        print_plan(plan, args.dry_run)
+    
+    if args.plan_json:
+        with open(args.plan_json, 'w') as f:
+            json.dump({'dry_run': args.dry_run, 'brands': [plan.to_dict() for plan in plans]}, f, indent=2)
+        print(f"\nRename plan written to: {args.plan_json}")
+    
+    if args.create_sizes and not args.dry_run:
+        for brand_folder in brand_folders:
+            create_size_variants(brand_folder)
+    
+    failures = sum(len(plan.failures) for plan in plans)
+    if failures:
+        print(f"\n{failures} renames failed")
+        sys.exit(1)
     
     print("\nDone!")
 
@@ -5,20 +5,156 @@ Checks if processed images match ProductCard expectations
 """
 
 import os
+import sys
+import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from PIL import Image
 import re
 
-def verify_images(folder_path):
+# Shared pipeline modules live alongside the Zoho processor
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'image-processing'))
+from sku_index import OUTPUT_NAME, SkuMatcher
+
+VARIANT_PATTERN = re.compile(r'_(\d+)x(\d+)$')
+
+def has_transparent_corners(img):
+    """Check the four corner pixels for full transparency, reading back only the alpha band."""
+    if img.mode != 'RGBA':
+        return False
+    
+    alpha = img.getchannel('A')
+    width, height = alpha.size
+    corners = [(0, 0), (width - 1, 0), (0, height - 1), (width - 1, height - 1)]
+    return all(alpha.getpixel(corner) == 0 for corner in corners)
+
+def scan_brand(brand_folder, fast=False, matcher=None):
+    """
+    Check every image in one brand folder.
+    
+    File names must be ``sku_N`` or ``sku_N_WxH``; with a ``matcher`` that knows
+    the catalog's SKUs, the SKU must also be one of them.
+    
+    Every ``_WxH`` variant must be exactly the size in its name, read from the
+    file header. Both modes produce the same report. In fast mode only main
+    images are decoded, for the padding check: size variants are rendered from
+    their main image, so they take its result. A variant whose main image is
+    missing or unreadable is decoded itself.
+    """
+    brand_name = brand_folder.name
+    matcher = matcher or SkuMatcher()
+    issues = []
+    stats = {'total_images': 0, 'webp_images': 0, 'correct_naming': 0, 'has_padding': 0}
+    sku_images = {}
+    padded_mains = {}
+    # (main image name, variant file) pairs whose padding comes from the main image
+    deferred_variants = []
+    
+    for img_file in sorted(brand_folder.iterdir()):
+        if not img_file.is_file():
+            continue
+        
+        stats['total_images'] += 1
+        
+        # Check WebP format
+        if img_file.suffix.lower() == '.webp':
+            stats['webp_images'] += 1
+        else:
+            issues.append(f"❌ Non-WebP file: {brand_name}/{img_file.name}")
+            continue
+        
+        # Check naming convention (sku_number.webp or sku_number_size.webp)
+        filename = img_file.stem.lower()
+        
+        # Pattern: sku_1 or sku_1_400x400
+        parsed = matcher.parse_output_name(filename)
+        
+        if parsed:
+            sku, number = parsed
+            stats['correct_naming'] += 1
+            
+            if sku not in sku_images:
+                sku_images[sku] = []
+            sku_images[sku].append((number, img_file.name))
+        elif len(matcher) and OUTPUT_NAME.match(filename):
+            issues.append(f"❌ Unknown SKU: {brand_name}/{img_file.name}")
+        else:
+            issues.append(f"❌ Invalid naming: {brand_name}/{img_file.name}")
+        
+        variant = VARIANT_PATTERN.search(filename)
+        is_variant = bool(variant)
+        
+        # Check image properties
+        try:
+            with Image.open(img_file) as img:
+                # Check if it has transparency (RGBA)
+                if img.mode != 'RGBA':
+                    issues.append(f"⚠️  No alpha channel: {brand_name}/{img_file.name}")
+                
+                # Variants are rendered onto a canvas of exactly their named size
+                if is_variant:
+                    expected = (int(variant.group(1)), int(variant.group(2)))
+                    if img.size != expected:
+                        issues.append(f"❌ Wrong size: {brand_name}/{img_file.name} is "
+                                      f"{img.size[0]}x{img.size[1]}, expected {expected[0]}x{expected[1]}")
+                
+                # Check for padding (simple check - transparent edges)
+                if fast and is_variant:
+                    deferred_variants.append((VARIANT_PATTERN.sub('', filename), img_file))
+                    continue
+                
+                padded = has_transparent_corners(img)
+                if padded:
+                    stats['has_padding'] += 1
+                if not is_variant:
+                    padded_mains[filename] = padded
+                
+        except Exception as e:
+            issues.append(f"❌ Cannot read image: {brand_name}/{img_file.name} - {str(e)}")
+    
+    for main_name, img_file in deferred_variants:
+        padded = padded_mains.get(main_name)
+        if padded is None:
+            try:
+                with Image.open(img_file) as img:
+                    padded = has_transparent_corners(img)
+            except Exception as e:
+                issues.append(f"❌ Cannot read image: {brand_name}/{img_file.name} - {str(e)}")
+                continue
+        if padded:
+            stats['has_padding'] += 1
+    
+    skus = {}
+    for sku, images in sorted(sku_images.items()):
+        images.sort()  # Sort by number
+        numbers = [num for num, _ in images]
+        skus[sku] = numbers
+        
+        # Check for gaps in numbering
+        expected = list(range(1, max(numbers) + 1))
+        missing = set(expected) - set(numbers)
+        if missing:
+            issues.append(f"⚠️  Missing images for {brand_name}/{sku}: {sorted(missing)}")
+    
+    return {'brand': brand_name, 'stats': stats, 'skus': skus, 'issues': issues}
+
+def verify_images(folder_path, fast=False, workers=None, as_json=False, matcher=None):
     """Verify images are correctly formatted for ProductCard."""
     folder = Path(folder_path)
     
     if not folder.exists():
-        print(f"❌ Folder not found: {folder_path}")
-        return
+        if as_json:
+            print(json.dumps({'error': f"Folder not found: {folder_path}"}))
+        else:
+            print(f"❌ Folder not found: {folder_path}")
+        return None
     
-    print("🔍 Product Image Verification Report")
-    print("=" * 50)
+    # Scan brand folders in parallel; results are reported in brand order
+    brand_folders = sorted(p for p in folder.iterdir() if p.is_dir())
+    with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) * 4)) as executor:
+        brand_reports = list(executor.map(
+            lambda brand: scan_brand(brand, fast, matcher), brand_folders
+        ))
     
     issues = []
     stats = {
@@ -29,84 +165,43 @@ def verify_images(folder_path):
         'brands': set(),
         'skus': set()
     }
+    for brand_report in brand_reports:
+        stats['brands'].add(brand_report['brand'])
+        stats['skus'].update(brand_report['skus'])
+        for key, value in brand_report['stats'].items():
+            stats[key] += value
+        issues.extend(brand_report['issues'])
     
-    # Check each brand folder
-    for brand_folder in folder.iterdir():
-        if not brand_folder.is_dir():
-            continue
-            
-        brand_name = brand_folder.name
-        stats['brands'].add(brand_name)
-        
-        print(f"\n📁 Brand: {brand_name}")
-        
-        sku_images = {}
-        
-        # Check each image
-        for img_file in brand_folder.iterdir():
-            if img_file.is_file():
-                stats['total_images'] += 1
-                
-                # Check WebP format
-                if img_file.suffix.lower() == '.webp':
-                    stats['webp_images'] += 1
-                else:
-                    issues.append(f"❌ Non-WebP file: {brand_name}/{img_file.name}")
-                    continue
-                
-                # Check naming convention (sku_number.webp or sku_number_size.webp)
-                filename = img_file.stem.lower()
-                
-                # Pattern: sku_1 or sku_1_400x400
-                match = re.match(r'^([a-z0-9\-]+)_(\d+)(?:_\d+x\d+)?$', filename)
-                
-                if match:
-                    sku = match.group(1)
-                    number = int(match.group(2))
-                    stats['correct_naming'] += 1
-                    stats['skus'].add(sku)
-                    
-                    if sku not in sku_images:
-                        sku_images[sku] = []
-                    sku_images[sku].append((number, img_file.name))
-                else:
-                    issues.append(f"❌ Invalid naming: {brand_name}/{img_file.name}")
-                
-                # Check image properties
-                try:
-                    with Image.open(img_file) as img:
-                        # Check if it has transparency (RGBA)
-                        if img.mode != 'RGBA':
-                            issues.append(f"⚠️  No alpha channel: {brand_name}/{img_file.name}")
-                        
-                        # Check for padding (simple check - transparent edges)
-                        data = img.getdata()
-                        # Check corners for transparency
-                        corners = [
-                            data[0],  # top-left
-                            data[img.width - 1],  # top-right
-                            data[img.width * (img.height - 1)],  # bottom-left
-                            data[-1]  # bottom-right
-                        ]
-                        
-                        if all(pixel[3] == 0 for pixel in corners if len(pixel) > 3):
-                            stats['has_padding'] += 1
-                        
-                except Exception as e:
-                    issues.append(f"❌ Cannot read image: {brand_name}/{img_file.name} - {str(e)}")
+    report = {
+        'folder': str(folder),
+        'mode': 'fast' if fast else 'full',
+        'summary': {
+            'total_images': stats['total_images'],
+            'webp_images': stats['webp_images'],
+            'correct_naming': stats['correct_naming'],
+            'has_padding': stats['has_padding'],
+            'brands': sorted(stats['brands']),
+            'unique_skus': len(stats['skus'])
+        },
+        'brands': [
+            {'brand': r['brand'], 'skus': r['skus'], **r['stats']} for r in brand_reports
+        ],
+        'issues': issues
+    }
+    
+    if as_json:
+        print(json.dumps(report))
+        return report
+    
+    print("🔍 Product Image Verification Report")
+    print("=" * 50)
+    
+    for brand_report in brand_reports:
+        print(f"\n📁 Brand: {brand_report['brand']}")
         
         # Report SKUs for this brand
-        for sku, images in sorted(sku_images.items()):
-            images.sort()  # Sort by number
-            numbers = [num for num, _ in images]
-            
+        for sku, numbers in brand_report['skus'].items():
             print(f"  ✅ SKU: {sku} - Images: {numbers}")
-            
-            # Check for gaps in numbering
-            expected = list(range(1, max(numbers) + 1))
-            missing = set(expected) - set(numbers)
-            if missing:
-                issues.append(f"⚠️  Missing images for {brand_name}/{sku}: {sorted(missing)}")
     
     # Summary
     print("\n" + "=" * 50)
@@ -147,16 +242,26 @@ def verify_images(folder_path):
     print("  │   └── abc123_1_400x400.webp")
     print("  └── elvang/")
     print("      └── def456_1.webp")
+    
+    return report
 
 def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Verify images for ProductCard')
     parser.add_argument('folder', help='Folder to verify (e.g., brand-images)')
+    parser.add_argument('--fast', action='store_true',
+                        help='Decode only main images; size variants are checked against their _WxH name '
+                             'from the file header and take their main image\'s padding result')
+    parser.add_argument('--workers', type=int, help='Brand folders scanned in parallel')
+    parser.add_argument('--json', action='store_true', help='Print a JSON report instead of text')
+    parser.add_argument('--items', help='Zoho items export (e.g. items_data.json); flag SKUs not in it')
     
     args = parser.parse_args()
     
-    verify_images(args.folder)
+    matcher = SkuMatcher.from_items(Path(args.items) if args.items else None)
+    verify_images(args.folder, fast=args.fast, workers=args.workers, as_json=args.json,
+                  matcher=matcher)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,150 @@
+const path = require('path');
+const readline = require('readline');
+const { spawn } = require('child_process');
+
+// Long-lived Python image worker (zoho_faire_processor.py --worker).
+// Keeping one process warm avoids paying interpreter startup and the Pillow
+// import for every uploaded image. Requests and responses are JSON lines.
+const WORKER_SCRIPT = path.join(__dirname, 'image-processing', 'zoho_faire_processor.py');
+const REQUEST_TIMEOUT_MS = 2 * 60 * 1000;
+// Faire manifest store written by batch runs (<output>/faire_manifest.db); enables manifest lookups
+const MANIFEST_DB = process.env.FAIRE_MANIFEST_DB;
+
+let workerProcess = null;
+let workerReady = null;
+let nextRequestId = 1;
+const pendingRequests = new Map();
+
+function rejectPending(error) {
+  for (const { reject, timer } of pendingRequests.values()) {
+    clearTimeout(timer);
+    reject(error);
+  }
+  pendingRequests.clear();
+}
+
+function startWorker() {
+  const args = [WORKER_SCRIPT, '--worker'];
+  if (MANIFEST_DB) args.push('--manifest-db', MANIFEST_DB);
+  const child = spawn('python', args);
+  workerProcess = child;
+
+  workerReady = new Promise((resolve, reject) => {
+    const lines = readline.createInterface({ input: child.stdout });
+
+    lines.on('line', (line) => {
+      let message;
+      try {
+        message = JSON.parse(line);
+      } catch (error) {
+        console.error(`Image worker sent invalid output: ${line}`);
+        return;
+      }
+
+      if (message.event === 'ready') {
+        console.log(`Image worker ready (pid ${message.pid})`);
+        resolve();
+        return;
+      }
+
+      const pending = pendingRequests.get(message.id);
+      if (!pending) return;
+      pendingRequests.delete(message.id);
+      clearTimeout(pending.timer);
+
+      if (message.success) {
+        pending.resolve(message.result || {});
+      } else {
+        pending.reject(new Error(message.error || 'Image worker request failed'));
+      }
+    });
+
+    child.stderr.on('data', (data) => {
+      console.error(`Image worker: ${data}`);
+    });
+
+    child.on('error', (err) => {
+      console.error(`Failed to start image worker: ${err.message}`);
+      reject(err);
+    });
+
+    child.on('exit', (code, signal) => {
+      console.warn(`Image worker exited (code ${code}, signal ${signal})`);
+      if (workerProcess === child) {
+        workerProcess = null;
+        workerReady = null;
+      }
+      reject(new Error('Image worker exited before becoming ready'));
+      rejectPending(new Error(`Image worker exited (code ${code})`));
+    });
+  });
+
+  return workerReady;
+}
+
+async function sendRequest(payload) {
+  if (!workerProcess) {
+    startWorker();
+  }
+  await workerReady;
+
+  const id = nextRequestId++;
+  return new Promise((resolve, reject) => {
+    const timer = setTimeout(() => {
+      pendingRequests.delete(id);
+      reject(new Error(`Image worker request ${id} timed out`));
+    }, REQUEST_TIMEOUT_MS);
+
+    pendingRequests.set(id, { resolve, reject, timer });
+    workerProcess.stdin.write(JSON.stringify({ id, ...payload }) + '\n');
+  });
+}
+
+// Process an image held in memory. Nothing is written to disk on either side;
+// resolves with { sku, index, size, filenames, outputs } where outputs maps
+// variant names ('main', '400x400', ...) to encoded Buffers.
+async function processImageBuffer(buffer, options = {}) {
+  const request = {
+    op: 'process_bytes',
+    data: buffer.toString('base64'),
+    sku: options.sku,
+    index: options.index || 1
+  };
+  if (options.padding) request.padding = options.padding;
+  if (options.quality) request.quality = options.quality;
+  if (options.trim) request.trim = true;
+  if (options.whiteBackground) request.white_background = true;
+
+  const result = await sendRequest(request);
+  const outputs = {};
+  for (const [name, encoded] of Object.entries(result.outputs || {})) {
+    outputs[name] = Buffer.from(encoded, 'base64');
+  }
+  return { ...result, outputs };
+}
+
+// Look up the stored Faire manifest entry for one SKU
+// ({ sku, name, brand, images: [{ url, thumbnail_url, index }] }).
+function lookupManifestSku(sku) {
+  return sendRequest({ op: 'manifest_sku', sku });
+}
+
+// Look up every stored Faire manifest entry for a brand; resolves with { brand, products }.
+function lookupManifestBrand(brand) {
+  return sendRequest({ op: 'manifest_brand', brand });
+}
+
+function stopWorker() {
+  if (workerProcess) {
+    workerProcess.stdin.end();
+    workerProcess = null;
+    workerReady = null;
+  }
+}
+
+module.exports = {
+  processImageBuffer,
+  lookupManifestSku,
+  lookupManifestBrand,
+  stopWorker,
+};
@@ -22,6 +22,9 @@ const {
 // Import Zoho token management from zoho-auth.js
 const { getZohoAccessToken, refreshZohoTokens } = require('./zoho-auth');
 
+// Persistent Python image worker
+const { processImageBuffer, lookupManifestSku, lookupManifestBrand } = require('./image-worker');
+
 const app = express();
 const PORT = process.env.PORT || 3001;
 
@@ -63,8 +66,7 @@ const ZOHO_BASE_URL = process.env.ZOHO_BASE_URL || 'https://www.zohoapis.eu/inve
 const FAIRE_ACCESS_TOKEN = process.env.FAIRE_ACCESS_TOKEN;
 
 // Configure multer for file uploads
-const upload = multer({
-    dest: 'uploads/',
+const uploadOptions = {
     limits: {
         fileSize: 10 * 1024 * 1024, // 10MB limit
         files: 10 // Max 10 files per request
@@ -77,61 +79,15 @@ const upload = multer({
             cb(new Error('Invalid file type. Only JPEG, PNG, WebP, and GIF are allowed.'));
         }
     }
-});
-
-// Helper function to run Python image processor
-const runImageProcessor = (inputPath, outputDir, options = {}) => {
-    return new Promise((resolve, reject) => {
-        const scriptPath = path.join(__dirname, 'image-processing', 'zoho_faire_processor.py');
-        const args = [scriptPath, '--input', inputPath, '--output_dir', outputDir];
-
-        if (options.outputFormat) args.push('--output_format', options.outputFormat);
-        if (options.padding) args.push('--padding', options.padding.toString());
-        if (options.quality) args.push('--quality', options.quality.toString());
-        if (options.trim) args.push('--trim');
-        if (options.whiteBackground) args.push('--white_background');
-
-        console.log(`Running Python script: python ${args.join(' ')}`);
-        const pythonProcess = spawn('python', args);
-
-        let scriptOutput = '';
-        pythonProcess.stdout.on('data', (data) => {
-            scriptOutput += data.toString();
-            console.log(`Python stdout: ${data}`);
-        });
-
-        pythonProcess.stderr.on('data', (data) => {
-            console.error(`Python stderr: ${data}`);
-        });
-
-        pythonProcess.on('close', (code) => {
-            if (code === 0) {
-                try {
-                    // Assuming the Python script prints the processed file path in a specific way
-                    // e.g., "Processed image path: /path/to/output.webp"
-                    const match = scriptOutput.match(/Processed image path:\s*(.*)/);
-                    if (match && match[1]) {
-                        resolve({ processedPath: match[1].trim() });
-                    } else {
-                        // Fallback if script doesn't print path clearly, try to guess
-                        const outputFileName = path.basename(inputPath).split('.')[0] + '.' + (options.outputFormat || 'webp');
-                        const guessedProcessedPath = path.join(outputDir, outputFileName);
-                        console.warn(`Could not parse processed path from script output. Guessing: ${guessedProcessedPath}`);
-                        resolve({ processedPath: guessedProcessedPath });
-                    }
-                } catch (parseError) {
-                    reject(new Error(`Python script succeeded, but output parsing failed: ${parseError.message}. Script output: ${scriptOutput}`));
-                }
-            } else {
-                reject(new Error(`Python script exited with code ${code}. Output: ${scriptOutput}`));
-            }
-        });
-
-        pythonProcess.on('error', (err) => {
-            console.error(`Failed to start python process: ${err.message}`);
-            reject(new Error(`Failed to start python process: ${err.message}`));
-        });
-    });
+};
+const upload = multer({ dest: 'uploads/', ...uploadOptions });
+// Single images are processed straight from memory, so they never touch the temp volume
+const memoryUpload = multer({ storage: multer.memoryStorage(), ...uploadOptions });
+
+// Helper function to run Python image processor (via the persistent image worker)
+const runImageProcessor = async (buffer, options = {}) => {
+    const result = await processImageBuffer(buffer, options);
+    return { processedBuffer: result.outputs.main, thumbnailBuffer: result.outputs['400x400'], size: result.size };
 };
 
 
@@ -783,6 +739,27 @@ app.get('/api/firebase/images/:manufacturer/:sku', async (req, res) => {
     }
 });
 
+// Faire image manifest lookups, served from the batch processor's manifest store
+app.get('/api/manifest/sku/:sku', async (req, res) => {
+    try {
+        const product = await lookupManifestSku(req.params.sku);
+        res.json({ success: true, product });
+    } catch (error) {
+        const status = error.message.startsWith('SKU not found') ? 404 : 500;
+        res.status(status).json({ success: false, message: 'Failed to look up manifest entry', error: error.message });
+    }
+});
+
+app.get('/api/manifest/brand/:brand', async (req, res) => {
+    try {
+        const { products } = await lookupManifestBrand(req.params.brand);
+        res.json({ success: true, products, count: products.length });
+    } catch (error) {
+        console.error(`Error looking up manifest for brand ${req.params.brand}:`, error);
+        res.status(500).json({ success: false, message: 'Failed to look up manifest entries', error: error.message });
+    }
+});
+
 // NEW: Firebase Brands API Endpoint (for ImageManagement component)
 app.get('/api/firebase/brands', async (req, res) => {
     try {
@@ -795,7 +772,7 @@ app.get('/api/firebase/brands', async (req, res) => {
 });
 
 // NEW: Endpoint to handle image upload and processing (for ImageManagement component)
-app.post('/api/firebase/upload-processed-image', upload.array('images'), async (req, res) => {
+app.post('/api/firebase/upload-processed-image', memoryUpload.array('images'), async (req, res) => {
     try {
         if (!req.files || req.files.length === 0) {
             return res.status(400).json({ success: false, message: 'No files uploaded.' });
@@ -810,29 +787,21 @@ app.post('/api/firebase/upload-processed-image', upload.array('images'), async (
         // Normalize manufacturer name for Firebase path
         manufacturer = normalizeBrandName(manufacturer);
 
-        const uploadedFilePaths = req.files.map(file => file.path);
         const processedImageUrls = [];
 
-        // Create a directory for processed images if it doesn't exist
-        const processedOutputDir = path.join(__dirname, 'processed_images');
-        await fs.mkdir(processedOutputDir, { recursive: true });
-
-        for (const filePath of uploadedFilePaths) {
+        for (const file of req.files) {
             try {
-                // Run the Python script for processing
-                const processResult = await runImageProcessor(filePath, processedOutputDir, {
-                    outputFormat: 'webp', // Assuming WEBP is desired for Faire
+                // Process the uploaded bytes in the image worker; the result comes back as buffers
+                const processResult = await runImageProcessor(file.buffer, {
+                    sku,
                     padding: parseInt(padding) || 50,
                     quality: parseInt(quality) || 85
                 });
-                const processedImagePath = processResult.processedPath;
+                const processedImageBuffer = processResult.processedBuffer;
 
-                if (!processedImagePath || !await fs.access(processedImagePath).then(() => true).catch(() => false)) {
-                     throw new Error(`Processed image file not found at: ${processedImagePath}`);
+                if (!processedImageBuffer || processedImageBuffer.length === 0) {
+                    throw new Error(`Image worker returned no output for ${file.originalname}`);
                 }
-
-                // Read the processed image file
-                const processedImageBuffer = await fs.readFile(processedImagePath);
                 
                 // Construct the destination path for Firebase Storage
                 const destinationPath = `brand-images/${manufacturer}/${sku}_${Date.now()}.webp`;
@@ -841,17 +810,9 @@ app.post('/api/firebase/upload-processed-image', upload.array('images'), async (
                 const { publicUrl } = await uploadProcessedImage(processedImageBuffer, destinationPath);
                 processedImageUrls.push(publicUrl);
 
-                // Clean up the locally stored processed file
-                await fs.unlink(processedImagePath);
-
             } catch (processingError) {
-                console.error(`Error processing or uploading image ${filePath}:`, processingError);
+                console.error(`Error processing or uploading image ${file.originalname}:`, processingError);
                 // Log and continue to next file even if one fails
-            } finally {
-                // Clean up original uploaded file
-                if (await fs.access(filePath).then(() => true).catch(() => false)) {
-                    await fs.unlink(filePath);
-                }
             }
         }
 
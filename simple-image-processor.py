@@ -4,25 +4,20 @@ Simple Product Image Processor
 Quick script for basic image processing without background removal
 """
 
-import os
+import sys
 from pathlib import Path
-from PIL import Image
+
+# Shared pipeline modules live alongside the Zoho processor
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'image-processing'))
+from processing_core import ProcessingCore, TransformSettings
 
 def process_image(input_path, output_path, padding=50):
     """Process a single image with padding only."""
     print(f"Processing: {input_path}")
     
-    # Open and convert to RGBA
-    img = Image.open(input_path).convert('RGBA')
-    
-    # Add padding
-    width, height = img.size
-    new_img = Image.new('RGBA', (width + 2*padding, height + 2*padding), (0,0,0,0))
-    new_img.paste(img, (padding, padding), img)
-    
-    # Save as WebP
+    # Keep opaque sources on RGB, add transparent padding and save as WebP (quality 85)
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    new_img.save(output_path, 'WEBP', quality=85)
+    ProcessingCore(TransformSettings(padding)).process_file(input_path, output_path.with_suffix(''))
     print(f"Saved: {output_path}")
 
 def main():
@@ -0,0 +1,104 @@
+// test-image-worker.js - Checks the persistent Python image worker (zoho_faire_processor.py --worker)
+// Run with: node test-image-worker.js (needs python with the image-processing requirements)
+
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const http = require('http');
+const readline = require('readline');
+const { spawn } = require('child_process');
+
+const WORKER_SCRIPT = path.join(__dirname, 'image-processing', 'zoho_faire_processor.py');
+const FIXTURE_IMAGE = path.join(__dirname, 'frontend', 'public', 'logo192.png');
+
+// Serves the fixture image at /logo.png and 404s everything else
+function startFixtureServer() {
+    const server = http.createServer((req, res) => {
+        if (req.url === '/logo.png') {
+            res.writeHead(200, { 'Content-Type': 'image/png' });
+            fs.createReadStream(FIXTURE_IMAGE).pipe(res);
+        } else {
+            res.writeHead(404);
+            res.end('Not found');
+        }
+    });
+    return new Promise(resolve => server.listen(0, '127.0.0.1', () => resolve(server)));
+}
+
+function startWorker() {
+    const child = spawn('python', [WORKER_SCRIPT, '--worker', '--no-cache'], { stdio: ['pipe', 'pipe', 'ignore'] });
+    const waiting = new Map();
+    let onReady;
+    const ready = new Promise(resolve => { onReady = resolve; });
+    const exited = new Promise(resolve => child.on('exit', code => resolve(code)));
+
+    readline.createInterface({ input: child.stdout }).on('line', line => {
+        const message = JSON.parse(line);
+        if (message.event === 'ready') return onReady();
+        const resolve = waiting.get(message.id);
+        waiting.delete(message.id);
+        if (resolve) resolve(message);
+    });
+
+    let nextId = 1;
+    const send = payload => {
+        const id = nextId++;
+        const reply = new Promise(resolve => waiting.set(id, resolve));
+        child.stdin.write(JSON.stringify({ id, ...payload }) + '\n');
+        // A worker that dies mid-request never answers; settle on its exit instead of hanging
+        return Promise.race([reply, exited.then(code => ({ id, success: false, error: `worker exited (${code})` }))]);
+    };
+    return { child, ready, send, exited };
+}
+
+async function testWorker() {
+    console.log('🧪 Testing the persistent image worker...\n');
+    const server = await startFixtureServer();
+    const baseUrl = `http://127.0.0.1:${server.address().port}`;
+    const outputDir = fs.mkdtempSync(path.join(os.tmpdir(), 'image-worker-test-'));
+    const worker = startWorker();
+    let failures = 0;
+
+    const check = (label, passed, detail) => {
+        console.log(passed ? `✅ PASS: ${label}` : `❌ FAIL: ${label}${detail ? ` (${detail})` : ''}`);
+        if (!passed) failures++;
+    };
+
+    try {
+        await worker.ready;
+
+        // Test 1: a URL input is downloaded and processed
+        console.log('📋 Test 1: Processing a URL input...');
+        const processed = await worker.send({
+            op: 'process', input: `${baseUrl}/logo.png`, output_dir: outputDir, sku: 'url-test', index: 1
+        });
+        check('URL input processed', processed.success && fs.existsSync(processed.result.main_image),
+              processed.error);
+
+        // Test 2: a failed download gets an error reply
+        console.log('\n📋 Test 2: Processing a URL that fails to download...');
+        const failed = await worker.send({
+            op: 'process', input: `${baseUrl}/missing.png`, output_dir: outputDir, sku: 'missing', index: 1
+        });
+        check('Failed download answered with an error',
+              failed.success === false && /Download failed/.test(failed.error || ''), failed.error);
+
+        // Test 3: the worker is still serving after the failure
+        console.log('\n📋 Test 3: Worker still answers after the failure...');
+        const ping = await worker.send({ op: 'ping' });
+        check('Worker alive after failed download', ping.success === true, ping.error);
+    } finally {
+        worker.child.stdin.end();
+        await worker.exited;
+        server.close();
+        fs.rmSync(outputDir, { recursive: true, force: true });
+    }
+
+    console.log(failures ? `\n❌ ${failures} check(s) failed` : '\n✅ All worker checks passed');
+    process.exitCode = failures ? 1 : 0;
+}
+
+testWorker().catch(error => {
+    console.log('❌ ERROR:', error.message);
+    process.exitCode = 1;
+});